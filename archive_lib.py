@@ -0,0 +1,323 @@
+"""Record and replay http responses of a site (version 1.0).
+
+Classes in this module:
+
+- ArchiveWriter: recording of http responses in an archive file
+- ReplayServer: local http server replaying the responses of an archive
+
+Functions in this module:
+
+- read_archive: generator of all responses recorded in an archive file
+
+An archive file is a series of WARC/1.0 'response' records, each compressed
+as a separate gzip member (as in a .warc.gz file). The block of a record is
+the http response with a status line, headers and the (decoded) body. Every
+response of a redirect chain is a record of its own.
+"""
+
+import gzip
+import logging
+import threading
+import time
+import uuid
+import zlib
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+_gzip_magic = b'\x1f\x8b'
+
+
+class ArchiveWriter:
+    """Class encapsulating the recording of http responses in an archive.
+
+    Responses can be written from concurrent threads.
+    """
+
+    # headers that do not apply anymore to a recorded (decoded) body
+    skip_headers = {'content-encoding', 'content-length', 'transfer-encoding'}
+
+    def __init__(self, archive_file):
+        """Initiates the writer object.
+
+        Records are appended when the archive file exists already.
+
+        Args:
+            archive_file (Path): path of the archive file
+        """
+        self.archive_file = archive_file
+        self.num_records = 0
+        self._file = open(archive_file, 'ab')
+        self._lock = threading.Lock()
+
+    def close(self):
+        """Close the archive file.
+
+        Returns:
+            None
+        """
+        self._file.close()
+
+    def write_response(self, resp):
+        """Record a response.
+
+        The body of the response is read if this was not done yet.
+
+        Args:
+            resp (requests.Response): response to record
+
+        Returns:
+            None
+        """
+        body = resp.content
+        lines = [f'HTTP/1.1 {resp.status_code} {resp.reason}']
+        for name, value in resp.headers.items():
+            if name.lower() not in self.skip_headers:
+                lines.append(f'{name}: {value}')
+        lines.append(f'Content-Length: {len(body)}')
+        block = ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body
+
+        date = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+        warc_headers = (
+            'WARC/1.0\r\n'
+            'WARC-Type: response\r\n'
+            f'WARC-Record-ID: <urn:uuid:{uuid.uuid4()}>\r\n'
+            f'WARC-Date: {date}\r\n'
+            f'WARC-Target-URI: {resp.url}\r\n'
+            'Content-Type: application/http; msgtype=response\r\n'
+            f'Content-Length: {len(block)}\r\n\r\n')
+        record = warc_headers.encode('latin-1') + block + b'\r\n\r\n'
+        member = gzip.compress(record)
+        with self._lock:
+            self._file.write(member)
+            self.num_records += 1
+
+
+def read_archive(archive_file):
+    """Generator of all responses recorded in an archive file.
+
+    Args:
+        archive_file (Path): path of the archive file
+
+    Yields:
+        (str, int, list of (str, str), bytes): url, status code, headers and
+            body of the response
+    """
+    with gzip.open(archive_file, 'rb') as archive:
+        while True:
+            line = archive.readline()
+            if not line:
+                return
+            if not line.startswith(b'WARC/'):
+                # blank lines between records
+                continue
+            warc_headers = _read_headers(archive)
+            length = int(warc_headers.get('content-length', 0))
+            block = archive.read(length)
+            if warc_headers.get('warc-type') != 'response':
+                continue
+            head, _, body = block.partition(b'\r\n\r\n')
+            status_line, *header_lines = head.decode('latin-1').split('\r\n')
+            status = int(status_line.split()[1])
+            headers = [tuple(h.split(': ', 1)) for h in header_lines]
+            yield warc_headers['warc-target-uri'], status, headers, body
+
+
+def _read_headers(stream):
+    """Read header lines from a stream up to and including a blank line.
+
+    Args:
+        stream (BinaryIO): stream positioned at the first header line
+
+    Returns:
+        dict[str, str]: lowercase header name:value pairs
+    """
+    headers = {}
+    while True:
+        line = stream.readline().decode('latin-1').strip()
+        if not line:
+            return headers
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+
+class ReplayServer(ThreadingHTTPServer):
+    """Class encapsulating a local http server that replays an archive.
+
+    Requests are answered with the recorded response for the same path and
+    query, regardless of the host that was recorded, and with 404 for paths
+    that are not in the archive. Redirects are replayed as recorded, since
+    every response of a redirect chain is recorded. When a path is recorded
+    more than once, the last complete (not 304) response is replayed.
+    Conditional requests with an If-None-Match header that matches the
+    recorded ETag are answered with 304.
+
+    The recorded origin (scheme and host) of the site is replaced by the
+    origin of the server in Location headers and in all text bodies (html,
+    xml, plain text like robots.txt, and gzipped sitemaps), so absolute
+    url's keep pointing to the server and a replayed crawl never reaches
+    the real site. An error is logged for any response that still refers
+    to a recorded host after this replacement.
+
+    To simulate a remote site, every response can be delayed by a fixed
+    latency, and bodies can be sent with a limited bandwidth per connection.
+    The bodies are kept compressed in memory.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, archive_file, port=8080, latency=0.0, bandwidth=None):
+        """Initiates the server object and loads the archive.
+
+        Args:
+            archive_file (Path): path of the archive file
+            port (int): port to serve on
+            latency (float): seconds to wait before responding
+            bandwidth (int): bytes per second to send bodies with per
+                connection; unlimited if None
+        """
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.origins = set()
+        self.responses = {}
+        for url, status, headers, body in read_archive(archive_file):
+            parts = urlsplit(url)
+            self.origins.add(f'{parts.scheme}://{parts.netloc}')
+            key = parts.path + (f'?{parts.query}' if parts.query else '')
+            if status == 304 and key in self.responses:
+                continue
+            self.responses[key] = (status, headers, zlib.compress(body))
+        logging.info(f'{len(self.responses)} responses loaded from '
+                     f'{archive_file}')
+        super().__init__(('', port), _ReplayHandler)
+
+
+class _ReplayHandler(BaseHTTPRequestHandler):
+    """Request handler of the ReplayServer."""
+
+    protocol_version = 'HTTP/1.1'
+    # set by the server itself
+    skip_headers = {'content-length', 'date', 'server', 'connection',
+                    'keep-alive'}
+    # content types of bodies in which the recorded origins are replaced
+    text_types = ('text/', 'html', 'xml', 'json', 'javascript')
+
+    def do_GET(self):
+        self._replay(send_body=True)
+
+    def do_HEAD(self):
+        self._replay(send_body=False)
+
+    def log_message(self, format, *args):
+        logging.debug(format % args)
+
+    def _replay(self, send_body):
+        """Send the recorded response for the requested path.
+
+        Args:
+            send_body (bool): send the body of the response
+
+        Returns:
+            None
+        """
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+        recorded = server.responses.get(self.path)
+        if not recorded:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        status, headers, body = recorded
+        body = zlib.decompress(body)
+        headers = [(n, v) for n, v in headers
+                   if n.lower() not in self.skip_headers]
+        etag = next((v for n, v in headers if n.lower() == 'etag'), None)
+        if etag and self.headers.get('If-None-Match') == etag:
+            status, body = 304, b''
+
+        local_host = self.headers.get('Host', 'localhost')
+        headers = [(n, self._localised(v.encode(), local_host).decode()
+                    if n.lower() == 'location' else v)
+                   for n, v in headers]
+        content_type = next(
+            (v.lower() for n, v in headers if n.lower() == 'content-type'), '')
+        if body.startswith(_gzip_magic):
+            # gzipped text, like the sitemaps of a site
+            body = gzip.compress(
+                self._localised(gzip.decompress(body), local_host), mtime=0)
+        elif any(t in content_type for t in self.text_types):
+            body = self._localised(body, local_host)
+        self._check_origins(headers, body)
+
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if send_body:
+            self._send_body(body)
+
+    def _localised(self, text, local_host):
+        """Replace the recorded origins in a text by the origin of the server.
+
+        Besides full origins (scheme and host), network-path references to
+        the recorded hosts (starting with '//') are replaced as well.
+
+        Args:
+            text (bytes): text to localise
+            local_host (str): host (and port) of the server as requested
+
+        Returns:
+            bytes: localised text
+        """
+        for origin in self.server.origins:
+            text = text.replace(origin.encode(),
+                                f'http://{local_host}'.encode())
+            netloc = urlsplit(origin).netloc
+            text = text.replace(f'//{netloc}'.encode(),
+                                f'//{local_host}'.encode())
+        return text
+
+    def _check_origins(self, headers, body):
+        """Log an error when a response still refers to a recorded host.
+
+        Such a reference would lead the replayed crawl to the real site.
+
+        Args:
+            headers (list of (str, str)): headers of the response
+            body (bytes): body of the response
+
+        Returns:
+            None
+        """
+        if body.startswith(_gzip_magic):
+            body = gzip.decompress(body)
+        for origin in self.server.origins:
+            netloc = urlsplit(origin).netloc
+            if netloc.encode() in body or any(
+                    netloc in v for n, v in headers
+                    if n.lower() == 'location'):
+                logging.error(f'Response for {self.path} refers to recorded '
+                              f'host {netloc}')
+
+    def _send_body(self, body):
+        """Send a body, limited to the bandwidth of the server.
+
+        Args:
+            body (bytes): body to send
+
+        Returns:
+            None
+        """
+        bandwidth = self.server.bandwidth
+        if not bandwidth:
+            self.wfile.write(body)
+            return
+        chunk_size = max(1024, bandwidth // 10)
+        for start in range(0, len(body), chunk_size):
+            chunk = body[start:start + chunk_size]
+            self.wfile.write(chunk)
+            time.sleep(len(chunk) / bandwidth)
@@ -0,0 +1,71 @@
+"""Compare the extraction backends on a scrape (version 1.0).
+
+The information of the pages_info table can be extracted with a bs4 or an
+lxml backend (see the extract_pages_info method of ScrapeDB). This module
+extracts the information of the pages of an existing scrape database with
+both backends, reports the pages for which the results differ and compares
+the throughput of the backends. The database itself is not altered.
+
+The throughput includes the parsing of the pages, but not the reading and
+decompression of the documents.
+"""
+
+import time
+import logging
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+from scraper_lib import ScrapeDB, extract_page_info, extract_page_info_lxml, \
+    parse_page_lxml
+
+# ============================================================================ #
+db_file = 'scrape.db'       # scrape database to extract the pages from
+max_pages = 0               # number of pages to compare; all pages if 0
+max_reports = 25            # number of differing pages to report in detail
+# ============================================================================ #
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(levelname)-8s - %(message)s')
+
+db = ScrapeDB(Path(db_file))
+backend_times = {'bs4': 0.0, 'lxml': 0.0}
+field_diffs = {}
+num_pages = num_diffs = 0
+
+for page_id, path, doc in db.pages():
+    if max_pages and num_pages == max_pages:
+        break
+    num_pages += 1
+
+    # the warnings of the extraction are the same for both backends
+    logging.disable(logging.WARNING)
+    start = time.perf_counter()
+    bs4_info = extract_page_info(BeautifulSoup(doc, features='lxml'), path)
+    backend_times['bs4'] += time.perf_counter() - start
+    start = time.perf_counter()
+    lxml_info = extract_page_info_lxml(parse_page_lxml(doc), path)
+    backend_times['lxml'] += time.perf_counter() - start
+    logging.disable(logging.NOTSET)
+
+    fields = [f for f in bs4_info if bs4_info[f] != lxml_info[f]]
+    if fields:
+        num_diffs += 1
+        for field in fields:
+            field_diffs[field] = field_diffs.get(field, 0) + 1
+        if num_diffs <= max_reports:
+            logging.warning(f'Backends differ for page {page_id} ({path}):')
+            for field in fields:
+                logging.warning(f'    {field}: {bs4_info[field]!r:.100} '
+                                f'<> {lxml_info[field]!r:.100}')
+db.close()
+
+logging.info(f'{num_pages} pages compared, {num_diffs} with differences')
+for field, num in field_diffs.items():
+    logging.info(f'    {field}: {num} pages')
+for backend, seconds in backend_times.items():
+    rate = num_pages / seconds if seconds else 0
+    logging.info(f'Backend {backend}: {seconds:.1f} sec, {rate:.0f} pages/sec')
+if backend_times['lxml']:
+    logging.info(f'Speedup of lxml backend: '
+                 f'{backend_times["bs4"] / backend_times["lxml"]:.1f}')
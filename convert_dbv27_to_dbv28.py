@@ -96,23 +96,31 @@ for timestamp, scrape_dir in scrape_dirs(master_dir, min_timestamp,
     num_pages = dbn.num_pages()
     start_time = time.time()
     page_num = 0
-    for page_id, page_path, page_string in dbn.pages():
-        page_num += 1
-        soup = BeautifulSoup(page_string, features='lxml')
-        ed_text, aut_text = get_text(soup)
-        dbn.exe('''
-            UPDATE pages_info
-            SET ed_text = ?,
-                aut_text = ?
-            WHERE page_id = ?''',
-                [ed_text, aut_text, page_id])
-        if page_num % 250 == 0:
-            page_time = (time.time() - start_time) / page_num
-            togo_time = int((num_pages - page_num) * page_time)
-            print(
-                f'updating ed_text and inserting aut_text to scrape database '
-                f'of {timestamp} - togo: {num_pages - page_num} pages / '
-                f'{togo_time // 60}:{togo_time % 60:02} min')
+    upd_qry = '''
+        UPDATE pages_info
+        SET ed_text = ?,
+            aut_text = ?
+        WHERE page_id = ?'''
+    updates = []
+    with dbn.batch():
+        for page_id, page_path, page_string in dbn.pages():
+            page_num += 1
+            soup = BeautifulSoup(page_string, features='lxml')
+            ed_text, aut_text = get_text(soup)
+            updates.append((ed_text, aut_text, page_id))
+            if page_num % 250 == 0:
+                # write and commit the updates in bulk
+                dbn.db_con.executemany(upd_qry, updates)
+                updates.clear()
+                dbn.commit()
+                page_time = (time.time() - start_time) / page_num
+                togo_time = int((num_pages - page_num) * page_time)
+                print(
+                    f'updating ed_text and inserting aut_text to scrape '
+                    f'database of {timestamp} - togo: '
+                    f'{num_pages - page_num} pages / '
+                    f'{togo_time // 60}:{togo_time % 60:02} min')
+        dbn.db_con.executemany(upd_qry, updates)
 
     logging.info(f'Table pages_info copied to db v{v_new}, '
                  f'while updating ed_text and adding aut_text fields')
@@ -0,0 +1,114 @@
+import sqlite3
+import logging
+from pathlib import Path
+
+from scraper_lib import ScrapeDB, setup_file_logging
+
+# ============================================================================ #
+min_timestamp = '201117-0000'   # scrapes before are not processed
+max_timestamp = '991231-2359'   # scrapes after are not processed
+within_bd = False               # True when running on the DWB
+v_old = '2.8'                   # old db version
+v_new = '2.9'                   # new db version
+# ============================================================================ #
+
+# establish scrape directories; scrape_dirs can not be used, since it opens
+# the databases with a version check
+if within_bd:
+    master_dir = Path('C:/Users', 'diepj09', 'Documents/scrapes')
+else:
+    master_dir = Path('/home/jos/bdscraper/scrapes')
+dirs = sorted(
+    [d for d in master_dir.glob('??????-???? - bd-scrape') if d.is_dir()])
+
+# cycle over all relevant scrape directories
+for scrape_dir in dirs:
+    timestamp = scrape_dir.name[:11]
+    if timestamp < min_timestamp or timestamp > max_timestamp:
+        continue
+    db_file = scrape_dir / 'scrape.db'
+    dbo_file = scrape_dir / f'scrape.v{v_old.replace(".", "")}.db'
+    tmp_file = scrape_dir / f'scrape.v{v_new.replace(".", "")}.tmp.db'
+    setup_file_logging(scrape_dir, log_level=logging.INFO)
+    db = sqlite3.connect(db_file, isolation_level=None)
+    db_version = db.execute(
+        'SELECT value FROM parameters WHERE name = "db_version"').fetchone()[0]
+    num_pages = db.execute('SELECT count(*) FROM pages').fetchone()[0]
+    db.close()
+    if db_version == v_old:
+        src_file = db_file
+    elif db_version == v_new and num_pages == 0 and dbo_file.exists():
+        # left empty by a failed conversion; convert the saved old db again
+        logging.info(f'Failed conversion to v{v_new} is redone')
+        src_file = dbo_file
+    else:
+        logging.info(
+            f'Database v{db_version} can not be converted to v{v_new}')
+        continue
+
+    logging.info(f'Database conversion to v{v_new} started')
+
+    # the new db is created aside and only replaces the old one when the
+    # conversion succeeded
+    tmp_file.unlink(missing_ok=True)
+    dbn = ScrapeDB(tmp_file, create=True)
+    dbo = sqlite3.connect(src_file, isolation_level=None)
+    has_info = dbo.execute('''
+        SELECT name FROM sqlite_master
+        WHERE type = "table" AND name = "pages_info"''').fetchone()
+    dbo.close()
+    if has_info:
+        # created before attaching the old db, since its unqualified ddl
+        # would act on the tables of the old db otherwise
+        dbn.create_pages_info(renew=False)
+
+    # attach old db
+    dbn.exe('ATTACH DATABASE ? AS old', [str(src_file)])
+
+    with dbn.transaction():
+
+        # copy parameters table
+        for name, value in dbn.exe('SELECT name, value FROM old.parameters'):
+            if name == 'db_version':
+                continue
+            dbn.upd_par(name, value)
+        logging.info(f'Table parameters converted to db v{v_new}')
+
+        # copy pages table; the zlib compressed documents remain readable
+        dbn.exe('INSERT INTO main.pages SELECT * FROM old.pages')
+        logging.info(f'Table pages copied to db v{v_new}')
+
+        # copy redirs table
+        dbn.exe('INSERT INTO main.redirs SELECT * FROM old.redirs')
+        logging.info(f'Table redirs copied to db v{v_new}')
+
+        # copy ed_links table
+        dbn.exe('INSERT INTO main.ed_links SELECT * FROM old.ed_links')
+        logging.info(f'Table ed_links copied to db v{v_new}')
+
+        # copy pages_info table, which has not changed
+        if has_info:
+            fields = dbn.extracted_fields + dbn.derived_fields
+            fields_str = ', '.join(['page_id'] + [f[0] for f in fields])
+            dbn.exe(f'''
+                INSERT INTO main.pages_info ({fields_str})
+                    SELECT {fields_str}
+                    FROM old.pages_info''')
+            logging.info(f'Table pages_info copied to db v{v_new}')
+
+    dbn.exe('DETACH DATABASE old')
+
+    # materialise the definitive paths of all requested paths
+    dbn.build_def_paths()
+
+    dbn.exe('VACUUM')
+    dbn.close()
+
+    # save old db and put the new one in its place
+    if src_file == db_file:
+        db_file.replace(dbo_file)
+        logging.info(f'Database v{v_old} saved as "{dbo_file.name}"')
+    tmp_file.replace(db_file)
+
+    logging.info(f'Database conversion to v{v_new} concluded')
+    print(f'database conversion of {timestamp} concluded')
@@ -0,0 +1,1778 @@
+"""Classes and functions for crawling www.belastingdienst.nl (version 1.0).
+
+Classes in this module:
+
+- Frontier: paths to be crawled and paths that are handled
+- RedirectCache: redirects of a previous scrape to be followed locally
+- RateController: adaptive control of the number and rate of requests
+- SiteCrawler: crawl of a site into a scrape database, either sequential or
+    with concurrent requests, and either full or incremental
+- ShardCrawler: crawl of the paths of one shard of a site
+
+Functions in this module:
+
+- read_robots: read the robots.txt rules of a site
+- sitemap_entries: generator of all url's and lastmod values from a sitemap
+- shard_of: get the shard that owns a path in a sharded crawl
+- crawl_sharded: crawl a site with a number of shard processes
+- merge_shards: merge the partial databases of a sharded crawl into one
+"""
+
+import asyncio
+import hashlib
+import heapq
+import logging
+import multiprocessing
+import queue
+import random
+import re
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+from xml.etree import ElementTree
+from requests import RequestException
+from bs4 import BeautifulSoup
+
+from scraper_lib import ScrapeDB, Transport, PageNotModified, \
+    NonHtmlResource, scrape_page, page_links, extract_info, \
+    editorial_links, setup_file_logging
+
+
+class Frontier:
+    """Class encapsulating the frontier of a crawl.
+
+    The frontier keeps all paths that are seen during a crawl, either to be
+    crawled or handled, in one dictionary. Checking if a path is seen
+    already therefore takes constant time, regardless of the size of the
+    crawl.
+
+    Paths are crawled in breadth-first order: a lower depth (number of links
+    from the start path) means a higher priority. Links from hub pages (with
+    a pagetype in the class constant hub_types) get half a level of extra
+    priority, so the overview pages of the site are crawled early. Paths of
+    the same priority are kept in a deque per priority, which is more
+    compact than a heap entry per path.
+
+    Next to this, the frontier records which paths were added and handled
+    since the last call of the changes method, to be saved as checkpoint.
+    """
+
+    hub_types = {'bld-sitemap', 'bld-overview', 'bld-filter', 'bld-cluster'}
+
+    _done = None        # state of a handled path
+
+    def __init__(self):
+        """Initiates an empty frontier."""
+        # state per path: depth if queued, ~depth if popped or _done if handled
+        self._state = {}
+        self._queues = {}
+        self._priorities = []
+        self._num_queued = 0
+        self._num_done = 0
+        self._changed_todo = []
+        self._changed_done = []
+
+    def __len__(self):
+        """Number of paths that are queued to be crawled."""
+        return self._num_queued
+
+    def __contains__(self, path):
+        """Check if a path is seen already (queued, popped or handled)."""
+        return path in self._state
+
+    def add(self, path, depth=0, pagetype=None):
+        """Queue a path to be crawled if it is not seen before.
+
+        Args:
+            path (str): path relative to root_url
+            depth (int): number of links between the start path and the path
+            pagetype (str): pagetype of the page that links to the path
+
+        Returns:
+            bool: True if the path was added, False if it was seen already
+        """
+        if path in self._state:
+            return False
+        self._enqueue(path, depth, pagetype)
+        self._changed_todo.append((path, depth))
+        return True
+
+    def requeue(self, path):
+        """Queue a popped path again.
+
+        Args:
+            path (str): path relative to root_url
+
+        Returns:
+            None
+        """
+        self._enqueue(path, self.depth(path))
+
+    def _enqueue(self, path, depth, pagetype=None):
+        """Put a path in the queue that belongs to its priority.
+
+        Args:
+            path (str): path relative to root_url
+            depth (int): number of links between the start path and the path
+            pagetype (str): pagetype of the page that links to the path
+
+        Returns:
+            None
+        """
+        self._state[path] = depth
+        priority = 2 * depth - (1 if pagetype in self.hub_types else 0)
+        queue = self._queues.get(priority)
+        if queue is None:
+            queue = self._queues[priority] = deque()
+            heapq.heappush(self._priorities, priority)
+        queue.append(path)
+        self._num_queued += 1
+
+    def pop(self):
+        """Get the queued path with the highest priority.
+
+        Returns:
+            str: path relative to root_url
+
+        Raises:
+            IndexError: when no path is queued
+        """
+        while self._priorities:
+            priority = self._priorities[0]
+            queue = self._queues[priority]
+            while queue:
+                path = queue.popleft()
+                depth = self._state[path]
+                if depth is self._done or depth < 0:
+                    # handled or popped since it was queued
+                    continue
+                self._state[path] = ~depth
+                self._num_queued -= 1
+                return path
+            heapq.heappop(self._priorities)
+            del self._queues[priority]
+        raise IndexError('pop from empty frontier')
+
+    def mark_done(self, path):
+        """Register a path as handled.
+
+        Args:
+            path (str): path relative to root_url
+
+        Returns:
+            None
+        """
+        if path in self._state:
+            state = self._state[path]
+            if state is self._done:
+                return
+            if state >= 0:
+                # handled while still queued
+                self._num_queued -= 1
+        self._state[path] = self._done
+        self._num_done += 1
+        self._changed_done.append(path)
+
+    def is_done(self, path):
+        """Check if a path is handled.
+
+        Args:
+            path (str): path relative to root_url
+
+        Returns:
+            bool: True if handled
+        """
+        return path in self._state and self._state[path] is self._done
+
+    def depth(self, path):
+        """Get the depth of a path that is queued or popped.
+
+        Args:
+            path (str): path relative to root_url
+
+        Returns:
+            int|None: number of links between the start path and the path,
+                or None if the path is handled or not seen
+        """
+        state = self._state.get(path)
+        if state is None:
+            return None
+        return state if state >= 0 else ~state
+
+    def num_done(self):
+        """Get the number of handled paths.
+
+        Returns:
+            int: number of handled paths
+        """
+        return self._num_done
+
+    def num_changed_done(self):
+        """Get the number of paths handled since the last call of changes.
+
+        Returns:
+            int: number of paths
+        """
+        return len(self._changed_done)
+
+    def changes(self):
+        """Get and reset the changes since the last call of this method.
+
+        Returns:
+            (list of (str, int), list of str): (path, depth) of the added
+                paths, and the handled paths
+        """
+        changes = self._changed_todo, self._changed_done
+        self._changed_todo = []
+        self._changed_done = []
+        return changes
+
+    def restore(self, todo, done):
+        """Restore the frontier from a saved state.
+
+        The restored paths are not registered as changes.
+
+        Args:
+            todo (dict[str, int]): depth per path to be crawled
+            done (set of str): handled paths
+
+        Returns:
+            None
+        """
+        for path in done:
+            self._state[path] = self._done
+        self._num_done = len(done)
+        for path, depth in todo.items():
+            if path not in self._state:
+                self._enqueue(path, depth)
+
+
+class RedirectCache:
+    """Class encapsulating the redirects of a previous scrape.
+
+    The server-side (301 and 302) and client-side redirects of the redirs
+    table of a previous scrape are kept in memory, so the chain of redirects
+    of a known path can be followed locally. A crawler then only needs to
+    request the final url of the chain instead of every hop. Aliases are not
+    cached, since they follow from the content of the final page.
+
+    To detect redirects that have changed since the previous scrape, the
+    chain of a sample of the paths is not taken from the cache, but
+    followed by requesting every hop and compared with the cached chain.
+    When the previous scrape is older than a given number of days, the
+    cache is not used at all.
+    """
+
+    cached_types = {'301', '302', 'client'}
+
+    def __init__(self, db, root_url, max_age=30, verify_rate=0.05):
+        """Initiates the cache from the redirects of a scrape database.
+
+        Args:
+            db (ScrapeDB): database of the previous scrape
+            root_url (str): url that will be treated as the base of the scrape
+            max_age (int): maximum age in days of the previous scrape for the
+                cache to be used
+            verify_rate (float): fraction of the cached chains to be verified
+                by requesting every hop
+        """
+        self.root_url = root_url
+        self.verify_rate = verify_rate
+        self.num_hits = 0
+        self.num_hops_saved = 0
+        self.num_verified = 0
+        self.num_stale = 0
+        self._redirs = {}
+        self._lock = threading.Lock()
+
+        timestamp = db.get_par('timestamp')
+        age = (time.time() - time.mktime(
+            time.strptime(timestamp, '%y%m%d-%H%M'))) / (24 * 3600)
+        if age > max_age:
+            logging.info(f'Redirect cache not used; scrape {timestamp} is '
+                         f'older than {max_age} days')
+            return
+        for req_path, redir_path, redir_type in db.redirs():
+            if str(redir_type) in self.cached_types:
+                self._redirs[req_path] = (redir_path, redir_type)
+        logging.info(f'Redirect cache with {len(self._redirs)} redirects '
+                     f'from scrape {timestamp}')
+
+    def __len__(self):
+        return len(self._redirs)
+
+    def _url(self, path):
+        """Get the absolute url of a path relative to root_url.
+
+        Args:
+            path (str): path relative to root_url, or url if out of scope
+
+        Returns:
+            str: absolute url
+        """
+        return self.root_url + path if path.startswith('/') else path
+
+    def chain(self, req_path):
+        """Get the cached chain of redirects of a path.
+
+        Args:
+            req_path (str): requested path relative to root_url
+
+        Returns:
+            list of (str, str, str): (requested url, url of the redirect,
+                type of redirect) for every hop in the chain, in the same
+                format as scrape_page; empty list when not cached
+        """
+        hops = []
+        seen = {req_path}
+        path = req_path
+        while path in self._redirs:
+            redir_path, redir_type = self._redirs[path]
+            if isinstance(redir_type, str) and redir_type.isdigit():
+                redir_type = int(redir_type)
+            hops.append((self._url(path), self._url(redir_path), redir_type))
+            if redir_path in seen:
+                logging.warning(f'Cyclic redirect chain for {req_path}')
+                return []
+            seen.add(redir_path)
+            path = redir_path
+        return hops
+
+    def resolve(self, req_path):
+        """Get the url to request for a path and the cached hops to it.
+
+        For a sample of the paths with a cached chain, the requested path
+        itself is returned without hops, so the chain will be verified.
+
+        Args:
+            req_path (str): requested path relative to root_url
+
+        Returns:
+            (str, list of (str, str, str), bool): url to request, cached
+                hops leading to that url, and whether the chain of the path
+                needs to be verified
+        """
+        hops = self.chain(req_path)
+        if not hops:
+            return self._url(req_path), [], False
+        if random.random() < self.verify_rate:
+            return self._url(req_path), [], True
+        with self._lock:
+            self.num_hits += 1
+            self.num_hops_saved += len(hops)
+        return hops[-1][1], hops, False
+
+    def verify(self, req_path, redirs):
+        """Compare the cached chain of a path with the actual redirects.
+
+        Args:
+            req_path (str): requested path relative to root_url
+            redirs (list of (str, str, str)): redirects as followed by
+                scrape_page
+
+        Returns:
+            bool: True if the cached chain is still valid
+        """
+        cached = [(u1, u2, str(t)) for u1, u2, t in self.chain(req_path)]
+        actual = [(u1, u2, str(t)) for u1, u2, t in redirs if t != 'alias']
+        valid = cached == actual
+        with self._lock:
+            self.num_verified += 1
+            if not valid:
+                self.num_stale += 1
+        if not valid:
+            logging.info(f'Cached redirects of {req_path} have changed')
+        return valid
+
+    def log_stats(self):
+        """Log the usage of the cache.
+
+        Returns:
+            None
+        """
+        logging.info(f'Redirect cache: {self.num_hits} chains resolved, '
+                     f'{self.num_hops_saved} requests saved, '
+                     f'{self.num_stale} of {self.num_verified} '
+                     f'verified chains changed')
+
+
+class RateController:
+    """Class encapsulating an adaptive control of the pace of a crawl.
+
+    The controller follows the additive increase / multiplicative decrease
+    (AIMD) scheme of TCP congestion control. Its signals are the latencies of
+    the responses and the retries and failures of the requests, as
+    registered by the transport of the crawl. The server is considered
+    congested when a request is retried or failed, or when the smoothed
+    latency exceeds the lowest smoothed latency of the crawl by
+    latency_factor. This lowest latency rises slowly, so a lasting change
+    of the latency is accepted after some time.
+
+    Without congestion the number of requests in flight (the window) is
+    increased: by one for every response until the first congestion (slow
+    start), and by one per window of responses thereafter. At congestion the
+    window is decreased by decrease_factor, after which the responses to
+    the requests that were already in flight are not reacted upon. When
+    the window is at its minimum, the minimal interval between requests of
+    the transport is increased instead, which is reverted step by step
+    when the congestion is over. This way the controller adapts concurrency
+    in a concurrent crawl and the request rate in a sequential crawl.
+
+    Decisions are logged, as is the effective request rate at regular
+    intervals. The history of these figures is kept in the history
+    attribute as (seconds since start, window, interval, requests per
+    second) tuples.
+    """
+
+    def __init__(self, transport, max_window=8, min_window=1,
+                 latency_factor=2.0, decrease_factor=0.5, log_every=60):
+        """Initiates the controller object.
+
+        The current minimal interval of the transport (as set from a crawl
+        delay for instance) is respected as lower bound of the interval.
+
+        Args:
+            transport (Transport): transport of the crawl
+            max_window (int): maximum number of requests in flight
+            min_window (int): minimum number of requests in flight
+            latency_factor (float): factor on the lowest latency above which
+                the server is considered congested
+            decrease_factor (float): factor to decrease the window with
+            log_every (int): seconds between logs of the request rate
+        """
+        self.transport = transport
+        self.max_window = max_window
+        self.min_window = min_window
+        self.latency_factor = latency_factor
+        self.decrease_factor = decrease_factor
+        self.log_every = log_every
+        self.window = float(min_window)
+        self.min_interval = transport.min_interval
+        self.latency = None
+        self.base_latency = None
+        self.history = []
+        self._slow_start = True
+        self._num_latencies = len(transport.latencies)
+        self._num_errors = transport.num_retries + transport.num_failures
+        self._start_time = time.monotonic()
+        self._num_responses = 0
+        self._decrease_after = 0
+        self._last_log = self._start_time
+        self._num_requests = transport.num_requests
+
+    def limit(self):
+        """Get the number of requests that may be in flight.
+
+        Returns:
+            int: current window
+        """
+        return int(self.window)
+
+    def update(self):
+        """Adjust window and interval to the latest transport figures.
+
+        To be called after each handled request.
+
+        Returns:
+            None
+        """
+        transport = self.transport
+        latencies = transport.latencies[self._num_latencies:]
+        self._num_latencies += len(latencies)
+        num_errors = transport.num_retries + transport.num_failures
+        errors = num_errors - self._num_errors
+        self._num_errors = num_errors
+        self._num_responses += len(latencies)
+        for latency in latencies:
+            if self.latency is None:
+                self.latency = latency
+            else:
+                self.latency = 0.8 * self.latency + 0.2 * latency
+            if self.base_latency is None:
+                self.base_latency = self.latency
+            else:
+                # slowly rising, to adapt to a lasting change of latency
+                self.base_latency = min(self.latency, 1.01 * self.base_latency)
+
+        if errors or (self.latency is not None and self.latency
+                      > self.latency_factor * self.base_latency):
+            self._decrease(errors)
+        elif latencies:
+            self._increase()
+        self._log_rate()
+
+    def _decrease(self, errors):
+        """Slow down the crawl at congestion.
+
+        Args:
+            errors (int): number of retries and failures since the last update
+
+        Returns:
+            None
+        """
+        if self._num_responses < self._decrease_after:
+            # responses to requests sent before the last decrease
+            return
+        self._num_responses = 0
+        self._decrease_after = self.limit()
+        self._slow_start = False
+        reason = (f'{errors} retries/failures' if errors else
+                  f'latency {self.latency:.3f} s, lowest '
+                  f'{self.base_latency:.3f} s')
+        # measure the latency afresh at the new pace
+        self.latency = None
+        interval = self.transport.min_interval
+        if self.limit() > self.min_window:
+            old_window = self.limit()
+            self.window = max(self.min_window,
+                              self.window * self.decrease_factor)
+            logging.info(f'Congestion ({reason}): requests in flight '
+                         f'decreased from {old_window} to {self.limit()}')
+        else:
+            new_interval = max(2 * interval, self.min_interval, 0.1)
+            self.transport.min_interval = new_interval
+            logging.info(f'Congestion ({reason}): interval between requests '
+                         f'increased from {interval:.2f} to '
+                         f'{new_interval:.2f} s')
+
+    def _increase(self):
+        """Speed up the crawl without congestion.
+
+        Returns:
+            None
+        """
+        interval = self.transport.min_interval
+        if interval > self.min_interval:
+            # first revert an increased interval
+            self.transport.min_interval = max(self.min_interval,
+                                              interval - 0.05)
+            return
+        old_window = self.limit()
+        if self._slow_start:
+            self.window += 1
+        else:
+            self.window += 1 / self.window
+        self.window = min(self.window, self.max_window)
+        if self.limit() != old_window:
+            logging.debug(f'Requests in flight increased to {self.limit()}')
+
+    def _log_rate(self):
+        """Log the effective request rate at regular intervals.
+
+        Returns:
+            None
+        """
+        now = time.monotonic()
+        if now - self._last_log < self.log_every:
+            return
+        num_requests = self.transport.num_requests
+        rate = (num_requests - self._num_requests) / (now - self._last_log)
+        self._num_requests = num_requests
+        self._last_log = now
+        interval = self.transport.min_interval
+        self.history.append(
+            (int(now - self._start_time), self.limit(), round(interval, 2),
+             round(rate, 2)))
+        logging.info(f'Request rate {rate:.2f}/s with {self.limit()} in '
+                     f'flight and interval {interval:.2f} s')
+
+    def history_str(self):
+        """Get the history of the controller as string.
+
+        Returns:
+            str: space separated seconds:window:interval:rate entries
+        """
+        return ' '.join(':'.join(str(v) for v in entry)
+                        for entry in self.history)
+
+
+class SiteCrawler:
+    """Class encapsulating the crawl of a site into a scrape database.
+
+    The crawler starts at one path and follows all links that are within the
+    scope of the root url. Pages are saved in the scrape database under their
+    definitive path, while all redirects and aliases that were encountered
+    are saved as well.
+
+    Two crawl modes are available that result in the same pages and
+    redirects: crawl(), which requests one page at a time, and
+    crawl_concurrent(), which keeps a configurable number of requests in
+    flight per host. Both modes share the processing of a scraped page.
+
+    The information for the pages_info table and the editorial links of a
+    page are extracted right after the page is scraped (in the worker threads
+    when crawling concurrently), using the soup of the page that is parsed
+    for its links, and saved together with the page. This way the pages do
+    not have to be parsed again after the crawl. Pages that are identical to
+    the baseline are not extracted, since they are copied with their
+    information. The extraction backend and a cache of extracted information
+    can be set with the use_extraction method.
+
+    When the database of a previous scrape is given as baseline, the crawl is
+    incremental. All paths of the baseline are then added to the paths to
+    crawl, and pages are requested conditionally with the validators (ETag
+    and Last-Modified) of the baseline. Pages that are not modified, or that
+    are received with exactly the same html as in the baseline, are copied
+    from the baseline together with their pages_info row, without being
+    parsed. Since the links of those pages are not extracted, discovery of
+    paths relies on the baseline paths and the links of changed pages. The
+    resulting database is still complete and self-contained.
+    """
+
+    def __init__(self, db, root_url, start_path, max_paths, transport=None,
+                 baseline=None, checkpoint_every=250, redir_cache=None):
+        """Initiates the crawler object.
+
+        Args:
+            db (ScrapeDB): database to save the scrape results to
+            root_url (str): url that will be treated as the base of the scrape
+            start_path (str): path relative to root_url where the crawl starts
+            max_paths (int): maximum number of paths to scrape
+            transport (Transport): transport for all requests of the crawl;
+                a new one with default settings if None
+            baseline (ScrapeDB): database of a previous scrape for an
+                incremental crawl; full crawl if None
+            checkpoint_every (int): number of handled paths after which the
+                state of the crawl is saved in the database
+            redir_cache (RedirectCache): redirects of a previous scrape to
+                follow without requests; all hops are requested if None
+        """
+        self.db = db
+        self.transport = transport if transport else Transport()
+        self.root_url = root_url
+        self.start_path = start_path
+        self.max_paths = max_paths
+        self.baseline = baseline
+        self.checkpoint_every = checkpoint_every
+        self.redir_cache = redir_cache
+        self.frontier = Frontier()
+        self.num_done = 0
+        self.num_unchanged = 0
+        self.num_by_lastmod = 0
+        self.start_time = None
+        self.robots = None
+        self.controller = None
+        self.lastmods = {}
+        self.extract_backend = 'bs4'
+        self.extract_cache = None
+        self._unconditional = set()
+        self._queue_path(start_path, 0)
+
+        # page info that is extracted during the crawl needs a table to go to
+        db.create_pages_info(renew=False)
+
+        if baseline:
+            qry = '''
+                SELECT path FROM pages
+                UNION SELECT req_path FROM redirs
+                UNION SELECT path FROM resources'''
+            for (path,) in baseline.exe(qry):
+                if path.startswith('/') and not path.endswith('.xml'):
+                    self._queue_path(path, 1)
+            ts = baseline.get_par('timestamp')
+            self._baseline_date = f'20{ts[0:2]}-{ts[2:4]}-{ts[4:6]}'
+
+    def use_robots(self):
+        """Read and respect the robots.txt rules of the site.
+
+        Paths that are disallowed for the user agent of the transport will
+        not be requested. A crawl delay is applied as minimal interval
+        between requests of the transport.
+
+        Returns:
+            None
+        """
+        self.robots = read_robots(self.root_url, self.transport)
+        delay = self.robots.crawl_delay(self._user_agent())
+        if delay:
+            self.transport.min_interval = float(delay)
+            logging.info(f'Crawl delay of {delay} sec from robots.txt applied')
+
+    def use_rate_control(self, max_window=8):
+        """Adapt the pace of the crawl to the responses of the server.
+
+        A RateController is used to adjust the number of requests in flight
+        (concurrent crawl) or the interval between requests (sequential
+        crawl) to the latencies and errors of the requests. Should be called
+        after use_robots, to respect a crawl delay.
+
+        For a sequential crawl max_window should be 1, so every congestion
+        acts on the interval instead of on a window that is not used.
+
+        Args:
+            max_window (int): maximum number of requests in flight
+
+        Returns:
+            None
+        """
+        self.controller = RateController(self.transport, max_window)
+
+    def use_extraction(self, backend='bs4', cache=None):
+        """Set the extraction of the page info during the crawl.
+
+        Should be the backend and cache that are used to extract the info of
+        the pages after the crawl (see the extract_pages_info method of
+        ScrapeDB), so all pages are extracted alike. With a cache, the info
+        of a page is taken from the cache when available, and added to it
+        otherwise. The additions are committed at every checkpoint.
+
+        Args:
+            backend (str): 'bs4' or 'lxml'; None to not extract the info of
+                the pages during the crawl
+            cache (ExtractionCache): cache with the information of pages
+                extracted before
+
+        Returns:
+            None
+        """
+        self.extract_backend = backend
+        self.extract_cache = cache
+
+    def seed_from_sitemaps(self, sitemap_urls=None):
+        """Add all paths from the sitemaps of the site to the frontier.
+
+        The lastmod value of every path is kept in the lastmods attribute.
+        All paths are saved in the sitemap_paths table with their lastmod
+        value, if available. In an incremental crawl these values
+        determine which pages can be copied from the baseline without any
+        request (see the _unchanged_by_lastmod method).
+
+        Args:
+            sitemap_urls (list of str): url's of the sitemaps; if None, the
+                sitemaps from robots.txt, or else /sitemap.xml of the domain
+
+        Returns:
+            None
+        """
+        if not sitemap_urls:
+            if self.robots and self.robots.site_maps():
+                sitemap_urls = self.robots.site_maps()
+            else:
+                parts = urlsplit(self.root_url)
+                sitemap_urls = [f'{parts.scheme}://{parts.netloc}/sitemap.xml']
+
+        num_seeded = 0
+        with self.db.batch():
+            for sitemap_url in sitemap_urls:
+                for loc, lastmod in sitemap_entries(sitemap_url,
+                                                    self.transport):
+                    if not loc.startswith(self.root_url):
+                        continue
+                    path = loc[len(self.root_url):].partition('#')[0]
+                    if not path.startswith('/'):
+                        continue
+                    if lastmod:
+                        self.lastmods[path] = lastmod
+                    if lastmod or path not in self.lastmods:
+                        # also without lastmod, to seed a resumed crawl
+                        self.db.add_lastmod(path, lastmod)
+                    if self._queue_path(path, 1):
+                        num_seeded += 1
+        logging.info(f'{num_seeded} paths seeded from sitemaps')
+
+    def load_lastmods(self, db):
+        """Take the lastmod values of the sitemaps from a database.
+
+        Args:
+            db (ScrapeDB): database with the sitemap_paths table to take the
+                values from
+
+        Returns:
+            None
+        """
+        qry = '''
+            SELECT path, lastmod
+            FROM sitemap_paths
+            WHERE lastmod IS NOT NULL'''
+        self.lastmods = dict(db.exe(qry))
+
+    def _user_agent(self):
+        """Get the user agent that is used for the requests.
+
+        Returns:
+            str: value of the User-Agent header
+        """
+        return self.transport.session.headers.get('User-Agent', '*')
+
+    def _skip_request(self, req_path):
+        """Handle a path without request when possible.
+
+        A path is skipped when robots.txt disallows it, or when it can be
+        copied from the baseline based on its lastmod value.
+
+        Args:
+            req_path (str): requested path relative to root_url
+
+        Returns:
+            bool: True if the path is handled without a request
+        """
+        if self.robots and not self.robots.can_fetch(
+                self._user_agent(), self.root_url + req_path):
+            logging.debug(f'Path disallowed by robots.txt: {req_path}')
+            self.frontier.mark_done(req_path)
+            return True
+        if self._unchanged_by_lastmod(req_path):
+            self.db.copy_page(self.baseline, req_path)
+            self.frontier.mark_done(req_path)
+            self.num_done += 1
+            self.num_by_lastmod += 1
+            self._print_progress()
+            return True
+        return False
+
+    def _unchanged_by_lastmod(self, path):
+        """Check if a page is unchanged since the baseline by its lastmod.
+
+        This is the case when the path is a page in the baseline and its
+        lastmod value from the sitemap is equal to the one in the baseline,
+        or (if the baseline has none) is before the date of the baseline.
+
+        Args:
+            path (str): path relative to root_url
+
+        Returns:
+            bool: True if the page is unchanged
+        """
+        lastmod = self.lastmods.get(path)
+        if not (self.baseline and lastmod):
+            return False
+        if self.baseline.get_page_id(path) is None:
+            return False
+        base_lastmod = self.baseline.get_lastmod(path)
+        if base_lastmod:
+            return lastmod == base_lastmod
+        return lastmod[:10] < self._baseline_date
+
+    def crawl(self):
+        """Crawl the site by requesting one page at a time.
+
+        The results are written to the database in batches, which are
+        committed at least at every checkpoint.
+
+        Returns:
+            None
+        """
+        self.start_time = time.time()
+        with self.db.batch():
+            while self.frontier and self.num_done < self.max_paths:
+                self._crawl_path(self.frontier.pop())
+            self.checkpoint()
+
+    def _crawl_path(self, req_path):
+        """Request and process one path of a sequential crawl.
+
+        Args:
+            req_path (str): requested path relative to root_url
+
+        Returns:
+            None
+        """
+        if self._skip_request(req_path):
+            return
+        try:
+            scraped = self._fetch(req_path, self._cond_headers(req_path),
+                                  self._base_doc(req_path))
+        except PageNotModified as not_modified:
+            self._process_unchanged(req_path, not_modified)
+        except NonHtmlResource as resource:
+            self._process_resource(req_path, resource)
+        except RequestException:
+            # handled and logged in scrape_page; we consider this one done
+            self.frontier.mark_done(req_path)
+        else:
+            self._process_page(req_path, *scraped)
+        if self.controller:
+            self.controller.update()
+        self._checkpoint_if_due()
+
+    def crawl_concurrent(self, max_per_host=8):
+        """Crawl the site with concurrent requests.
+
+        The requests are executed by scrape_page in a pool of threads, so
+        redirects and aliases are handled exactly as in the sequential
+        crawl. The results are processed in the event loop one page at a
+        time, which keeps all database writes in the thread that owns the
+        database connection. These writes are committed in batches, as in
+        the sequential crawl.
+
+        Args:
+            max_per_host (int): maximum number of requests in flight per host
+
+        Returns:
+            None
+        """
+        with self.db.batch():
+            asyncio.run(self._crawl_async(max_per_host))
+
+    async def _crawl_async(self, max_per_host):
+        """Coroutine running the concurrent crawl.
+
+        Args:
+            max_per_host (int): maximum number of requests in flight per host
+
+        Returns:
+            None
+        """
+        loop = asyncio.get_running_loop()
+        host_slots = {}
+        in_flight = {}
+
+        async def fetch(req_path, cond_headers, base_doc):
+            host = urlsplit(self.root_url + req_path).netloc
+            slots = host_slots.setdefault(
+                host, asyncio.Semaphore(max_per_host))
+            async with slots:
+                return await loop.run_in_executor(
+                    executor, self._fetch, req_path, cond_headers, base_doc)
+
+        self.start_time = time.time()
+        with ThreadPoolExecutor(max_workers=max_per_host) as executor:
+            while self.frontier or in_flight:
+
+                # launch requests while there are free slots and paths to go
+                max_in_flight = (self.controller.limit() if self.controller
+                                 else max_per_host)
+                while (self.frontier
+                       and len(in_flight) < max_in_flight
+                       and self.num_done + len(in_flight) < self.max_paths):
+                    req_path = self.frontier.pop()
+                    if self._skip_request(req_path):
+                        continue
+                    task = asyncio.create_task(fetch(
+                        req_path, self._cond_headers(req_path),
+                        self._base_doc(req_path)))
+                    in_flight[task] = req_path
+                if not in_flight:
+                    break
+
+                # process the responses that are available
+                done, _ = await asyncio.wait(
+                    in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    req_path = in_flight.pop(task)
+                    if self.frontier.is_done(req_path):
+                        # handled via the redirects of another response
+                        # while in flight, so it is not counted again
+                        task.exception()
+                        continue
+                    try:
+                        scraped = task.result()
+                    except PageNotModified as not_modified:
+                        self._process_unchanged(req_path, not_modified)
+                    except NonHtmlResource as resource:
+                        self._process_resource(req_path, resource)
+                    except RequestException:
+                        # handled and logged in scrape_page; consider it done
+                        self.frontier.mark_done(req_path)
+                    else:
+                        self._process_page(req_path, *scraped)
+                    if self.controller:
+                        self.controller.update()
+                self._checkpoint_if_due()
+        self.checkpoint()
+
+    def _fetch(self, req_path, cond_headers, base_doc=None):
+        """Scrape and extract the page of a path.
+
+        When a redirect cache is available and holds a chain of redirects
+        for the path, only the final url of that chain is requested. The
+        cached hops are then added in front of the redirects that are
+        returned, so they are saved as if they were followed.
+
+        The information for the pages_info table and the editorial links of
+        a page within scope are extracted here, unless the page is identical
+        to the document of the path in the baseline, in which case it will
+        be copied with its information.
+
+        Since this method is run in worker threads of the concurrent crawl,
+        it should not access the scrape databases (the extraction cache can
+        be used from more than one thread).
+
+        Args:
+            req_path (str): requested path relative to root_url
+            cond_headers (dict[str, str]): headers for a conditional request
+            base_doc (str): document of the path in the baseline, if any
+
+        Returns:
+            (str, BeautifulSoup, str, list of (str, str, str), (str, str),
+                (dict, list of (str, str))|None): as returned by scrape_page,
+                extended with the extracted page info and editorial links
+        """
+        req_url, hops, verify = self.root_url + req_path, [], False
+        if self.redir_cache:
+            req_url, hops, verify = self.redir_cache.resolve(req_path)
+        try:
+            def_url, soup, string_doc, redirs, validators = scrape_page(
+                self.root_url, req_url, self.transport, cond_headers)
+        except (PageNotModified, NonHtmlResource) as not_page:
+            if verify:
+                self.redir_cache.verify(req_path, not_page.redirs)
+            not_page.redirs[:0] = hops
+            raise
+        if verify:
+            self.redir_cache.verify(req_path, redirs)
+        extracted = None
+        if (self.extract_backend and def_url.startswith(self.root_url)
+                and string_doc != base_doc):
+            extracted = self._extract(def_url[len(self.root_url):], soup,
+                                      string_doc)
+        return def_url, soup, string_doc, hops + redirs, validators, extracted
+
+    def _extract(self, path, soup, string_doc):
+        """Extract the page info and editorial links of a page.
+
+        Args:
+            path (str): path of the page relative to root_url
+            soup (BeautifulSoup): bs4 representation of the page
+            string_doc (str): complete page as string
+
+        Returns:
+            (dict, list of (str, str)): page info and editorial links
+        """
+        backend, cache = self.extract_backend, self.extract_cache
+        info = None
+        if cache:
+            sha256 = hashlib.sha256(string_doc.encode()).hexdigest()
+            info = cache.get(sha256, backend)
+        if info is None:
+            info = extract_info(string_doc, path, backend, soup)
+            if cache:
+                cache.add(sha256, backend, info)
+        return info, editorial_links(soup, self.root_url)
+
+    def _base_doc(self, req_path):
+        """Get the document of a path in the baseline.
+
+        Args:
+            req_path (str): requested path relative to root_url
+
+        Returns:
+            str|None: document of the definitive path in the baseline, None
+                if not available or not needed for the extraction
+        """
+        if not (self.baseline and self.extract_backend):
+            return None
+        base_page = self.baseline.get_page(
+            self.baseline.get_def_url(req_path))
+        return base_page[1] if base_page else None
+
+    def _cond_headers(self, req_path):
+        """Get the headers for a conditional request of a path.
+
+        Args:
+            req_path (str): requested path relative to root_url
+
+        Returns:
+            dict[str, str]|None: headers with the validators of the page in the
+                baseline, or None for an unconditional request
+        """
+        if not self.baseline or req_path in self._unconditional:
+            return None
+        return self.baseline.cond_headers(self.baseline.get_def_url(req_path))
+
+    def _process_page(self, req_path, def_url, soup, string_doc, redirs,
+                      validators, extracted):
+        """Save a scraped page with its redirects and register its links.
+
+        Args:
+            req_path (str): requested path relative to root_url
+            def_url (str): definitive url of the page
+            soup (BeautifulSoup): bs4 representation of the page
+            string_doc (str): complete page as string
+            redirs (list of (str, str, str)): redirects as returned by
+                scrape_page
+            validators ((str, str)): etag and last modified of the response
+            extracted ((dict, list of (str, str))|None): page info and
+                editorial links of the page; when None for a new page, the
+                info is extracted after the crawl
+
+        Returns:
+            None
+        """
+        root_url = self.root_url
+        depth = self.frontier.depth(req_path)
+
+        # if in scope, save page to db under the definitive path
+        def_url_parts = def_url.split(root_url)
+        if not def_url_parts[0]:
+            # url is within scope
+            def_path = def_url_parts[1]
+            base_page = None
+            if self.baseline:
+                base_page = self.baseline.get_page(def_path)
+            if base_page and base_page[1] == string_doc:
+                # identical to the baseline, so copy it with its info
+                self.db.copy_page(self.baseline, def_path)
+                self.num_unchanged += 1
+            else:
+                page_id = self.db.add_page(def_path, string_doc)
+                if page_id and extracted:
+                    info, ed_links = extracted
+                    self.db.add_page_info(page_id, info)
+                    self.db.add_raw_ed_links(page_id, ed_links)
+            self.db.add_validators(def_path, *validators)
+
+        self._save_redirs(req_path, redirs)
+        self.num_done += 1
+        self._add_links(soup, depth)
+        self._print_progress()
+
+    def _queue_path(self, path, depth, pagetype=None):
+        """Queue a path to be crawled.
+
+        Args:
+            path (str): path relative to root_url
+            depth (int): number of links between the start path and the path
+            pagetype (str): pagetype of the page that links to the path
+
+        Returns:
+            bool: True if the path was queued, False if it was seen already
+        """
+        return self.frontier.add(path, depth, pagetype)
+
+    def _add_links(self, soup, depth):
+        """Add the relevant links of a page to the paths to be crawled.
+
+        Links from header and footer are included to trace all pages. The
+        pagetype of the page is passed to the frontier as hint for the
+        priority of its links.
+
+        Args:
+            soup (BeautifulSoup): bs4 representation of the page
+            depth (int): number of links between the start path and the page
+
+        Returns:
+            None
+        """
+        pagetype = soup.body.get('data-pagetype') if soup.body else None
+        for l_text, l_path in page_links(soup, self.root_url, root_rel=True,
+                                         remove_anchor=True):
+            if not l_path.startswith('/'):
+                # link not in scope
+                continue
+            if l_path in self.frontier:
+                # already handled
+                continue
+            if l_path.endswith('.xml'):
+                logging.debug('Path ending in .xml: %s' % l_path)
+                continue
+            self._queue_path(l_path, depth + 1, pagetype)
+
+    def _process_unchanged(self, req_path, not_modified):
+        """Copy a page that was not modified since the baseline scrape.
+
+        The page is copied under its definitive path in the baseline, and
+        the alias leading to that path is saved as redirect. An unmodified
+        resource that is not an html page is copied from the baseline as
+        well. When the page is not available in the baseline after all, the
+        path is put back to be requested unconditionally.
+
+        Args:
+            req_path (str): requested path relative to root_url
+            not_modified (PageNotModified): exception raised by scrape_page
+
+        Returns:
+            None
+        """
+        root_url = self.root_url
+        redirs = not_modified.redirs
+        resp_path = re.sub(root_url, '', not_modified.resp_url)
+        def_path = self.baseline.get_def_url(resp_path)
+        resource = self.baseline.get_resource(resp_path)
+        if resource:
+            self.db.add_resource(resp_path, *resource)
+            self.db.add_validators(
+                resp_path, *self.baseline.get_validators(resp_path))
+            self.frontier.mark_done(resp_path)
+            self._save_redirs(req_path, redirs)
+            self.num_done += 1
+            self.num_unchanged += 1
+            self._print_progress()
+            return
+        if self.baseline.get_page_id(def_path) is None:
+            logging.warning(f'Unmodified page not in baseline: {resp_path}')
+            self._unconditional.add(req_path)
+            self.frontier.requeue(req_path)
+            return
+
+        if def_path != resp_path:
+            redirs.append(
+                (not_modified.resp_url, root_url + def_path, 'alias'))
+        self.db.copy_page(self.baseline, def_path)
+        self.frontier.mark_done(def_path)
+        self._save_redirs(req_path, redirs)
+        self.num_done += 1
+        self.num_unchanged += 1
+        self._print_progress()
+
+    def _process_resource(self, req_path, resource):
+        """Register a resource that is not an html page.
+
+        Only the type, size and hash of the resource are saved, together
+        with its validators and the redirects leading to it.
+
+        Args:
+            req_path (str): requested path relative to root_url
+            resource (NonHtmlResource): exception raised by scrape_page
+
+        Returns:
+            None
+        """
+        resp_path = re.sub(self.root_url, '', resource.resp_url)
+        if resp_path.startswith('/'):
+            # resource is within scope
+            self.db.add_resource(resp_path, resource.content_type,
+                                 resource.size, resource.sha256)
+            self.db.add_validators(resp_path, *resource.validators)
+            self.frontier.mark_done(resp_path)
+        self._save_redirs(req_path, resource.redirs)
+        self.num_done += 1
+        self._print_progress()
+
+    def _save_redirs(self, req_path, redirs):
+        """Update the frontier admin and save redirects to db.
+
+        Args:
+            req_path (str): requested path relative to root_url
+            redirs (list of (str, str, str)): redirects as returned by
+                scrape_page
+
+        Returns:
+            None
+        """
+        root_url = self.root_url
+        if redirs:
+            for req_url, red_url, redir_type in redirs:
+                i_req_path = re.sub(root_url, '', req_url)
+                red_path = re.sub(root_url, '', red_url)
+                if i_req_path.startswith('/'):
+                    self.frontier.mark_done(i_req_path)
+                if red_path.startswith('/'):
+                    self.frontier.mark_done(red_path)
+                self.db.add_redir(i_req_path, red_path, redir_type)
+        else:
+            self.frontier.mark_done(req_path)
+
+    def _checkpoint_if_due(self):
+        """Save the state of the crawl when enough paths were handled.
+
+        Returns:
+            None
+        """
+        if (self.checkpoint_every
+                and self.frontier.num_changed_done() >= self.checkpoint_every):
+            self.checkpoint()
+
+    def checkpoint(self):
+        """Save the state of the crawl in the database.
+
+        Only the paths that were added or handled since the previous
+        checkpoint are saved.
+
+        Returns:
+            None
+        """
+        new_todo, new_done = self.frontier.changes()
+        self.db.save_crawl_state(new_todo, new_done, self.num_done)
+        if self.extract_cache:
+            self.extract_cache.commit()
+        if self.controller and self.controller.history:
+            self.db.upd_par('rate_history', self.controller.history_str())
+
+    def resume(self):
+        """Restore the state of an interrupted crawl from the database.
+
+        The paths to be crawled and the handled paths are restored from the
+        last checkpoint. All paths of pages, redirects and resources that are
+        already stored in the database are considered handled, so they will
+        not be requested again. The links of pages that were stored after the
+        last checkpoint are extracted from the stored pages, since they might
+        not have been saved as paths to be crawled. The lastmod values of the
+        sitemaps are restored from the sitemap_paths table, so pages can
+        still be copied from the baseline by their lastmod.
+
+        When the crawl was interrupted before the first checkpoint, the paths
+        that were queued at its start (the start path, the paths of the
+        baseline and the paths from the sitemaps) are queued again, and all
+        handled paths are counted as done.
+
+        Returns:
+            None
+        """
+        todo, done, num_done, last_page_id = self.db.crawl_state()
+        initial_todo = []
+        if not (todo or done):
+            # interrupted before the first checkpoint
+            initial_todo, _ = self.frontier.changes()
+            qry = 'SELECT path FROM sitemap_paths'
+            initial_todo += [(path, 1) for (path,) in self.db.exe(qry)]
+        qry = '''
+            SELECT path FROM pages
+            UNION SELECT req_path FROM redirs
+            UNION SELECT redir_path FROM redirs
+            UNION SELECT path FROM resources'''
+        for (path,) in self.db.exe(qry):
+            if path.startswith('/'):
+                done.add(path)
+        self.frontier = Frontier()
+        self.frontier.restore(todo, done)
+        self.num_done = num_done
+        if initial_todo:
+            # added as changes, so they are saved at the next checkpoint
+            for path, depth in initial_todo:
+                self.frontier.add(path, depth)
+            self.num_done = len(done)
+        self.load_lastmods(self.db)
+
+        qry = 'SELECT path FROM pages WHERE page_id > ?'
+        late_paths = [row[0] for row in self.db.exe(qry, [last_page_id])]
+        for path in late_paths:
+            doc = self.db.get_page(path)[1]
+            self._add_links(BeautifulSoup(doc, features='lxml'),
+                            todo.get(path, 0))
+            if not initial_todo:
+                self.num_done += 1
+        self.checkpoint()
+        logging.info(f'Crawl resumed with {self.frontier.num_done()} paths '
+                     f'done and {len(self.frontier)} paths to go')
+
+    def _print_progress(self):
+        """Print progress and prognosis of the crawl every 25 pages.
+
+        Returns:
+            None
+        """
+        num_done = self.num_done
+        num_todo = min(len(self.frontier), self.max_paths - num_done)
+        if num_done % 25 == 0:
+            page_time = (time.time() - self.start_time) / num_done
+            togo_time = int(num_todo * page_time)
+            print(f'{num_done:4} done, {page_time:.2f} sec per page / '
+                  f'{num_todo:4} todo, '
+                  f'{togo_time//60}:{togo_time % 60:02} min togo')
+
+
+class ShardCrawler(SiteCrawler):
+    """Class encapsulating the crawl of one shard of a site.
+
+    The path space of the site is partitioned over a number of shards by a
+    hash of the paths (see shard_of). A shard crawler only crawls the paths
+    it owns and saves the results in its own, partial scrape database. Links
+    to paths that are owned by another shard are forwarded to the inbox of
+    that shard. All shard crawlers together share a lock, a flag per shard
+    to signal that it is idle and the number of forwarded paths that are not
+    yet received. The crawl of all shards is finished when every shard is
+    idle while no paths are underway.
+
+    Shard crawlers are run in separate processes by the crawl_sharded
+    function.
+    """
+
+    def __init__(self, shard, num_shards, inboxes, coordination, db, root_url,
+                 start_path, max_paths, **kwargs):
+        """Initiates the shard crawler object.
+
+        Args:
+            shard (int): number of the shard
+            num_shards (int): total number of shards
+            inboxes (list of multiprocessing.Queue): inbox per shard for the
+                forwarded paths
+            coordination (Lock, Array, Value): lock, idle flag per shard and
+                number of forwarded paths underway, shared by all shards
+            db (ScrapeDB): partial database to save the shard results to
+            root_url (str): url that will be treated as the base of the scrape
+            start_path (str): path relative to root_url where the crawl starts
+            max_paths (int): maximum number of paths to scrape by this shard
+            **kwargs: further arguments for SiteCrawler
+        """
+        self.shard = shard
+        self.num_shards = num_shards
+        # paths of the start and the baseline are queued by the owning shard
+        # itself, so nothing is forwarded during the initiation
+        self.inboxes = None
+        self._forwarded = set()
+        super().__init__(db, root_url, start_path, max_paths, **kwargs)
+        self.inboxes = inboxes
+        self._lock, self._idle, self._underway = coordination
+
+    def _queue_path(self, path, depth, pagetype=None):
+        """Queue a path to be crawled by the shard that owns it.
+
+        Args:
+            path (str): path relative to root_url
+            depth (int): number of links between the start path and the path
+            pagetype (str): pagetype of the page that links to the path
+
+        Returns:
+            bool: True if the path was queued or forwarded, False otherwise
+        """
+        owner = shard_of(path, self.num_shards)
+        if owner == self.shard:
+            return self.frontier.add(path, depth, pagetype)
+        if self.inboxes is None or path in self._forwarded:
+            return False
+        self._forwarded.add(path)
+        with self._lock:
+            self._underway.value += 1
+        self.inboxes[owner].put((path, depth, pagetype))
+        return True
+
+    def crawl(self):
+        """Crawl the paths of the shard by requesting one page at a time.
+
+        Returns:
+            None
+        """
+        self.start_time = time.time()
+        with self.db.batch():
+            while True:
+                self._receive()
+                if self.frontier and self.num_done < self.max_paths:
+                    self._crawl_path(self.frontier.pop())
+                elif self._all_idle():
+                    break
+            self.checkpoint()
+
+    def _receive(self, timeout=None):
+        """Queue all paths that are forwarded to this shard.
+
+        Args:
+            timeout (float): seconds to wait for a first path; None to only
+                take the paths that are available
+
+        Returns:
+            None
+        """
+        inbox = self.inboxes[self.shard]
+        while True:
+            try:
+                if timeout:
+                    path, depth, pagetype = inbox.get(timeout=timeout)
+                    timeout = None
+                else:
+                    path, depth, pagetype = inbox.get_nowait()
+            except queue.Empty:
+                return
+            self.frontier.add(path, depth, pagetype)
+            with self._lock:
+                self._underway.value -= 1
+                self._idle[self.shard] = 0
+
+    def _all_idle(self):
+        """Signal that this shard is idle and check if all shards are.
+
+        When not all shards are idle, this method waits a short while for
+        paths to be forwarded to this shard.
+
+        Returns:
+            bool: True if all shards are idle and no paths are underway
+        """
+        with self._lock:
+            self._idle[self.shard] = 1
+            if self._underway.value == 0 and all(self._idle):
+                return True
+        self._receive(timeout=0.5)
+        return False
+
+
+def read_robots(root_url, transport):
+    """Read the robots.txt rules of a site.
+
+    When robots.txt is not available (4xx response) all paths are allowed.
+    When it can not be read otherwise, all paths are allowed as well, while
+    a warning is logged.
+
+    Args:
+        root_url (str): url of the scrape; robots.txt is read from its domain
+        transport (Transport): transport for the request
+
+    Returns:
+        RobotFileParser: parsed rules
+    """
+    parts = urlsplit(root_url)
+    robots_url = f'{parts.scheme}://{parts.netloc}/robots.txt'
+    robots = RobotFileParser(robots_url)
+    try:
+        resp = transport.get(robots_url)
+    except RequestException:
+        resp = None
+    if resp is not None and resp.status_code == 200:
+        robots.parse(resp.text.splitlines())
+    else:
+        if resp is None or resp.status_code >= 500:
+            logging.warning(f'Could not read {robots_url}; all paths allowed')
+        robots.allow_all = True
+    return robots
+
+
+def sitemap_entries(sitemap_url, transport, max_depth=3):
+    """Generator of all url's and lastmod values from a sitemap.
+
+    The sitemap is streamed and parsed incrementally, so also very large
+    sitemaps do not have to be kept in memory. Gzipped sitemaps are
+    recognised by their content. In case of a sitemap index, the url's of all
+    nested sitemaps are yielded, up to a nesting of max_depth levels.
+
+    Args:
+        sitemap_url (str): url of a sitemap or sitemap index
+        transport (Transport): transport for the requests
+        max_depth (int): maximum nesting of sitemap indexes
+
+    Yields:
+        (str, str|None): url and lastmod value (None if not available)
+    """
+    try:
+        resp = transport.get(sitemap_url, stream=True)
+    except RequestException:
+        logging.warning(f'Sitemap could not be requested: {sitemap_url}')
+        return
+    if resp.status_code != 200:
+        logging.warning(f'Unexpected response from {sitemap_url}; '
+                        f'status code is {resp.status_code}.')
+        resp.close()
+        return
+
+    parser = ElementTree.XMLPullParser(events=('end',))
+    decompressor = None
+    nested_sitemaps = []
+    try:
+        for num, chunk in enumerate(resp.iter_content(chunk_size=64 * 1024)):
+            if num == 0 and chunk[:2] == b'\x1f\x8b':
+                # gzipped sitemap
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            transport.count_bytes(len(chunk))
+            if decompressor:
+                chunk = decompressor.decompress(chunk)
+            parser.feed(chunk)
+            for event, elem in parser.read_events():
+                tag = elem.tag.rpartition('}')[2]
+                if tag not in ('url', 'sitemap'):
+                    continue
+                loc = elem.findtext('{*}loc')
+                if loc and tag == 'url':
+                    yield loc.strip(), elem.findtext('{*}lastmod')
+                elif loc:
+                    nested_sitemaps.append(loc.strip())
+                elem.clear()
+        parser.close()
+    except (ElementTree.ParseError, zlib.error, RequestException) as err:
+        logging.warning(f'Sitemap {sitemap_url} could not be parsed: {err}')
+    finally:
+        resp.close()
+
+    for nested_url in nested_sitemaps:
+        if max_depth > 0:
+            yield from sitemap_entries(nested_url, transport, max_depth - 1)
+        else:
+            logging.warning(f'Sitemap nested too deep: {nested_url}')
+
+
+def shard_of(path, num_shards):
+    """Get the shard that owns a path in a sharded crawl.
+
+    The shard is determined by a hash of the path that is stable over
+    processes and machines (contrary to the builtin hash function).
+
+    Args:
+        path (str): path relative to root_url
+        num_shards (int): total number of shards
+
+    Returns:
+        int: number of the owning shard
+    """
+    return zlib.crc32(path.encode()) % num_shards
+
+
+def crawl_sharded(db, root_url, start_path, max_paths, num_shards, shard_dir,
+                  baseline_db=None, redir_cache_args=None, use_robots=False,
+                  use_sitemaps=False, transport_args=None, log_dir=None,
+                  extract_backend='bs4'):
+    """Crawl a site with a number of shard processes and merge the results.
+
+    Every shard is crawled by a ShardCrawler in its own process and with
+    its own transport, saving its results in a partial scrape database in
+    shard_dir. Links to paths of another shard are forwarded via a
+    multiprocessing queue. After all shards are finished, the partial
+    databases are merged into db (see merge_shards).
+
+    The sitemaps are read by shard 0, which queues (or forwards) their
+    paths. The other shards take the lastmod values from the partial
+    database of shard 0 after it has read the sitemaps.
+
+    On platforms that start processes by spawning instead of forking (like
+    Windows), the module calling this function should guard its code with
+    if __name__ == '__main__'.
+
+    Args:
+        db (ScrapeDB): database to merge the scrape results into
+        root_url (str): url that will be treated as the base of the scrape
+        start_path (str): path relative to root_url where the crawl starts
+        max_paths (int): maximum number of paths to scrape by all shards
+        num_shards (int): number of shards (and processes)
+        shard_dir (Path): directory for the partial databases
+        baseline_db (Path): scrape database of a previous scrape for an
+            incremental crawl
+        redir_cache_args ((Path, int, float)): scrape database, maximum age
+            and verify rate for a RedirectCache in every shard
+        use_robots (bool): respect the rules of robots.txt
+        use_sitemaps (bool): seed the crawl with the paths from the sitemaps
+        transport_args (dict): arguments for the Transport of every shard
+        log_dir (Path): directory of the log file that the shards log to
+        extract_backend (str): backend to extract the info of the pages
+            during the crawl (see the use_extraction method of SiteCrawler)
+
+    Returns:
+        list of Path: partial databases of the shards
+    """
+    if 'fork' in multiprocessing.get_all_start_methods():
+        mp = multiprocessing.get_context('fork')
+    else:
+        mp = multiprocessing.get_context()
+    inboxes = [mp.Queue() for _ in range(num_shards)]
+    coordination = (mp.Lock(), mp.Array('b', num_shards, lock=False),
+                    mp.Value('i', 0, lock=False))
+    shard_files = [shard_dir / f'shard-{shard}.db'
+                   for shard in range(num_shards)]
+    for shard_file in shard_files:
+        # left by an interrupted sharded crawl
+        shard_file.unlink(missing_ok=True)
+    shard_args = dict(
+        root_url=root_url, start_path=start_path,
+        max_paths=-(-max_paths // num_shards),
+        timestamp=db.get_par('timestamp'),
+        baseline_db=baseline_db, redir_cache_args=redir_cache_args,
+        use_robots=use_robots, use_sitemaps=use_sitemaps,
+        transport_args=transport_args or {}, log_dir=log_dir,
+        extract_backend=extract_backend, seed_db=shard_files[0],
+        seeded=mp.Event())
+
+    processes = []
+    for shard in range(num_shards):
+        process = mp.Process(
+            target=_crawl_shard, name=f'shard-{shard}',
+            args=(shard, num_shards, shard_files[shard], inboxes,
+                  coordination),
+            kwargs=shard_args)
+        process.start()
+        processes.append(process)
+    for process in processes:
+        process.join()
+        if process.exitcode:
+            logging.error(f'Crawl of {process.name} ended with exit code '
+                          f'{process.exitcode}')
+
+    merge_shards(db, shard_files)
+    return shard_files
+
+
+def _crawl_shard(shard, num_shards, db_file, inboxes, coordination, root_url,
+                 start_path, max_paths, timestamp, baseline_db,
+                 redir_cache_args, use_robots, use_sitemaps, transport_args,
+                 log_dir, extract_backend, seed_db, seeded):
+    """Crawl one shard of a site (target of a shard process).
+
+    See crawl_sharded for the arguments, next to:
+
+    - seed_db (Path): partial database of the shard that reads the sitemaps
+    - seeded (multiprocessing.Event): set when the sitemaps are read
+
+    Returns:
+        None
+    """
+    if log_dir:
+        setup_file_logging(log_dir, logging.getLogger().level or logging.INFO)
+    db = ScrapeDB(db_file, create=True)
+    db.upd_par('root_url', root_url)
+    db.upd_par('start_path', start_path)
+    db.upd_par('timestamp', timestamp)
+    db.upd_par('shard', f'{shard} of {num_shards}')
+    transport = Transport(**transport_args)
+    baseline = ScrapeDB(baseline_db) if baseline_db else None
+    redir_cache = None
+    if redir_cache_args:
+        cache_db = ScrapeDB(redir_cache_args[0])
+        redir_cache = RedirectCache(cache_db, root_url, *redir_cache_args[1:])
+        cache_db.close()
+
+    crawler = ShardCrawler(shard, num_shards, inboxes, coordination, db,
+                           root_url, start_path, max_paths,
+                           transport=transport, baseline=baseline,
+                           redir_cache=redir_cache)
+    crawler.use_extraction(extract_backend)
+    if use_robots:
+        crawler.use_robots()
+        # all shards together should respect the crawl delay
+        transport.min_interval *= num_shards
+    if use_sitemaps and shard == 0:
+        try:
+            crawler.seed_from_sitemaps()
+        finally:
+            seeded.set()
+    elif use_sitemaps:
+        # lastmods are needed to copy pages from the baseline without request
+        seeded.wait()
+        seed = ScrapeDB(seed_db)
+        crawler.load_lastmods(seed)
+        seed.close()
+    crawler.crawl()
+    logging.info(f'Crawl of shard {shard} finished with {crawler.num_done} '
+                 f'paths handled')
+    transport.close()
+    if baseline:
+        baseline.close()
+    db.close()
+
+
+def merge_shards(db, shard_files):
+    """Merge the partial databases of a sharded crawl into one database.
+
+    Pages are copied (see the copy_page method of ScrapeDB) in the order of
+    the shards and of their page_id's within a shard, getting new
+    consecutive page_id's in db. A page that was saved by more than one shard
+    (via a redirect to a path of another shard) is only copied once.
+    Redirects, resources, validators and sitemap paths of all shards are
+    added as well.
+
+    The ed_links table is not merged, since the links of the pages are
+    resolved over the complete scrape by the repop_ed_links method of
+    ScrapeDB, using the unresolved links that are copied with the pages.
+
+    Args:
+        db (ScrapeDB): database to merge into
+        shard_files (list of Path): partial databases of the shards
+
+    Returns:
+        None
+    """
+    db.create_pages_info(renew=False)
+    for shard_file in shard_files:
+        shard_db = ScrapeDB(shard_file)
+        paths = [row[0] for row in
+                 shard_db.exe('SELECT path FROM pages ORDER BY page_id')]
+        with db.transaction():
+            num_copied = 0
+            for path in paths:
+                if db.copy_page(shard_db, path):
+                    num_copied += 1
+            for req_path, redir_path, redir_type in shard_db.redirs():
+                db.add_redir(req_path, redir_path, redir_type)
+            qry = 'SELECT path, lastmod FROM sitemap_paths'
+            db.db_con.executemany('''
+                INSERT OR IGNORE INTO sitemap_paths (path, lastmod)
+                VALUES (?, ?)''', shard_db.exe(qry).fetchall())
+            qry = 'SELECT path, content_type, size, sha256 FROM resources'
+            db.db_con.executemany('''
+                INSERT OR IGNORE INTO resources
+                    (path, content_type, size, sha256)
+                VALUES (?, ?, ?, ?)''', shard_db.exe(qry).fetchall())
+            qry = 'SELECT path, etag, last_modified FROM validators'
+            db.db_con.executemany('''
+                INSERT OR IGNORE INTO validators (path, etag, last_modified)
+                VALUES (?, ?, ?)''', shard_db.exe(qry).fetchall())
+        shard_db.close()
+        logging.info(f'{num_copied} pages of {shard_file.name} merged '
+                     f'({len(paths) - num_copied} duplicates)')
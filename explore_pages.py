@@ -65,7 +65,8 @@ else:
 
 for case, path in cp_iter:
 
-    info = db.page_full_info(path)
+    info = db.page_full_info(
+        path, ['page_id', 'pagetype', 'ed_text', 'aut_text'])
     page_id = info['page_id']
     pagetype = info['pagetype']
     ed_text = info['ed_text']
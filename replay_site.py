@@ -0,0 +1,34 @@
+"""Replay a recorded site from a local http server (version 1.0).
+
+Serves the responses that were recorded in the archive of a scrape (see the
+'record' parameter of scrape_site.py), so the complete scrape pipeline can
+be run and benchmarked reproducibly, without network access and without
+burdening the real site. Latency and bandwidth of the server can be set to
+simulate the real site.
+
+To scrape the replayed site, set the 'root_url' parameter of scrape_site.py
+to the local server, e.g. 'http://localhost:8080/wps/wcm/connect'. The
+server runs until it is interrupted.
+"""
+
+import logging
+from pathlib import Path
+
+from archive_lib import ReplayServer
+
+# ============================================================================ #
+archive_file = 'archive.warc.gz'    # archive recorded by scrape_site.py
+port = 8080                         # port to serve the site on
+latency = 0.05                      # seconds before each response
+bandwidth = 1_000_000               # bytes per second per connection (or None)
+# ============================================================================ #
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(levelname)-8s - %(message)s')
+server = ReplayServer(Path(archive_file), port, latency, bandwidth)
+logging.info(f'Replaying on port {port} with latency {latency} s and '
+             f'bandwidth {bandwidth} bytes/s')
+try:
+    server.serve_forever()
+except KeyboardInterrupt:
+    server.server_close()
@@ -10,11 +10,28 @@ next files:
     'scrape.db': SQLite database with the results of the scrape
     'scrape.db-<nn>.txt': parts of scrape.db for text-based transmission
     'log.txt': a scrape log with info, warnings and/or errors of the scrape
+        (no warnings of the extraction of pages that were taken from the
+        extraction cache)
+    'archive.warc.gz': all responses of the crawl when the 'record' parameter
+        is True (to be replayed with replay_site.py)
 
 Depending on the actual value of the (bool) parameter 'publish', the directory
 will be moved to the publication destination (actual value of 'publ_dir'
 parameter).
 
+The information extracted from the pages is cached in 'extraction_cache.db'
+at the location from where this module is executed (unless the parameter
+'extract_cache_mb' is 0), so the information of pages that did not change
+since a previous scrape is not extracted again. The cache is used while
+crawling, except for a sharded crawl, of which the information of the pages
+is extracted after the crawl.
+
+During the crawl its state is saved in the database at regular intervals.
+When a scrape is interrupted, it can be continued by running this module with
+the 'resume_dir' parameter set to the directory of that scrape. Pages and
+redirects that are already stored will then not be requested again. This is
+not possible for a sharded crawl, which will be restarted in that case.
+
 The scrape database contains the next tables (all paths are relative to the
 root_url of a scrape):
 
@@ -25,14 +42,54 @@ root_url of a scrape):
     table pages, with columns:
         page_id (integer): key to a specific page
         path (text): path of a page
-        doc (zlib compressed utf-8 encoded text): complete response from the
-            page-request for later extraction of data and other information
+        doc (zlib or zstd compressed utf-8 encoded text): complete response
+            from the page-request for later extraction of data and other
+            information
+
+    table zstd_dicts (when parameter zstd_docs is True), with columns:
+        dict_id (integer): id of a zstd dictionary
+        dict (blob): dictionary to decompress zstd compressed documents
 
     table redirs, with columns:
         req_path (text): requested path
         redir_path (text): path to where the request was directed
         type (text): nature of the redirect
 
+    table raw_ed_links, with columns:
+        page_id (integer): page_id of the page containing the link
+        link_text (text): text of the link
+        link_url (text): url of the link as extracted, not yet resolved to a
+            page (no url for a page without editorial links)
+
+    table resources (in scope, but no html page), with columns:
+        path (text): path of the resource
+        content_type (text): Content-Type header of the response
+        size (integer): number of bytes of the resource
+        sha256 (text): SHA-256 hash of the resource
+
+    table validators, with columns:
+        path (text): path of a page
+        etag (text): ETag header of the response
+        last_modified (text): Last-Modified header of the response
+
+    table def_paths (built after the crawl), with columns:
+        req_path (text): requested path (of a page or a redirect)
+        def_path (text): definitive path or url after all redirects
+        page_id (integer): page_id of def_path, if it is a page
+        hops (integer): number of redirects from req_path to def_path
+        chain_type (text): types of these redirects separated by commas
+        cycle (integer): 1 if the redirects loop
+        def_redirected (integer): 1 if def_path gets redirected itself
+
+    table sitemap_paths, with columns:
+        path (text): path from a sitemap of the site
+        lastmod (text): last modification according to the sitemap (if
+            available)
+
+    table crawl_paths (only filled during the crawl), with columns:
+        path (text): path that is to be crawled or is handled
+        status (text): 'todo' or 'done'
+
     When parameter add_info is True, the next table and view are created also:
 
     table pages_info, with columns
@@ -53,128 +110,217 @@ root_url of a scrape):
 """
 
 import time
-import re
 import logging
-from requests import RequestException
 from pathlib import Path
 
-from scraper_lib import ScrapeDB, setup_file_logging
-from scraper_lib import scrape_page, page_links
+from scraper_lib import ScrapeDB, Transport, ExtractionCache, \
+    setup_file_logging
+from archive_lib import ArchiveWriter
+from crawl_lib import SiteCrawler, RedirectCache, crawl_sharded
 from bd_viauu import bintouu, split_uufile
 
 # ============================================================================ #
 root_url = 'https://www.belastingdienst.nl/wps/wcm/connect'
 start_path = '/nl/home'
 max_paths = 15000           # total some 10000 actual (paths, not pages)
+crawl_mode = 'sequential'   # 'sequential', 'concurrent' or 'sharded'
+max_per_host = 8            # requests in flight per host (concurrent mode)
+adaptive_rate = False       # adapt requests in flight or rate to the server
+num_shards = 4              # number of crawl processes (sharded mode)
+timeouts = (5, 30)          # connect and read timeout in seconds
+max_retries = 3             # retries for 5xx responses and failed connections
+baseline_db = ''            # scrape.db of previous scrape for incremental mode
+checkpoint_every = 250      # paths handled between saves of the crawl state
+resume_dir = ''             # directory of an interrupted scrape to continue
+redir_cache_db = ''         # scrape.db with redirects to follow without request
+redir_max_age = 30          # days after which redir_cache_db is not used
+redir_verify_rate = 0.05    # fraction of cached redirects that is verified
+use_robots = False          # respect the rules of robots.txt
+use_sitemaps = False        # seed the crawl with the paths from the sitemaps
+record = False              # archive.warc.gz of all responses (not sharded)
+commit_every = 1000         # database writes per commit
+wal_mode = False            # write-ahead logging for the database
+zstd_docs = False           # zstd compression of pages with a dictionary
 links_table = True          # populate links table
 add_info = True             # add and populate pages_info table
+num_workers = 4             # processes to extract the info of the pages
+extract_backend = 'lxml'    # 'bs4' or 'lxml' to extract the info of the pages
+extract_cache_mb = 500      # size of the cache of extracted info (0: no cache)
 publish = True              # move the scrape results to publ_dir
 publ_dir = '/var/www/bds/scrapes'
 # ============================================================================ #
 
-# setup output and database
-timestamp = time.strftime('%y%m%d-%H%M')
-scrape_dir = Path(f'{timestamp} - bd-scrape')
-scrape_dir.mkdir()
-publ_dir = Path(publ_dir) / scrape_dir.stem
-db_file = scrape_dir / 'scrape.db'
-db = ScrapeDB(db_file, create=True)
-db.upd_par('root_url', root_url)
-db.upd_par('start_path', start_path)
-db.upd_par('timestamp', timestamp)
-
-# setup logging; all log messages go to file, console receives warnings and
-# higher severity messages
-setup_file_logging(scrape_dir, log_level=logging.INFO)
-console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.WARNING)
-console_handler.setFormatter(
-    logging.Formatter('%(levelname)-8s - %(message)s'))
-logging.getLogger('').addHandler(console_handler)
-
-# initialize some variables
-paths_todo = {start_path}
-paths_done = set()
-num_done = 0
-
-start_time = time.time()
-logging.info('Site scrape started')
-logging.info(f'    root_url: {root_url}')
-logging.info(f'    start_path: {start_path}')
-
-while paths_todo and num_done < max_paths:
-
-    # scrape page
-    req_path = paths_todo.pop()
-    try:
-        req_url = root_url + req_path
-        def_url, soup, string_doc, redirs = scrape_page(root_url, req_url)
-    except RequestException:
-        # handled and logged in scrape_page function; we consider this one done
-        paths_done.add(req_path)
-        continue
-
-    # if in scope, save page to db under the definitive path
-    def_url_parts = def_url.split(root_url)
-    if not def_url_parts[0]:
-        # url is within scope
-        def_path = def_url_parts[1]
-        page_id = db.add_page(def_path, string_doc)
-
-    # update paths_done admin and save redirects to db
-    if redirs:
-        for req_url, red_url, redir_type in redirs:
-            req_path = re.sub(root_url, '', req_url)
-            red_path = re.sub(root_url, '', red_url)
-            if req_path.startswith('/'):
-                paths_done.add(req_path)
-            if red_path.startswith('/'):
-                paths_done.add(red_path)
-            db.add_redir(req_path, red_path, redir_type)
+# the multiprocessing of the crawl and the extraction might import this
+# module again in its processes
+if __name__ == '__main__':
+
+    # setup output and database
+    if resume_dir:
+        # continue in the directory and database of the interrupted scrape
+        scrape_dir = Path(resume_dir)
+        db_file = scrape_dir / 'scrape.db'
+        db = ScrapeDB(db_file, commit_every=commit_every, wal=wal_mode)
+        root_url = db.get_par('root_url')
+        start_path = db.get_par('start_path')
+        timestamp = db.get_par('timestamp')
+    else:
+        timestamp = time.strftime('%y%m%d-%H%M')
+        scrape_dir = Path(f'{timestamp} - bd-scrape')
+        scrape_dir.mkdir()
+        db_file = scrape_dir / 'scrape.db'
+        db = ScrapeDB(db_file, create=True, commit_every=commit_every,
+                      wal=wal_mode)
+        db.upd_par('root_url', root_url)
+        db.upd_par('start_path', start_path)
+        db.upd_par('timestamp', timestamp)
+    publ_dir = Path(publ_dir) / scrape_dir.stem
+
+    # setup logging; all log messages go to file, console receives warnings and
+    # higher severity messages
+    setup_file_logging(scrape_dir, log_level=logging.INFO)
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.WARNING)
+    console_handler.setFormatter(
+        logging.Formatter('%(levelname)-8s - %(message)s'))
+    logging.getLogger('').addHandler(console_handler)
+
+    start_time = time.time()
+    logging.info(
+        'Site scrape resumed' if resume_dir else 'Site scrape started')
+    logging.info(f'    root_url: {root_url}')
+    logging.info(f'    start_path: {start_path}')
+    logging.info(f'    crawl_mode: {crawl_mode}')
+    logging.info(f'    use_robots: {use_robots}')
+    logging.info(f'    use_sitemaps: {use_sitemaps}')
+
+    # scope of the crawl, to compare scrapes with different scopes
+    db.upd_par('use_robots', int(use_robots))
+    db.upd_par('use_sitemaps', int(use_sitemaps))
+
+    baseline = None
+    if baseline_db:
+        baseline = ScrapeDB(Path(baseline_db))
+        db.upd_par('baseline', baseline.get_par('timestamp'))
+        logging.info(f'    baseline: {baseline.get_par("timestamp")}')
+        baseline_dict = baseline.get_zstd_dict()
+        if zstd_docs and baseline_dict and not resume_dir:
+            # compress with the dictionary of the pages copied from the
+            # baseline
+            db.use_zstd_dict(baseline_dict)
+    # by default the redirects of the baseline are used
+    redir_cache_db = redir_cache_db or baseline_db
+
+    # the cache is kept next to the scrape directories
+    cache = None
+    if extract_cache_mb:
+        cache = ExtractionCache(scrape_dir.parent, max_mb=extract_cache_mb)
+
+    if db.get_par('crawl_status') == 'finished':
+        logging.info('Crawl was finished already')
+    elif crawl_mode == 'sharded':
+        # a sharded crawl can not be resumed, so it will be restarted
+        db.upd_par('crawl_status', 'crawling')
+        db.upd_par('crawl_mode', f'sharded ({num_shards} shards)')
+        redir_cache_args = None
+        if redir_cache_db:
+            redir_cache_args = (Path(redir_cache_db), redir_max_age,
+                                redir_verify_rate)
+        shard_files = crawl_sharded(
+            db, root_url, start_path, max_paths, num_shards, scrape_dir,
+            baseline_db=Path(baseline_db) if baseline_db else None,
+            redir_cache_args=redir_cache_args,
+            use_robots=use_robots, use_sitemaps=use_sitemaps,
+            transport_args=dict(connect_timeout=timeouts[0],
+                                read_timeout=timeouts[1],
+                                max_retries=max_retries),
+            log_dir=scrape_dir,
+            # the shard processes can not share the cache
+            extract_backend=None if cache else extract_backend)
+        for shard_file in shard_files:
+            shard_file.unlink()
+        db.upd_par('crawl_status', 'finished')
     else:
-        paths_done.add(req_path)
-    num_done += 1
-
-    # add relevant links to paths_todo list (include links from header and
-    # footer to trace all pages)
-    for l_text, l_path in page_links(soup, root_url, root_rel=True,
-                                     remove_anchor=True):
-        if not l_path.startswith('/'):
-            # link not in scope
-            continue
-        if l_path in (paths_todo | paths_done):
-            # already handled
-            continue
-        if l_path.endswith('.xml'):
-            logging.debug('Path ending in .xml: %s' % l_path)
-            continue
-        paths_todo.add(l_path)
-
-    # time cycles and print progress and prognosis
-    num_todo = min(len(paths_todo), max_paths - num_done)
-    if num_done % 25 == 0:
-        page_time = (time.time() - start_time) / num_done
-        togo_time = int(num_todo * page_time)
-        print(f'{num_done:4} done, {page_time:.2f} sec per page / {num_todo:4} '
-              f'todo, {togo_time//60}:{togo_time % 60:02} min togo')
-
-elapsed = int(time.time() - start_time)
-logging.info(f'Site scrape finished in {elapsed//60}:{elapsed % 60:02} min')
-logging.info(f'    pages: {db.num_pages()}')
-
-if links_table:
-    db.repop_ed_links()
-
-if add_info:
-    db.extract_pages_info()
-    db.derive_pages_info()
-
-db.close()
-
-if publish:
-    # prepare database for publication
-    uu_file = bintouu(db_file)
-    split_uufile(uu_file, max_mb=30)
-
-    # publish results
-    scrape_dir.replace(publ_dir)
+        archive = None
+        if record:
+            archive = ArchiveWriter(scrape_dir / 'archive.warc.gz')
+        transport = Transport(pool_size=max(max_per_host, 1),
+                              connect_timeout=timeouts[0],
+                              read_timeout=timeouts[1],
+                              max_retries=max_retries,
+                              archive=archive)
+        redir_cache = None
+        if redir_cache_db:
+            cache_db = ScrapeDB(Path(redir_cache_db))
+            redir_cache = RedirectCache(cache_db, root_url, redir_max_age,
+                                        redir_verify_rate)
+            cache_db.close()
+        crawler = SiteCrawler(db, root_url, start_path, max_paths, transport,
+                              baseline, checkpoint_every, redir_cache)
+        crawler.use_extraction(extract_backend, cache)
+        if use_robots:
+            crawler.use_robots()
+        if adaptive_rate:
+            # a sequential crawl is paced by the interval between requests
+            crawler.use_rate_control(
+                max_per_host if crawl_mode == 'concurrent' else 1)
+        db.upd_par('adaptive_rate', int(adaptive_rate))
+        if resume_dir:
+            crawler.resume()
+        elif use_sitemaps:
+            crawler.seed_from_sitemaps()
+        db.upd_par('crawl_status', 'crawling')
+        if crawl_mode == 'concurrent':
+            db.upd_par('crawl_mode', f'concurrent ({max_per_host} per host)')
+            crawler.crawl_concurrent(max_per_host)
+        else:
+            db.upd_par('crawl_mode', 'sequential')
+            crawler.crawl()
+        db.upd_par('crawl_status', 'finished')
+        db.clear_crawl_state()
+        if baseline:
+            logging.info(f'Pages copied from baseline: '
+                         f'{crawler.num_unchanged} after a request, '
+                         f'{crawler.num_by_lastmod} by their sitemap lastmod')
+        transport.log_stats()
+        if redir_cache:
+            redir_cache.log_stats()
+        transport.close()
+        if archive:
+            logging.info(f'{archive.num_records} responses recorded')
+            archive.close()
+
+    elapsed = int(time.time() - start_time)
+    logging.info(
+        f'Site scrape finished in {elapsed//60}:{elapsed % 60:02} min')
+    logging.info(f'    pages: {db.num_pages()}')
+    if baseline:
+        baseline.close()
+
+    if zstd_docs and db.get_par('doc_codec') != 'zstd':
+        # no dictionary from the baseline, so train one on the scraped pages
+        db.train_zstd_dict()
+        db.recompress_pages()
+
+    # definitive paths of all requested paths, for the links and later use
+    db.build_def_paths()
+
+    if links_table:
+        db.repop_ed_links()
+
+    if add_info:
+        # only pages of which the info was not extracted during the crawl
+        db.extract_pages_info(renew=False, num_workers=num_workers,
+                              backend=extract_backend, cache=cache)
+        db.derive_pages_info()
+    if cache:
+        cache.close()
+
+    db.close()
+
+    if publish:
+        # prepare database for publication
+        uu_file = bintouu(db_file)
+        split_uufile(uu_file, max_mb=30)
+
+        # publish results
+        scrape_dir.replace(publ_dir)
@@ -2,16 +2,30 @@
 
 Classes in this module:
 
+- PageNotModified: exception for a conditionally requested, unmodified page
+- NonHtmlResource: exception for a requested url that is not an html page
+- FieldExtractor: declaration of a field extracted for the pages_info table
 - ScrapeDB: encapsulation of an SQLite scrape database
+- PageRow: fields of a page as mapping, decompressing the doc when accessed
+- BlobStore: content-addressed store of page documents shared by scrapes
+- ExtractionCache: persistent cache of the information extracted from pages
+- Transport: pooled http transport with retries, timeouts and statistics
 
 Functions in this module:
 
 - setup_file_logging: enable uniform logging for all modules
+- default_transport: return the transport shared within the module
 - scrape_page: scrape an html page and create an bs4 representation of it
 - page_links: retrieve all links from the body of a page
 - content_trees: return two html trees with editorial and automated content
 - flatten_tagbranch_to_navstring: reduce complete tag branch to NavigableString
 - get_text: retrieve essential editorial and automated text content from a page
+- extract_page_info: extract the information of a page for pages_info table
+- parse_page_lxml: parse a page for the lxml backend of the extraction
+- extract_page_info_lxml: extract the information of a page using lxml
+- extract_info: extract the information of a page with one of the backends
+- extract_page_metadata: extract the metadata fields of a page from its head
+- editorial_links: retrieve all links from the editorial content of a page
 - scrape_dirs: generator of scrape directories over a range of timestamps
 - update_scrapes_table: update or repopulate the scrapes table in the master db
 - page_figures: get typical figures from all pages
@@ -19,25 +33,51 @@ Functions in this module:
 - dimensions: get dimensional totals for a scrape
 - master_figures: add typical figures to the master db for a range of scrapes
 - compile_history: compile history of page changes within the master database
+- store_page_blobs: move the documents of a range of scrapes to the blob store
 
 Module public constants:
 
 - dv_types, bib_types, alg_types: sets of pagetypes that are considered to
     belong to a specific page category
+- page_info_extractors: registry of the extracted fields of the pages_info
+    table
+- metadata_extractors: the page_info_extractors of the metadata fields
 """
 
 import re
 import copy
+import hashlib
+import inspect
+import json
 import logging
+import multiprocessing
 import requests
 import sqlite3
+import threading
 import zlib
 import time
+from contextlib import contextmanager
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util import Retry, make_headers
 from datetime import date, datetime, timedelta
 from pathlib import Path
-from typing import Dict, Union
+from collections import deque
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urljoin
+from typing import Callable, Dict, NamedTuple, Union
+import bs4
 from bs4 import BeautifulSoup
+from bs4.builder import HTMLTreeBuilder
+from lxml import etree
+import lxml.html
 from bs4.element import NavigableString, Tag, Comment, Script, Stylesheet
+try:
+    import zstandard
+except ImportError:
+    # pages can only be compressed with zlib
+    zstandard = None
 
 dv_types = {'bld-filter', 'bld-dv-content'}
 bib_types = {'bld-bd', 'bld-cluster', 'bld-direction', 'bld-landing',
@@ -46,10 +86,130 @@ bib_types = {'bld-bd', 'bld-cluster', 'bld-direction', 'bld-landing',
              'bld-concept', 'bld-faq'}
 alg_types = {'bld-outage', 'bld-newsItem', 'bld-iahWrapper'}
 
-_re_domain = re.compile(r'^https?://([\w-]*\.)*[\w-]*(?=/)')
+_re_domain = re.compile(r'^https?://([\w-]*\.)*[\w-]*(:\d+)?(?=/)')
 _re_path = re.compile(r'^/[^/]')
 _re_network_path = re.compile(r'^//[^/]')
 _re_protocol = re.compile(r'^[a-z]{3,6}:')
+_zstd_magic = b'\x28\xb5\x2f\xfd'
+_blob_ref = b'sha256:'
+
+
+class PageNotModified(Exception):
+    """Raised when a conditionally requested page is not modified.
+
+    Attributes:
+        resp_url (str): url of the response that reported the page unmodified
+        redirs (list of (str, str, str)): redirects leading to that response
+    """
+
+    def __init__(self, resp_url, redirs):
+        super().__init__(resp_url)
+        self.resp_url = resp_url
+        self.redirs = redirs
+
+
+class NonHtmlResource(Exception):
+    """Raised when a requested url responds with something else than html.
+
+    The body of the response is not kept, but its size and hash are.
+
+    Attributes:
+        resp_url (str): url of the response
+        content_type (str): Content-Type header of the response
+        size (int): number of bytes of the body
+        sha256 (str): hexadecimal SHA-256 hash of the body
+        validators ((str, str)): etag and last modified of the response
+        redirs (list of (str, str, str)): redirects leading to the response
+    """
+
+    def __init__(self, resp_url, content_type, size, sha256, validators,
+                 redirs):
+        super().__init__(resp_url)
+        self.resp_url = resp_url
+        self.content_type = content_type
+        self.size = size
+        self.sha256 = sha256
+        self.validators = validators
+        self.redirs = redirs
+
+
+class FieldExtractor(NamedTuple):
+    """Declaration of a field of the pages_info table extracted from a page.
+
+    The value of a field is found in the first tag (or all tags) of a page
+    that matches the tag name and attributes of the declaration, optionally
+    only within the <head> of the page. It is the text of the tag or the
+    value of one of its attributes, converted by the transform function.
+    Fields without tag name are the editorial or automated text of a page
+    (ed_text or aut_text, see the get_text function).
+
+    It is logged when no tag (or attribute) is found, when the value is
+    empty, or when the transform function raises a ValueError for the value,
+    in which case the value of the field becomes None.
+    """
+    name: str
+    sql_type: str
+    tag: str = None             # tag name to match, '*' for any tag
+    attrs: dict = None          # attribute name:value pairs to match
+    in_head: bool = False       # match only tags within <head>
+    attr: str = None            # attribute with the value, None for the text
+    all_tags: bool = False      # value is a list of all matching tags
+    transform: Callable = None  # conversion of the value when found
+    missing: str = None         # message when no tag or attribute is found
+    empty: str = None           # message for an empty value
+    invalid: str = None         # message for a ValueError of the transform
+    log_level: int = logging.WARNING    # level of the missing message
+
+
+def _first_value(values):
+    return values[0] if values else None
+
+
+def _joined_values(values):
+    return ' '.join(values) if values else None
+
+
+# registry of the extracted fields of the pages_info table
+page_info_extractors = [
+    FieldExtractor(
+        'title', 'TEXT', 'title', in_head=True,
+        missing='Page has no <title> tag',
+        empty='Page with empty title'),
+    FieldExtractor(
+        'description', 'TEXT', '*', {'name': 'description'}, in_head=True,
+        attr='content',
+        # there are more then 800 occurences of this situation
+        # TODO: log missing description as warning when this is
+        #       a rare exception only
+        missing='Page has no <meta name="description"/> tag',
+        log_level=logging.DEBUG,
+        empty='Page with empty description'),
+    FieldExtractor(
+        'num_h1s', 'INTEGER', 'h1', all_tags=True, transform=len,
+        missing='Page without h1'),
+    FieldExtractor(
+        'first_h1', 'TEXT', 'h1', all_tags=True, transform=_first_value),
+    FieldExtractor(
+        'language', 'TEXT', 'meta', {'name': 'language'}, in_head=True,
+        attr='content',
+        missing='Page has no <meta name="language"/> tag',
+        empty='Page with empy language'),
+    FieldExtractor(
+        'modified', 'DATE', 'meta', {'name': 'DCTERMS.modified'},
+        in_head=True, attr='content', transform=date.fromisoformat,
+        missing='Page has no tag <meta name="DCTERMS.modified"/>',
+        invalid='Page with improper modification date'),
+    FieldExtractor(
+        'pagetype', 'TEXT', 'body', attr='data-pagetype',
+        missing='Page has no data-pagetype attribute in the <body> tag',
+        empty='Page with empty pagetype in <body> tag'),
+    FieldExtractor(
+        'classes', 'TEXT', 'body', attr='class', transform=_joined_values,
+        missing='Page has no class attribute in the <body> tag',
+        empty='Page with empty class in <body> tag'),
+    FieldExtractor('ed_text', 'TEXT'),
+    FieldExtractor('aut_text', 'TEXT')
+]
 
 
 class ScrapeDB:
@@ -58,46 +218,69 @@ class ScrapeDB:
     All actions on the scrape database are handled via the class methods.
 
     Class constants define some of the class behaviour.
+
+    By default every write is committed on its own. To save the cost of a
+    journal sync per row, writes can be grouped in one transaction (see the
+    transaction method) or in batches that are committed at a regular
+    interval (see the batch method).
+
+    The documents of the pages are compressed with zlib, or with zstd using
+    a dictionary that is trained on a sample of the pages and stored in the
+    zstd_dicts table (see the train_zstd_dict method). The compression is
+    recognised per document, so databases with zlib compressed documents
+    remain readable, and documents with both compressions can be mixed. The
+    'doc_codec' parameter registers the compression of new documents.
+
+    Documents can also be moved to the BlobStore next to the master database
+    (see the move_docs_to_blob_store method), in which case the pages table
+    only holds references to the documents in that store. These references
+    are resolved transparently. The export method creates a self-contained
+    copy of such a database.
     """
 
-    version = '2.8'
-    extracted_fields = [
-        ('title', 'TEXT'),
-        ('description', 'TEXT'),
-        ('num_h1s', 'INTEGER'),
-        ('first_h1', 'TEXT'),
-        ('language', 'TEXT'),
-        ('modified', 'DATE'),
-        ('pagetype', 'TEXT'),
-        ('classes', 'TEXT'),
-        ('ed_text', 'TEXT'),
-        ('aut_text', 'TEXT')
-    ]
+    version = '2.9'
+    extracted_fields = [(e.name, e.sql_type) for e in page_info_extractors]
     derived_fields = [
         ('business', 'TEXT'),
         ('category', 'TEXT')
     ]
+    zstd_level = 10
+    extraction_backends = ('bs4', 'lxml')
 
-    def __init__(self, db_file, create=False, version_check=True):
+    def __init__(self, db_file, create=False, version_check=True,
+                 commit_every=1000, wal=False):
         """Initiates the database object that encapsulates a scrape database.
 
         Writes the database version in the parameters table while creating a
         database. Reports an error if a database is opened with an incompatible
         version.
 
+        In WAL mode a commit does not sync the database file itself, which
+        makes commits cheaper on slow disks. The database is reset to the
+        default journal mode when it is closed, so it remains a single file.
+
         Args:
             db_file (Path): name or path of the database file
             create (bool): create & connect database if True, else just connect
             version_check (bool): disable version check if False
+            commit_every (int): default number of writes per commit in a batch
+            wal (bool): use write-ahead logging while connected
         """
         self.db_file = db_file
         self.db_con = sqlite3.connect(self.db_file, isolation_level=None)
         self.exe = self.db_con.execute
+        self.commit_every = commit_every
+        self._batch_size = 0
+        self._num_writes = 0
 
         # next pragma's might improve query speed when db is on a network drive
         # (first indication is not positive)
         # self.exe('PRAGMA synchronous = OFF')
         # self.exe('PRAGMA journal_mode = PERSIST')
+        self.wal = wal
+        if wal:
+            self.exe('PRAGMA journal_mode = WAL')
+            self.exe('PRAGMA synchronous = NORMAL')
 
         if create:
             self.exe('''
@@ -129,6 +312,38 @@ class ScrapeDB:
                     FROM ed_links AS l
                         JOIN pages AS p1 USING (page_id) 
                         LEFT JOIN pages AS p2 ON link_id = p2.page_id''')
+            self.exe('''
+                CREATE TABLE raw_ed_links (
+                    page_id   INTEGER NOT NULL,
+                    link_text TEXT,
+                    link_url  TEXT)''')
+            self.exe('''
+                CREATE INDEX idx_raw_ed_links_page_id
+                    ON raw_ed_links (page_id)''')
+            self.exe('''
+                CREATE TABLE resources (
+                    path         TEXT PRIMARY KEY NOT NULL UNIQUE,
+                    content_type TEXT,
+                    size         INTEGER,
+                    sha256       TEXT)''')
+            self.exe('''
+                CREATE TABLE validators (
+                    path          TEXT PRIMARY KEY NOT NULL UNIQUE,
+                    etag          TEXT,
+                    last_modified TEXT)''')
+            self.exe('''
+                CREATE TABLE sitemap_paths (
+                    path    TEXT PRIMARY KEY NOT NULL UNIQUE,
+                    lastmod TEXT)''')
+            self.exe('''
+                CREATE TABLE crawl_paths (
+                    path   TEXT PRIMARY KEY NOT NULL UNIQUE,
+                    status TEXT NOT NULL,
+                    depth  INTEGER)''')
+            self.exe('''
+                CREATE TABLE zstd_dicts (
+                    dict_id INTEGER PRIMARY KEY NOT NULL UNIQUE,
+                    dict    BLOB NOT NULL)''')
             self.exe('''
                 CREATE TABLE parameters (
                     name  TEXT PRIMARY KEY NOT NULL UNIQUE,
@@ -144,290 +359,1153 @@ class ScrapeDB:
                 raise sqlite3.DatabaseError(
                     f'Incompatible database version: {db_version}')
 
+        # setup compression of the documents
+        self._compressor = None
+        self._decompressors = {}
+        self._blob_store = None
+        if self.get_par('doc_codec') == 'zstd':
+            self._use_zstd_dict(self.get_par('zstd_dict_id'))
+
+        # definitive paths are looked up when materialised
+        self._has_def_paths = self.has_table('def_paths')
+
     def close(self):
         """Close the connection to the database.
 
         Returns:
             None
         """
+        if self.db_con.in_transaction:
+            self.exe('COMMIT')
+        if self.wal:
+            self.exe('PRAGMA journal_mode = DELETE')
         self.db_con.close()
+        if self._blob_store:
+            self._blob_store.close()
 
-    def add_page(self, path, doc):
-        """Add a scraped page.
+    @contextmanager
+    def transaction(self):
+        """Context manager to group writes in one transaction.
+
+        The writes within the context are committed together when the context
+        is left, or rolled back when it is left with an exception. Within a
+        transaction or batch that is in progress already, the writes just
+        become part of that one.
+
+        Yields:
+            None
+        """
+        if self.db_con.in_transaction:
+            yield
+            return
+        self.exe('BEGIN')
+        try:
+            yield
+        except BaseException:
+            self.exe('ROLLBACK')
+            raise
+        self.exe('COMMIT')
+
+    @contextmanager
+    def batch(self, commit_every=None):
+        """Context manager to commit writes in batches.
+
+        The writes within the context are committed every commit_every
+        writes and when the context is left. When the context is left with
+        an exception, only the writes since the last commit are rolled back.
+        Within a batch that is in progress already, the writes are committed
+        every commit_every writes as well, after which the commit interval
+        of the enclosing batch applies again.
 
         Args:
-            path (str): path relative to the root of the scrape
-            doc (str): complete scraped html of the page
+            commit_every (int): number of writes per commit; the commit_every
+                value of the database object if None
 
-        Returns:
-            int|None: id of the page if not yet saved, None otherwise
+        Yields:
+            None
         """
-        qry = 'INSERT INTO pages (path, doc) VALUES (?, ?)'
+        outer_size = self._batch_size
+        self._batch_size = commit_every or self.commit_every
+        if not outer_size:
+            self._num_writes = 0
         try:
-            return self.exe(qry, [path, zlib.compress(doc.encode())]).lastrowid
-        except sqlite3.IntegrityError:
-            return None
+            with self.transaction():
+                yield
+        finally:
+            self._batch_size = outer_size
 
-    def get_page(self, path):
-        """Get the id and complete doc string of a page.
+    def commit(self):
+        """Commit the pending writes of a batch.
 
-        Args:
-            path (str): path of the page, relative to root of scrape
+        Outside a batch nothing is done, since writes are committed already
+        or belong to a transaction that is committed as a whole.
 
         Returns:
-            (int, str)|None: tuple (page_id, doc_string) or None if no match
+            None
         """
-        qry = 'SELECT page_id, doc FROM pages WHERE path = ?'
-        page = self.exe(qry, [path]).fetchone()
-        if page:
-            return page[0], zlib.decompress(page[1]).decode()
-        else:
-            return None
+        if self._batch_size and self.db_con.in_transaction:
+            self.exe('COMMIT')
+            self.exe('BEGIN')
+        self._num_writes = 0
 
-    def pages(self):
-        """Generator for all pages of a stored scrape.
+    def _written(self, num_rows=1):
+        """Register written rows and commit the batch when it is due.
 
-        Iterates over the pages stored in the database, yielding a threefold
-        tuple containing: the id of the page, the page path (relative to the
-        root of the scrape) and the scraped page as string.
+        Args:
+            num_rows (int): number of rows that were written
 
         Returns:
-            (int, str, str): page_id, page_path, page_string
+            None
         """
-        qry = 'SELECT page_id, path, doc FROM pages'
-        for page_id, path, doc in self.exe(qry):
-            yield page_id, path, zlib.decompress(doc).decode()
+        if not self._batch_size:
+            return
+        self._num_writes += num_rows
+        if self._num_writes >= self._batch_size:
+            self.commit()
 
-    def num_pages(self):
-        """Get total number of pages.
+    def compress_doc(self, doc):
+        """Compress a document with the codec of the database.
+
+        Args:
+            doc (str): complete html of a page
 
         Returns:
-            int: number of pages
+            bytes: compressed document
         """
-        return self.exe('SELECT count(*) FROM pages').fetchone()[0]
+        if self._compressor:
+            return self._compressor.compress(doc.encode())
+        return zlib.compress(doc.encode())
 
-    def add_redir(self, req_path, redir_path, redir_type):
-        """Add a redirect that occurred during a page scrape.
+    def decompress_doc(self, blob):
+        """Decompress a document, whatever the codec it was compressed with.
 
         Args:
-            req_path (str): requested path
-            redir_path (str): path of the redirect
-            redir_type (int|str): characterisation of the redirect: status code
-                or textual
+            blob (bytes): document as stored in the pages table, which can be
+                a reference to a document in the blob store
 
         Returns:
-            None
+            str: complete html of the page
         """
-        qry = 'INSERT INTO redirs (req_path, redir_path, type) VALUES (?, ?, ?)'
-        try:
-            self.exe(qry, [req_path, redir_path, redir_type])
-        except sqlite3.IntegrityError:
-            pass
-        return None
+        blob = self._resolve_ref(blob)
+        if blob[:4] != _zstd_magic:
+            return zlib.decompress(blob).decode()
+        if not zstandard:
+            raise ImportError(
+                'zstandard package needed to read zstd compressed documents')
+        dict_id = zstandard.get_frame_parameters(blob).dict_id
+        decompressor = self._decompressors.get(dict_id)
+        if not decompressor:
+            dict_data = self.get_zstd_dict(dict_id)
+            if not dict_data and self.blob_store:
+                dict_data = self.blob_store.get_zstd_dict(dict_id)
+            decompressor = zstandard.ZstdDecompressor(
+                dict_data=zstandard.ZstdCompressionDict(dict_data))
+            self._decompressors[dict_id] = decompressor
+        return decompressor.decompress(blob).decode()
+
+    @property
+    def blob_store(self):
+        """Blob store holding the documents that are referenced.
+
+        Unless set otherwise, this is the store in the master directory,
+        which is the parent of the scrape directory of the database.
 
-    def redirs(self):
-        """Generator for all redirects of a stored scrape.
+        Returns:
+            BlobStore|None: store, or None if not available
+        """
+        if not self._blob_store:
+            master_dir = Path(self.db_file).resolve().parent.parent
+            if (master_dir / BlobStore.file_name).exists():
+                self._blob_store = BlobStore(master_dir)
+        return self._blob_store
 
-        Iterates over the redirects stored in the database, yielding a
-        threefold tuple containing: the requested path, the path and the type
-        of the redirect. All paths are relative to the root_url of the scrape.
+    @blob_store.setter
+    def blob_store(self, store):
+        self._blob_store = store
+
+    def _resolve_ref(self, blob):
+        """Resolve a reference to a document in the blob store.
+
+        Args:
+            blob (bytes): document as stored in the pages table
 
         Returns:
-            (str, str, str): requested path, path of redirect, type of redirect
+            bytes: compressed document
         """
-        qry = 'SELECT req_path, redir_path, type FROM redirs'
-        for req_path, redir_path, redir_type in self.exe(qry):
-            yield req_path, redir_path, redir_type
+        if not blob.startswith(_blob_ref):
+            return blob
+        if not self.blob_store:
+            raise LookupError('Blob store with the documents of the pages '
+                              'not available')
+        return self.blob_store.get(blob[len(_blob_ref):].decode())
 
-    def get_def_url(self, req_path):
-        """Get the definitive url or path of a page.
+    def stored_doc(self, blob):
+        """Get a document as stored, with references resolved.
 
-        This definitive url or path is deduced via the available redirects in
-        the redirs table. In case no redirect is available in the redirs
-        table for the requested path, it will be returned unaltered.
+        Args:
+            blob (bytes): document as stored in the pages table
+
+        Returns:
+            (bytes, bytes|None): compressed document and the zstd dictionary
+                needed to decompress it (None for a zlib document)
+        """
+        blob = self._resolve_ref(blob)
+        if blob[:4] != _zstd_magic:
+            return blob, None
+        dict_id = zstandard.get_frame_parameters(blob).dict_id
+        dict_data = self.get_zstd_dict(dict_id)
+        if not dict_data and self.blob_store:
+            dict_data = self.blob_store.get_zstd_dict(dict_id)
+        return blob, dict_data
+
+    def move_docs_to_blob_store(self, store=None):
+        """Replace the documents of all pages by references to a blob store.
+
+        Documents are added to the store with the SHA-256 hash of their html
+        as key, unless a document with that key is available already. The
+        additions to the store are committed before the documents are
+        replaced by references in one transaction, so the database never
+        refers to documents that were not stored. The database is vacuumed
+        afterwards to reclaim the saved space.
 
         Args:
-            req_path (str): requested path relative to root_url
+            store (BlobStore): store to use; the store in the master
+                directory if None
 
         Returns:
-            str: final redirected url or path relative to root_url
+            None
         """
-        qry = 'SELECT redir_path, type FROM redirs WHERE req_path = ?'
-        path = req_path
-        while True:
-            redir = self.exe(qry, [path]).fetchone()
-            if redir:
-                path, redir_type = redir
-                if redir_type == 'alias':
-                    # an alias redirects to the definitive path
-                    redir = self.exe(qry, [path]).fetchone()
-                    # test if definitive path does not get redirected itself
-                    if redir:
-                        logging.warning(
-                            f'Definitive path gets redirected: {path}')
-                    return path
-                else:
-                    # no alias redir, so maybe still another redir to go
-                    continue
-            else:
-                return path
+        if store:
+            self.blob_store = store
+        store = self.blob_store
+        num_added = 0
+        refs = []
+        qry = 'SELECT page_id, doc FROM pages'
+        for page_id, doc in self.exe(qry):
+            if doc.startswith(_blob_ref):
+                continue
+            sha256 = hashlib.sha256(
+                self.decompress_doc(doc).encode()).hexdigest()
+            if store.add(sha256, *self.stored_doc(doc)):
+                num_added += 1
+            refs.append((_blob_ref + sha256.encode(), page_id))
+        store.commit()
+        with self.transaction():
+            self.db_con.executemany(
+                'UPDATE pages SET doc = ? WHERE page_id = ?', refs)
+        num_moved = len(refs)
+        self.exe('VACUUM')
+        logging.info(f'{num_moved} documents moved to the blob store, of '
+                     f'which {num_added} were not available in the store')
 
-    def upd_par(self, name, value):
-        """Insert or update a parameter.
+    def export(self, db_file):
+        """Create a self-contained copy of the database.
+
+        References to documents in the blob store are replaced by the
+        documents themselves, together with the zstd dictionaries they need.
 
         Args:
-            name (str): name of the parameter
-            value (str|int|float): value of the parameter
+            db_file (Path): name or path of the database file to create
 
         Returns:
             None
         """
-        qry = 'INSERT OR REPLACE INTO parameters (name, value) VALUES (?, ?)'
-        self.exe(qry, [name, value])
-
-    def get_par(self, name):
-        """Get the value of a parameter.
+        self.exe('VACUUM INTO ?', [str(db_file)])
+        export_db = ScrapeDB(db_file, version_check=False)
+        qry = 'SELECT page_id, doc FROM pages'
+        with export_db.batch():
+            for page_id, doc in export_db.exe(qry).fetchall():
+                if not doc.startswith(_blob_ref):
+                    continue
+                doc, dict_data = self.stored_doc(doc)
+                if dict_data:
+                    export_db._add_zstd_dict(dict_data)
+                export_db.exe('UPDATE pages SET doc = ? WHERE page_id = ?',
+                              [doc, page_id])
+                export_db._written()
+        export_db.close()
+        logging.info(f'Self-contained copy of the database exported to '
+                     f'{db_file}')
+
+    def get_zstd_dict(self, dict_id=None):
+        """Get a zstd dictionary for the compression of documents.
 
         Args:
-            name (str): name of the parameter
+            dict_id (int): id of the dictionary; the one that is used to
+                compress new documents if None
 
         Returns:
-            str|int|float: value of the parameter
+            bytes|None: dictionary, or None if not available
         """
-        qry = 'SELECT value FROM parameters WHERE name = ?'
-        result = self.exe(qry, [name]).fetchone()
-        if not result:
+        if dict_id is None:
+            dict_id = self.get_par('zstd_dict_id')
+        if dict_id is None:
             return None
-        value = result[0]
-        try:
-            value = int(value)
-        except ValueError:
-            try:
-                value = float(value)
-            except ValueError:
-                pass
-        return value
+        qry = 'SELECT dict FROM zstd_dicts WHERE dict_id = ?'
+        row = self.exe(qry, [dict_id]).fetchone()
+        return row[0] if row else None
 
-    def repop_ed_links(self):
-        """Repopulate links table with editorial links from all pages.
+    def use_zstd_dict(self, dict_data):
+        """Compress new documents with zstd using a dictionary.
 
-        The links are extracted from each page after pruning the non editorial
-        (and automated) content branches from the html tree.
+        The dictionary is stored in the database, so the documents remain
+        readable. Use train_zstd_dict to obtain a dictionary, or get_zstd_dict
+        to reuse the dictionary of another scrape database.
+
+        Args:
+            dict_data (bytes): zstd dictionary
+
+        Returns:
+            int: id of the dictionary
         """
+        dict_id = self._add_zstd_dict(dict_data)
+        self.upd_par('doc_codec', 'zstd')
+        self.upd_par('zstd_dict_id', dict_id)
+        self._use_zstd_dict(dict_id)
+        return dict_id
 
-        # purge links table
-        self.exe('DELETE FROM ed_links')
+    def train_zstd_dict(self, num_samples=1000, dict_size=112 * 1024):
+        """Train a zstd dictionary on the pages and use it for new documents.
 
-        # (re)populate links table
-        num_pages = self.num_pages()
-        root_url = self.get_par('root_url')
-        timestamp = self.get_par('timestamp')
-        start_time = time.time()
+        Args:
+            num_samples (int): number of randomly sampled pages to train on
+            dict_size (int): maximum size of the dictionary in bytes
 
-        logging.info('Populating links table started')
+        Returns:
+            int: id of the dictionary
+        """
+        qry = 'SELECT doc FROM pages ORDER BY random() LIMIT ?'
+        samples = [self.decompress_doc(doc).encode()
+                   for (doc,) in self.exe(qry, [num_samples])]
+        zstd_dict = zstandard.train_dictionary(dict_size, samples)
+        logging.info(f'Zstd dictionary of {len(zstd_dict.as_bytes())} bytes '
+                     f'trained on {len(samples)} pages')
+        return self.use_zstd_dict(zstd_dict.as_bytes())
 
-        # cycle over all pages
-        page_num = 0
-        for page_id, page_path, page_string in self.pages():
-            page_num += 1
-            soup = BeautifulSoup(page_string, features='lxml')
-            editorial_copy, void = content_trees(soup)
-            links = page_links(editorial_copy, root_url, root_rel=True)
+    def recompress_pages(self):
+        """Recompress all documents with the codec for new documents.
 
-            # cycle over all links of this page
-            for link_text, link_url in links:
-                def_url = self.get_def_url(link_url)
-                page = self.get_page(def_url)
-                if page:
-                    # the link points to an internal page
-                    link_id = page[0]
-                    link_url = None
-                else:
-                    # because the link destination is not in the pages table,
-                    # it is considered external
-                    link_id = None
-                self.exe('''
-                    INSERT INTO ed_links (page_id, link_text, link_id, ext_url)
-                    VALUES (?, ?, ?, ?)''',
-                         [page_id, link_text, link_id, link_url])
+        Documents that are compressed with this codec already are skipped.
+        The database is vacuumed afterwards to reclaim the saved space.
 
-            # print progress and prognosis
-            if page_num % 250 == 0:
-                page_time = (time.time() - start_time) / page_num
-                togo_time = int((num_pages - page_num) * page_time)
-                print(f'fetching links from pages of {timestamp} - togo: '
-                      f'{num_pages - page_num} pages / '
-                      f'{togo_time // 60}:{togo_time % 60:02} min')
+        Returns:
+            None
+        """
+        dict_id = self.get_par('zstd_dict_id') if self._compressor else None
+        num_recompressed = 0
+        qry = 'SELECT page_id, doc FROM pages'
+        with self.batch():
+            for page_id, doc in self.exe(qry).fetchall():
+                if doc.startswith(_blob_ref):
+                    # documents in the blob store are shared with others
+                    continue
+                if doc[:4] == _zstd_magic:
+                    if zstandard.get_frame_parameters(doc).dict_id == dict_id:
+                        continue
+                elif dict_id is None:
+                    continue
+                doc = self.compress_doc(self.decompress_doc(doc))
+                self.exe('UPDATE pages SET doc = ? WHERE page_id = ?',
+                         [doc, page_id])
+                self._written()
+                num_recompressed += 1
+        self.exe('VACUUM')
+        logging.info(f'{num_recompressed} documents recompressed')
 
-        logging.info('Populating links table completed')
+    def _add_zstd_dict(self, dict_data):
+        """Store a zstd dictionary if not available yet.
 
-    def links(self):
-        """Generator for all links of a stored scrape.
+        Args:
+            dict_data (bytes): zstd dictionary
 
-        Iterates over the links stored in the database, yielding a fourfold
-        tuple:
+        Returns:
+            int: id of the dictionary
+        """
+        dict_id = zstandard.ZstdCompressionDict(dict_data).dict_id()
+        self.exe('''
+            CREATE TABLE IF NOT EXISTS zstd_dicts (
+                dict_id INTEGER PRIMARY KEY NOT NULL UNIQUE,
+                dict    BLOB NOT NULL)''')
+        self.exe('INSERT OR IGNORE INTO zstd_dicts (dict_id, dict) '
+                 'VALUES (?, ?)', [dict_id, dict_data])
+        return dict_id
 
-        - path of the originating page (relative to the root of the scrape)
-        - text of the link
-        - if internal relative to scrape root, path of the link, else None
-        - if external relative to scrape root, full url of the link, else None
+    def _use_zstd_dict(self, dict_id):
+        """Setup the compressor for new documents with a stored dictionary.
+
+        Args:
+            dict_id (int): id of the dictionary
 
         Returns:
-            (str, str, str|None, str|None): (page path, link text, link path,
-                link url)
+            None
         """
-        qry = '''
-            SELECT page_path, link_text, link_path, ext_url
-            FROM ed_links_expl'''
-        for page_path, link_text, link_path, ext_url in self.exe(qry):
-            yield page_path, link_text, link_path, ext_url
+        if not zstandard:
+            raise ImportError(
+                'zstandard package needed to compress documents with zstd')
+        zstd_dict = zstandard.ZstdCompressionDict(self.get_zstd_dict(dict_id))
+        self._compressor = zstandard.ZstdCompressor(
+            level=self.zstd_level, dict_data=zstd_dict)
 
-    def page_full_info(self, path):
-        """Get all available information of a page.
+    def add_page(self, path, doc):
+        """Add a scraped page.
 
-        The returned dictionary has the next contents:
+        Args:
+            path (str): path relative to the root of the scrape
+            doc (str): complete scraped html of the page
 
-            - 'page_id': (int) page_id
-            - 'path': (str) path
-            - 'doc': (str) html source
-            - 'title': (str) title
-            - 'description': (str) description
-            - 'num_h1s': (int) number of h1 tags
-            - 'first_h1': (str) text of the first h1 tag
-            - 'language': (str) language
-            - 'modified': (date) last modification date
-            - 'pagetype': (str) type
-            - 'classes': (str) classes separated by spaces
-            - 'ed_text': (str) newline separated text from editorial content
-            - 'aut_text': (str) newline separated text from automated content
-            - 'business': (str) 'belastingen', 'toeslagen' or 'douane'
-            - 'category': (str) 'dv', 'bib' or 'alg'
+        Returns:
+            int|None: id of the page if not yet saved, None otherwise
+        """
+        qry = 'INSERT INTO pages (path, doc) VALUES (?, ?)'
+        try:
+            page_id = self.exe(qry, [path, self.compress_doc(doc)]).lastrowid
+        except sqlite3.IntegrityError:
+            return None
+        self._written()
+        return page_id
+
+    def get_page(self, path):
+        """Get the id and complete doc string of a page.
 
         Args:
-            path (str): path of the page
+            path (str): path of the page, relative to root of scrape
 
         Returns:
-            dictionary[str, str|date|None] | None: info name:value pair
+            (int, str)|None: tuple (page_id, doc_string) or None if no match
         """
-        qry = "PRAGMA table_info('pages_full')"
-        fields = [r[1] for r in self.exe(qry).fetchall()]
-        qry = "SELECT * FROM pages_full WHERE path = ?"
-        row = self.exe(qry, [path]).fetchone()
-        if row:
-            # type hint to prohibit warnings
-            info: Dict[str, Union[date, str, bytes, None]]
-            info = dict(zip(fields, row))
-            mdate = info['modified']
-            info['modified'] = date.fromisoformat(mdate) if mdate else None
-            info['doc'] = zlib.decompress(info['doc']).decode()
-            return info
+        qry = 'SELECT page_id, doc FROM pages WHERE path = ?'
+        page = self.exe(qry, [path]).fetchone()
+        if page:
+            return page[0], self.decompress_doc(page[1])
         else:
             return None
 
-    def pages_full(self):
-        """Page generator yielding all available information per page.
+    def add_page_info(self, page_id, info):
+        """Add the extracted information of a page to the pages_info table.
 
-        The yielded dictionary has the next contents:
+        Args:
+            page_id (int): id of the page
+            info (dict[str, str|int|date|None]): field name:value pairs as
+                returned by the extract_page_info function
+
+        Returns:
+            None
+        """
+        fields = ', '.join(['page_id', *info])
+        qmarks = ', '.join(['?'] * (len(info) + 1))
+        self.exe(f'INSERT INTO pages_info ({fields}) VALUES ({qmarks})',
+                 [page_id, *info.values()])
+        self._written()
+
+    def add_raw_ed_links(self, page_id, links):
+        """Add the unresolved editorial links of a page.
+
+        These links are resolved to pages when the ed_links table is
+        (re)populated. A page without editorial links is registered with one
+        row without link_url, to discern it from a page of which the links
+        are not extracted yet.
+
+        Args:
+            page_id (int): id of the page
+            links (list of (str, str)): (link text, link url) tuples as
+                returned by the editorial_links function
+
+        Returns:
+            None
+        """
+        qry = '''
+            INSERT INTO raw_ed_links (page_id, link_text, link_url)
+            VALUES (?, ?, ?)'''
+        if links:
+            self.db_con.executemany(
+                qry, [(page_id, text, url) for text, url in links])
+        else:
+            self.exe(qry, [page_id, None, None])
+        self._written(len(links) or 1)
+
+    def get_page_id(self, path):
+        """Get the id of a page.
+
+        Args:
+            path (str): path of the page, relative to root of scrape
+
+        Returns:
+            int|None: page_id or None if no match
+        """
+        qry = 'SELECT page_id FROM pages WHERE path = ?'
+        page = self.exe(qry, [path]).fetchone()
+        return page[0] if page else None
+
+    def copy_page(self, src_db, path):
+        """Copy a page from another scrape database.
+
+        The compressed page is copied as is (resolved when it is stored in
+        the blob store, and with the zstd dictionary it needs when not
+        available in this database), together with its
+        validators, its row in the pages_info table and its unresolved
+        editorial links (when available in both databases). None of this data
+        is decompressed or parsed.
+
+        Args:
+            src_db (ScrapeDB): database to copy the page from
+            path (str): path of the page, relative to root of scrape
+
+        Returns:
+            int|None: id of the copied page, None if the page is not available
+                in src_db or already available in this database
+        """
+        qry = 'SELECT page_id, doc FROM pages WHERE path = ?'
+        src_page = src_db.exe(qry, [path]).fetchone()
+        if not src_page:
+            return None
+        src_id, doc = src_page
+        if doc.startswith(_blob_ref):
+            # the copy has to be self-contained
+            doc = src_db.stored_doc(doc)[0]
+        qry = 'INSERT INTO pages (path, doc) VALUES (?, ?)'
+        try:
+            page_id = self.exe(qry, [path, doc]).lastrowid
+        except sqlite3.IntegrityError:
+            return None
+
+        if doc[:4] == _zstd_magic:
+            # the document needs the dictionary it was compressed with
+            dict_id = zstandard.get_frame_parameters(doc).dict_id
+            if not self.get_zstd_dict(dict_id):
+                self._add_zstd_dict(src_db.stored_doc(doc)[1])
+
+        validators = src_db.get_validators(path)
+        if validators:
+            self.add_validators(path, *validators)
+
+        if self.has_table('pages_info') and src_db.has_table('pages_info'):
+            fields = [f[0] for f in
+                      self.extracted_fields + self.derived_fields]
+            columns = ', '.join(fields)
+            qry = f'SELECT {columns} FROM pages_info WHERE page_id = ?'
+            info = src_db.exe(qry, [src_id]).fetchone()
+            if info:
+                qmarks = ', '.join(['?'] * (len(fields) + 1))
+                self.exe(f'INSERT INTO pages_info (page_id, {columns}) '
+                         f'VALUES ({qmarks})', [page_id, *info])
+
+        qry = '''
+            SELECT link_text, link_url
+            FROM raw_ed_links
+            WHERE page_id = ?'''
+        links = src_db.exe(qry, [src_id]).fetchall()
+        if links:
+            self.db_con.executemany('''
+                INSERT INTO raw_ed_links (page_id, link_text, link_url)
+                VALUES (?, ?, ?)''', [(page_id, *link) for link in links])
+        self._written()
+        return page_id
+
+    def add_resource(self, path, content_type, size, sha256):
+        """Add a resource that is not an html page.
+
+        Args:
+            path (str): path relative to the root of the scrape
+            content_type (str): Content-Type header of the response
+            size (int): number of bytes of the resource
+            sha256 (str): hexadecimal SHA-256 hash of the resource
+
+        Returns:
+            None
+        """
+        qry = '''
+            INSERT OR REPLACE INTO resources (path, content_type, size, sha256)
+            VALUES (?, ?, ?, ?)'''
+        self.exe(qry, [path, content_type, size, sha256])
+        self._written()
+
+    def get_resource(self, path):
+        """Get the registration of a resource that is not an html page.
+
+        Args:
+            path (str): path relative to the root of the scrape
+
+        Returns:
+            (str, int, str)|None: content type, size and hash of the resource,
+                or None if not available
+        """
+        qry = 'SELECT content_type, size, sha256 FROM resources WHERE path = ?'
+        return self.exe(qry, [path]).fetchone()
+
+    def add_validators(self, path, etag, last_modified):
+        """Add or replace the http validators of a page.
+
+        Args:
+            path (str): path of the page, relative to root of scrape
+            etag (str|None): value of the ETag header of the response
+            last_modified (str|None): value of the Last-Modified header
+
+        Returns:
+            None
+        """
+        if not (etag or last_modified):
+            return None
+        qry = '''
+            INSERT OR REPLACE INTO validators (path, etag, last_modified)
+            VALUES (?, ?, ?)'''
+        self.exe(qry, [path, etag, last_modified])
+        self._written()
+
+    def get_validators(self, path):
+        """Get the http validators of a page.
+
+        Databases created before the validators table was introduced, have
+        no validators for any page.
+
+        Args:
+            path (str): path of the page, relative to root of scrape
+
+        Returns:
+            (str|None, str|None)|None: tuple (etag, last_modified) or None if
+                no validators are available
+        """
+        qry = 'SELECT etag, last_modified FROM validators WHERE path = ?'
+        return self.exe(qry, [path]).fetchone()
+
+    def cond_headers(self, path):
+        """Get the headers for a conditional request of a page.
+
+        Args:
+            path (str): path of the page, relative to root of scrape
+
+        Returns:
+            dict[str, str]|None: request headers or None if no validators are
+                available for the page
+        """
+        validators = self.get_validators(path)
+        if not validators:
+            return None
+        etag, last_modified = validators
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        return headers
+
+    def add_lastmod(self, path, lastmod):
+        """Add or replace the lastmod value of a path from a sitemap.
+
+        Args:
+            path (str): path relative to root of scrape
+            lastmod (str|None): W3C datetime of the last modification
+
+        Returns:
+            None
+        """
+        qry = '''
+            INSERT OR REPLACE INTO sitemap_paths (path, lastmod)
+            VALUES (?, ?)'''
+        self.exe(qry, [path, lastmod])
+        self._written()
+
+    def get_lastmod(self, path):
+        """Get the lastmod value of a path from a sitemap.
+
+        Args:
+            path (str): path relative to root of scrape
+
+        Returns:
+            str|None: W3C datetime of the last modification, or None if not
+                available
+        """
+        qry = 'SELECT lastmod FROM sitemap_paths WHERE path = ?'
+        result = self.exe(qry, [path]).fetchone()
+        return result[0] if result else None
+
+    def save_crawl_state(self, todo_paths, done_paths, num_done):
+        """Save a checkpoint of the state of a crawl.
+
+        The paths are saved in the crawl_paths table, with a status of 'todo'
+        or 'done' and the depth of the paths to be crawled. Since a path that
+        is done stays done, only the paths that changed since the previous
+        checkpoint need to be given. Together with
+        the number of handled paths, the highest page_id at the moment of the
+        checkpoint is saved as parameter. All is saved in one transaction,
+        which is committed also when the checkpoint is saved within a batch.
+
+        Args:
+            todo_paths (iterable of (str, int)): (path, depth) of the paths
+                that were added to be crawled
+            done_paths (iterable of str): paths that were handled
+            num_done (int): total number of handled paths
+
+        Returns:
+            None
+        """
+        last_page_id = self.exe('SELECT max(page_id) FROM pages').fetchone()[0]
+        with self.transaction():
+            self.db_con.executemany('''
+                INSERT OR IGNORE INTO crawl_paths (path, status, depth)
+                VALUES (?, 'todo', ?)''', todo_paths)
+            self.db_con.executemany('''
+                INSERT OR REPLACE INTO crawl_paths (path, status)
+                VALUES (?, 'done')''', ((p,) for p in done_paths))
+            self.upd_par('checkpoint_num_done', num_done)
+            self.upd_par('checkpoint_page_id', last_page_id or 0)
+        self.commit()
+
+    def crawl_state(self):
+        """Get the state of a crawl as saved at the last checkpoint.
+
+        Returns:
+            (dict[str, int], set of str, int, int): depth per path to be
+                crawled, paths that were handled, number of handled paths and
+                the highest page_id at the moment of the checkpoint
+        """
+        todo_paths = {}
+        done_paths = set()
+        qry = 'SELECT path, status, depth FROM crawl_paths'
+        for path, status, depth in self.exe(qry):
+            if status == 'done':
+                done_paths.add(path)
+            else:
+                todo_paths[path] = depth or 0
+        num_done = self.get_par('checkpoint_num_done') or 0
+        last_page_id = self.get_par('checkpoint_page_id') or 0
+        return todo_paths, done_paths, num_done, last_page_id
+
+    def clear_crawl_state(self):
+        """Delete the saved state of a finished crawl.
+
+        Returns:
+            None
+        """
+        self.exe('DELETE FROM crawl_paths')
+
+    def has_table(self, name):
+        """Check if a table or view is available in the database.
+
+        Args:
+            name (str): name of the table or view
+
+        Returns:
+            bool: True if available
+        """
+        qry = 'SELECT name FROM sqlite_master WHERE name = ?'
+        return self.exe(qry, [name]).fetchone() is not None
+
+    def pages(self):
+        """Generator for all pages of a stored scrape.
+
+        Iterates over the pages stored in the database, yielding a threefold
+        tuple containing: the id of the page, the page path (relative to the
+        root of the scrape) and the scraped page as string.
+
+        Returns:
+            (int, str, str): page_id, page_path, page_string
+        """
+        qry = 'SELECT page_id, path, doc FROM pages'
+        for page_id, path, doc in self.exe(qry):
+            yield page_id, path, self.decompress_doc(doc)
+
+    def num_pages(self):
+        """Get total number of pages.
+
+        Returns:
+            int: number of pages
+        """
+        return self.exe('SELECT count(*) FROM pages').fetchone()[0]
+
+    def add_redir(self, req_path, redir_path, redir_type):
+        """Add a redirect that occurred during a page scrape.
+
+        Args:
+            req_path (str): requested path
+            redir_path (str): path of the redirect
+            redir_type (int|str): characterisation of the redirect: status code
+                or textual
+
+        Returns:
+            None
+        """
+        qry = 'INSERT INTO redirs (req_path, redir_path, type) VALUES (?, ?, ?)'
+        try:
+            self.exe(qry, [req_path, redir_path, redir_type])
+        except sqlite3.IntegrityError:
+            pass
+        else:
+            self._written()
+            if self._has_def_paths:
+                # materialised definitive paths are outdated
+                self.exe('DROP TABLE def_paths')
+                self._has_def_paths = False
+        return None
+
+    def redirs(self):
+        """Generator for all redirects of a stored scrape.
+
+        Iterates over the redirects stored in the database, yielding a
+        threefold tuple containing: the requested path, the path and the type
+        of the redirect. All paths are relative to the root_url of the scrape.
+
+        Returns:
+            (str, str, str): requested path, path of redirect, type of redirect
+        """
+        qry = 'SELECT req_path, redir_path, type FROM redirs'
+        for req_path, redir_path, redir_type in self.exe(qry):
+            yield req_path, redir_path, redir_type
+
+    def get_def_url(self, req_path):
+        """Get the definitive url or path of a page.
+
+        This definitive url or path is deduced via the available redirects in
+        the redirs table. In case no redirect is available in the redirs
+        table for the requested path, it will be returned unaltered.
+
+        When the def_paths table is available (see the build_def_paths
+        method), the definitive path is read from that table. Otherwise the
+        redirects are followed one by one, up to a redirect loop.
+
+        Args:
+            req_path (str): requested path relative to root_url
+
+        Returns:
+            str: final redirected url or path relative to root_url
+        """
+        if self._has_def_paths:
+            qry = 'SELECT def_path FROM def_paths WHERE req_path = ?'
+            row = self.exe(qry, [req_path]).fetchone()
+            return row[0] if row else req_path
+
+        qry = 'SELECT redir_path, type FROM redirs WHERE req_path = ?'
+        path = req_path
+        visited = {path}
+        while True:
+            redir = self.exe(qry, [path]).fetchone()
+            if redir:
+                path, redir_type = redir
+                if redir_type == 'alias':
+                    # an alias redirects to the definitive path
+                    redir = self.exe(qry, [path]).fetchone()
+                    # test if definitive path does not get redirected itself
+                    if redir:
+                        logging.warning(
+                            f'Definitive path gets redirected: {path}')
+                    return path
+                elif path in visited:
+                    logging.warning(f'Redirect loop for {req_path} at {path}')
+                    return path
+                else:
+                    # no alias redir, so maybe still another redir to go
+                    visited.add(path)
+                    continue
+            else:
+                return path
+
+    def build_def_paths(self):
+        """Materialise the definitive paths of all requested paths.
+
+        The (re)created def_paths table maps every requested path (all paths
+        of pages and all requested paths of the redirs table) to its
+        definitive url or path, as given by the get_def_url method, which
+        will read this table from then on. The table has the next columns:
+
+        - req_path: requested path
+        - def_path: definitive url or path
+        - page_id: page_id of the definitive path, None if not a page
+        - hops: number of redirects from the requested path to the
+            definitive path (an alias included)
+        - chain_type: types of these redirects, separated by commas
+        - cycle: 1 if the redirects loop, 0 otherwise
+        - def_redirected: 1 if the definitive path of an alias gets
+            redirected itself, 0 otherwise
+
+        Redirect loops and redirected definitive paths are logged. The table
+        is dropped when a redirect is added to the redirs table later on, so
+        it has to be built after the crawl.
+
+        Returns:
+            None
+        """
+        rows = self._deduce_def_paths()
+        with self.transaction():
+            self.exe('DROP TABLE IF EXISTS def_paths')
+            self.exe('''
+                CREATE TABLE def_paths (
+                    req_path       TEXT PRIMARY KEY NOT NULL UNIQUE,
+                    def_path       TEXT NOT NULL,
+                    page_id        INTEGER,
+                    hops           INTEGER NOT NULL,
+                    chain_type     TEXT,
+                    cycle          INTEGER NOT NULL,
+                    def_redirected INTEGER NOT NULL)''')
+            self.db_con.executemany(
+                'INSERT INTO def_paths VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+            self._written(len(rows))
+        self._has_def_paths = True
+        logging.info(f'Table def_paths built with {len(rows)} paths')
+
+    def def_paths(self):
+        """Get the definitive paths of all requested paths.
+
+        The rows of the def_paths table are returned when that table is
+        available. Otherwise the rows are deduced from the redirs and pages
+        tables in memory, without writing to the database, so this method
+        serves historical scrapes as well (see the build_def_paths method
+        for the columns).
+
+        Returns:
+            list of (str, str, int|None, int, str|None, int, int): rows with
+                the columns of the def_paths table
+        """
+        if self._has_def_paths:
+            return self.exe('SELECT * FROM def_paths').fetchall()
+        return self._deduce_def_paths()
+
+    def _deduce_def_paths(self):
+        """Deduce the rows of the def_paths table (see build_def_paths)."""
+        redirs = {req_path: (redir_path, redir_type)
+                  for req_path, redir_path, redir_type in self.redirs()}
+        page_ids = dict(self.exe('SELECT path, page_id FROM pages'))
+        rows = []
+        loops = set()
+        redirected = set()
+        for req_path in {**page_ids, **redirs}:
+            def_path, chain, cycle, def_redirected = _def_path_chain(
+                req_path, redirs)
+            if cycle and def_path not in loops:
+                loops.add(def_path)
+                logging.warning(f'Redirect loop at {def_path}')
+            if def_redirected and def_path not in redirected:
+                redirected.add(def_path)
+                logging.warning(f'Definitive path gets redirected: {def_path}')
+            rows.append((req_path, def_path, page_ids.get(def_path),
+                         len(chain), ','.join(chain) or None, int(cycle),
+                         int(def_redirected)))
+        return rows
+
+    def def_url_resolver(self):
+        """Return a function that gets definitive urls or paths in memory.
+
+        The returned function gives the same results as the get_def_url
+        method, but all redirects (or the definitive paths of the def_paths
+        table when available) are read at once, so resolving does not need
+        any query. Paths are resolved only once. Redirects that are added to
+        the table afterwards are not used. A redirect loop is logged and
+        resolved to the path where the loop is detected.
+
+        Returns:
+            function: resolver of a requested path (str) relative to
+                root_url to the final redirected url or path (str)
+        """
+        if self._has_def_paths:
+            resolved = dict(self.exe(
+                'SELECT req_path, def_path FROM def_paths'))
+            return lambda req_path: resolved.get(req_path, req_path)
+
+        redirs = {req_path: (redir_path, redir_type)
+                  for req_path, redir_path, redir_type in self.redirs()}
+        resolved = {}
+
+        def def_url(req_path):
+            if req_path not in resolved:
+                path, _, cycle, def_redirected = _def_path_chain(
+                    req_path, redirs)
+                if cycle:
+                    logging.warning(f'Redirect loop for {req_path} at {path}')
+                if def_redirected:
+                    logging.warning(f'Definitive path gets redirected: {path}')
+                resolved[req_path] = path
+            return resolved[req_path]
+
+        return def_url
+
+    def upd_par(self, name, value):
+        """Insert or update a parameter.
+
+        Args:
+            name (str): name of the parameter
+            value (str|int|float): value of the parameter
+
+        Returns:
+            None
+        """
+        qry = 'INSERT OR REPLACE INTO parameters (name, value) VALUES (?, ?)'
+        self.exe(qry, [name, value])
+
+    def get_par(self, name):
+        """Get the value of a parameter.
+
+        Args:
+            name (str): name of the parameter
+
+        Returns:
+            str|int|float: value of the parameter
+        """
+        qry = 'SELECT value FROM parameters WHERE name = ?'
+        result = self.exe(qry, [name]).fetchone()
+        if not result:
+            return None
+        value = result[0]
+        try:
+            value = int(value)
+        except ValueError:
+            try:
+                value = float(value)
+            except ValueError:
+                pass
+        return value
+
+    def repop_ed_links(self):
+        """Repopulate links table with editorial links from all pages.
+
+        The links are extracted from each page after pruning the non editorial
+        (and automated) content branches from the html tree. For pages of
+        which the editorial links were already extracted during the crawl
+        (available in the raw_ed_links table), these links are used without
+        parsing the page again. Links that are extracted here are saved in
+        the raw_ed_links table as well. The links are resolved to pages in
+        memory (see the def_url_resolver method) and inserted in bulk. All
+        writes are committed in batches.
+        """
+        with self.batch():
+            self._repop_ed_links()
+
+    def _repop_ed_links(self):
+        """Repopulate links table (see repop_ed_links)."""
+
+        # purge links table
+        self.exe('DELETE FROM ed_links')
+
+        # (re)populate links table
+        num_pages = self.num_pages()
+        root_url = self.get_par('root_url')
+        timestamp = self.get_par('timestamp')
+        start_time = time.time()
+
+        logging.info('Populating links table started')
+
+        # unresolved links that are available already
+        raw_links = {}
+        qry = 'SELECT page_id, link_text, link_url FROM raw_ed_links'
+        for page_id, link_text, link_url in self.exe(qry):
+            page_raw_links = raw_links.setdefault(page_id, [])
+            if link_url is not None:
+                page_raw_links.append((link_text, link_url))
+        num_parsed = 0
+
+        # links are resolved to pages in memory
+        def_url = self.def_url_resolver()
+        page_ids = dict(self.exe('SELECT path, page_id FROM pages'))
+        ins_qry = '''
+            INSERT INTO ed_links (page_id, link_text, link_id, ext_url)
+            VALUES (?, ?, ?, ?)'''
+        rows = []
+
+        # cycle over all pages
+        page_num = 0
+        doc_qry = 'SELECT doc FROM pages WHERE page_id = ?'
+        for (page_id,) in self.exe('SELECT page_id FROM pages'):
+            page_num += 1
+            if page_id in raw_links:
+                links = raw_links.pop(page_id)
+            else:
+                doc = self.exe(doc_qry, [page_id]).fetchone()[0]
+                page_string = self.decompress_doc(doc)
+                soup = BeautifulSoup(page_string, features='lxml')
+                links = editorial_links(soup, root_url)
+                self.add_raw_ed_links(page_id, links)
+                num_parsed += 1
+
+            # cycle over all links of this page
+            for link_text, link_url in links:
+                link_id = page_ids.get(def_url(link_url))
+                if link_id:
+                    # the link points to an internal page
+                    link_url = None
+                # else: because the link destination is not in the pages
+                # table, it is considered external
+                rows.append((page_id, link_text, link_id, link_url))
+            if len(rows) >= 1000:
+                self.db_con.executemany(ins_qry, rows)
+                self._written(len(rows))
+                rows.clear()
+
+            # print progress and prognosis
+            if page_num % 250 == 0:
+                page_time = (time.time() - start_time) / page_num
+                togo_time = int((num_pages - page_num) * page_time)
+                print(f'fetching links from pages of {timestamp} - togo: '
+                      f'{num_pages - page_num} pages / '
+                      f'{togo_time // 60}:{togo_time % 60:02} min')
+
+        self.db_con.executemany(ins_qry, rows)
+        self._written(len(rows))
+
+        logging.info(f'Populating links table completed; {num_parsed} pages '
+                     'had to be parsed')
+
+    def links(self):
+        """Generator for all links of a stored scrape.
+
+        Iterates over the links stored in the database, yielding a fourfold
+        tuple:
+
+        - path of the originating page (relative to the root of the scrape)
+        - text of the link
+        - if internal relative to scrape root, path of the link, else None
+        - if external relative to scrape root, full url of the link, else None
+
+        Returns:
+            (str, str, str|None, str|None): (page path, link text, link path,
+                link url)
+        """
+        qry = '''
+            SELECT page_path, link_text, link_path, ext_url
+            FROM ed_links_expl'''
+        for page_path, link_text, link_path, ext_url in self.exe(qry):
+            yield page_path, link_text, link_path, ext_url
+
+    def page_full_info(self, path, fields=None):
+        """Get all available information of a page.
+
+        The returned mapping has the next contents, or only the fields that
+        are asked for:
+
+            - 'page_id': (int) page_id
+            - 'path': (str) path
+            - 'doc': (str) html source
+            - 'title': (str) title
+            - 'description': (str) description
+            - 'num_h1s': (int) number of h1 tags
+            - 'first_h1': (str) text of the first h1 tag
+            - 'language': (str) language
+            - 'modified': (date) last modification date
+            - 'pagetype': (str) type
+            - 'classes': (str) classes separated by spaces
+            - 'ed_text': (str) newline separated text from editorial content
+            - 'aut_text': (str) newline separated text from automated content
+            - 'business': (str) 'belastingen', 'toeslagen' or 'douane'
+            - 'category': (str) 'dv', 'bib' or 'alg'
+
+        The doc is only decompressed when it is accessed (see PageRow).
+
+        Args:
+            path (str): path of the page
+            fields (list of str): fields to return; all fields if None
+
+        Returns:
+            PageRow | None: info name:value pairs
+        """
+        fields = self._full_fields(fields)
+        qry = f'SELECT {", ".join(fields)} FROM pages_full WHERE path = ?'
+        row = self.exe(qry, [path]).fetchone()
+        if row:
+            return PageRow(self, fields, row)
+        else:
+            return None
+
+    def pages_full(self, fields=None):
+        """Page generator yielding all available information per page.
+
+        The yielded mapping has the next contents, or only the fields that
+        are asked for:
 
             - 'page_id': (int) page_id
             - 'path': (str) path
@@ -445,22 +1523,83 @@ class ScrapeDB:
             - 'business': (str) 'belastingen', 'toeslagen' or 'douane'
             - 'category': (str) 'dv', 'bib' or 'alg'
 
+        Only the requested fields are read from the database, and the doc is
+        only decompressed when it is accessed (see PageRow). So a loop that
+        only needs some info fields, does not read and inflate the html of
+        all pages.
+
+        Args:
+            fields (list of str): fields to yield; all fields if None
+
         Yields:
-            dictionary[str, str|date|None]: info name:value pair
+            PageRow: info name:value pairs
         """
-        qry = "PRAGMA table_info('pages_full')"
-        fields = [r[1] for r in self.exe(qry).fetchall()]
-        qry = "SELECT * FROM pages_full"
+        fields = self._full_fields(fields)
+        qry = f'SELECT {", ".join(fields)} FROM pages_full'
         for row in self.exe(qry):
-            # type hint to prohibit warnings
-            info: Dict[str, Union[date, str, bytes, None]]
-            info = dict(zip(fields, row))
-            mdate = info['modified']
-            info['modified'] = date.fromisoformat(mdate) if mdate else None
-            info['doc'] = zlib.decompress(info['doc']).decode()
-            yield info
-
-    def extract_pages_info(self):
+            yield PageRow(self, fields, row)
+
+    def _full_fields(self, fields):
+        """Check the fields that are asked from the pages_full view.
+
+        Args:
+            fields (list of str): requested fields; all fields if None
+
+        Returns:
+            list of str: fields to select
+        """
+        qry = "PRAGMA table_info('pages_full')"
+        available = [r[1] for r in self.exe(qry).fetchall()]
+        if fields is None:
+            return available
+        unknown = set(fields) - set(available)
+        if unknown:
+            raise ValueError(f'Unknown field(s) of pages_full: '
+                             f'{", ".join(sorted(unknown))}')
+        return list(fields)
+
+    def create_pages_info(self, renew=True):
+        """Create the pages_info table and the pages_full view.
+
+        The fields of the pages_info table are defined by the class constants
+        extracted_fields and derived_fields. The pages_full view joins the
+        pages table with the pages_info table.
+
+        Args:
+            renew (bool): delete existing table and view before creating new
+                ones; if False, existing ones are kept
+
+        Returns:
+            None
+        """
+        if not renew and self.has_table('pages_info'):
+            return
+        self.exe('DROP TABLE IF EXISTS pages_info')
+        fields = self.extracted_fields + self.derived_fields
+        info_columns = ', '.join([f'{f[0]} {f[1]}' for f in fields])
+        self.exe(f'''
+            CREATE TABLE pages_info (
+                page_id	 INTEGER PRIMARY KEY NOT NULL UNIQUE,
+                {info_columns},
+                FOREIGN KEY (page_id)
+                REFERENCES pages (page_id)
+                    ON UPDATE RESTRICT
+                    ON DELETE RESTRICT)''')
+
+        # create new pages_full view
+        self.exe('DROP VIEW IF EXISTS pages_full')
+        self.exe('''
+            CREATE VIEW pages_full AS
+                SELECT *
+                FROM pages
+                LEFT JOIN pages_info USING (page_id)''')
+        if renew:
+            self.exe('VACUUM')
+        logging.info(
+            'Pages_info table and pages_full view (re)created in scrape.db')
+
+    def extract_pages_info(self, renew=True, num_workers=1, backend='bs4',
+                           cache=None):
         """Add table with information extracted from all pages.
 
         Extracted information concerns data that is readily available within
@@ -468,10 +1607,16 @@ class ScrapeDB:
         seperate table is strictly redundant, but serves faster access.
 
         The fields of the pages_info table are defined by the class constants
-        extracted_fields and derived_fields. Besides the pages_info table a
+        extracted_fields and derived_fields, of which the extracted_fields
+        are taken from the page_info_extractors registry of this module (see
+        FieldExtractor). Adding a declaration to this registry adds a field
+        to the pages_info table. Besides the pages_info table a
         pages_full view is added that joins the pages table with the
-        pages_info table. Existing table and/or view are deleted before
-        creating new ones.
+        pages_info table. Unless renew is False, existing table and/or view
+        are deleted before creating new ones. With renew False, information is
+        only extracted for pages that have no row in the pages_info table yet
+        (i.e. pages that were not extracted during the crawl or copied from a
+        previous scrape).
 
         The following information is added for each page:
 
@@ -492,141 +1637,108 @@ class ScrapeDB:
 
         It will be logged when tags or attributes are missing or values are
         invalid.
-        """
 
-        # create new pages_info table
-        self.exe('DROP TABLE IF EXISTS pages_info')
-        fields = self.extracted_fields + self.derived_fields
-        info_columns = ', '.join([f'{f[0]} {f[1]}' for f in fields])
-        self.exe(f'''
-            CREATE TABLE pages_info (
-                page_id	 INTEGER PRIMARY KEY NOT NULL UNIQUE,
-                {info_columns},
-                FOREIGN KEY (page_id)
-                REFERENCES pages (page_id)
-                    ON UPDATE RESTRICT
-                    ON DELETE RESTRICT)''')
+        All writes are committed in batches.
+
+        With more than one worker, the pages are parsed in a pool of
+        processes. The documents are read and decompressed in chunks by this
+        process, which also writes all results, in the same order as with
+        one worker. So the resulting table is identical.
+
+        The information is extracted with one of the extraction_backends:
+        'bs4' parses the pages with BeautifulSoup (see the extract_page_info
+        function), 'lxml' uses precompiled XPath expressions on the lxml tree
+        of a page (see the extract_page_info_lxml function), which is faster.
+        Both backends give the same information.
 
-        # create new pages_full view
-        self.exe('DROP VIEW IF EXISTS pages_full')
-        self.exe('''
-            CREATE VIEW pages_full AS
-                SELECT *
-                FROM pages
-                LEFT JOIN pages_info USING (page_id)''')
-        self.exe('VACUUM')
-        logging.info(
-            'Pages_info table and pages_full view (re)created in scrape.db')
+        With a cache, only the pages that are not in the cache are parsed.
+        The information of those pages is added to the cache. Pages in the
+        cache are not parsed, so no warnings are logged for them. The hit
+        rate of the cache is logged.
+
+        Args:
+            renew (bool): recreate the pages_info table before extracting
+            num_workers (int): number of processes to parse the pages
+            backend (str): one of extraction_backends
+            cache (ExtractionCache): cache with the information of pages
+                extracted before
+        """
+        if backend not in self.extraction_backends:
+            raise ValueError(f'unknown extraction backend: {backend}')
+
+        self.create_pages_info(renew)
+        with self.batch():
+            self._extract_pages_info(num_workers, backend, cache)
+        if cache:
+            cache.commit()
+            cache.log_stats()
+
+    def _extract_pages_info(self, num_workers, backend, cache):
+        """Extract info from the pages without it (see extract_pages_info)."""
 
         # extract info from all pages while populating the pages_info table
-        num_pages = self.num_pages()
+        qry = '''
+            SELECT page_id
+            FROM pages
+            LEFT JOIN pages_info USING (page_id)
+            WHERE pages_info.page_id IS NULL'''
+        todo_ids = {row[0] for row in self.exe(qry)}
+        num_pages = len(todo_ids)
         timestamp = self.get_par('timestamp')
         start_time = time.time()
 
-        logging.info('Extracting info from pages started')
+        logging.info(
+            f'Extracting info from pages started ({backend} backend)')
+
+        # info of cached pages, and hashes of the pages to add to the cache
+        cached = deque()
+        doc_hashes = {}
+
+        def todo_pages():
+            qry = 'SELECT page_id, path, doc FROM pages'
+            for page_id, path, doc in self.exe(qry):
+                if page_id not in todo_ids:
+                    # info already available (extracted during the crawl or
+                    # copied from a previous scrape)
+                    continue
+                if not cache:
+                    yield page_id, path, self.decompress_doc(doc)
+                    continue
+                page_string = None
+                if doc.startswith(_blob_ref):
+                    # hash is known without decompressing the document
+                    sha256 = doc[len(_blob_ref):].decode()
+                else:
+                    page_string = self.decompress_doc(doc)
+                    sha256 = hashlib.sha256(page_string.encode()).hexdigest()
+                info = cache.get(sha256, backend)
+                if info:
+                    cached.append((page_id, info))
+                    continue
+                doc_hashes[page_id] = sha256
+                if page_string is None:
+                    page_string = self.decompress_doc(doc)
+                yield page_id, path, page_string
+
+        if num_workers > 1:
+            extracted = _extract_parallel(todo_pages(), num_workers, backend)
+        else:
+            extracted = _extract_pages(todo_pages(), backend)
+
+        def results():
+            for page_id, info in extracted:
+                while cached:
+                    yield cached.popleft()
+                if cache:
+                    cache.add(doc_hashes.pop(page_id), backend, info)
+                yield page_id, info
+            yield from cached
 
         # cycle over all pages
         page_num = 0
-        for page_id, path, page_string in self.pages():
+        for page_id, info in results():
             page_num += 1
-            soup = BeautifulSoup(page_string, features='lxml')
-            info = {'page_id': page_id}
-
-            # get title
-            title = soup.head.title
-            if not title:
-                logging.warning(f'Page has no <title> tag: {path}')
-                title = None
-            else:
-                title = title.text
-                if not title:
-                    logging.warning(f'Page with empty title: {path}')
-            info['title'] = title
-
-            # get description
-            description = soup.head.find(attrs={'name': 'description'})
-            if not description:
-                # there are more then 800 occurences of this situation
-                # TODO: log missing description as warning when this is
-                #       a rare exception only
-                logging.debug(
-                    f'Page has no <meta name="description"/> tag: {path}')
-                description = None
-            else:
-                description = description['content']
-                if not description:
-                    logging.warning(f'Page with empty description: {path}')
-            info['description'] = description
-
-            # get info from <h1> tags
-            h1s = []
-            for h1 in soup.find_all('h1'):
-                h1s.append(h1.text)
-            if len(h1s) == 0:
-                logging.warning(f'Page without h1: {path}')
-            info['num_h1s'] = len(h1s)
-            info['first_h1'] = h1s[0] if h1s else None
-
-            # get language
-            language = soup.head.find('meta', attrs={'name': 'language'})
-            if not language:
-                logging.warning(
-                    f'Page has no <meta name="language"/> tag: {path}')
-                language = None
-            else:
-                language = language['content']
-                if not language:
-                    logging.warning(f'Page with empy language: {path}')
-            info['language'] = language
-
-            # get date modified
-            modified = soup.head.find('meta',
-                                      attrs={'name': 'DCTERMS.modified'})
-            if not modified:
-                logging.warning(
-                    f'Page has no tag <meta name="DCTERMS.modified"/>: {path}')
-                modified = None
-            else:
-                try:
-                    modified = date.fromisoformat(modified['content'])
-                except ValueError:
-                    logging.warning(
-                        f'Page with improper modification date: {path}')
-                    modified = None
-            info['modified'] = modified
-
-            # get type of page
-            if 'data-pagetype' not in soup.body.attrs:
-                logging.warning('Page has no data-pagetype attribute in the '
-                                f'<body> tag: {path}')
-                pagetype = None
-            else:
-                pagetype = soup.body['data-pagetype']
-                if not pagetype:
-                    logging.warning(
-                        f'Page with empty pagetype in <body> tag: {path}')
-            info['pagetype'] = pagetype
-
-            # get classes
-            if 'class' not in soup.body.attrs:
-                logging.warning(
-                    f'Page has no class attribute in the <body> tag: {path}')
-                classes = None
-            else:
-                classes = soup.body['class']
-                if not classes:
-                    logging.warning(
-                        f'Page with empty class in <body> tag: {path}')
-            info['classes'] = ' '.join(classes) if classes else None
-
-            # get editorial and automated texts
-            info['ed_text'], info['aut_text'] = get_text(soup)
-
-            # add info to the database
-            fields = ', '.join(info)
-            qmarks = ('?, ' * len(info))[:-2]
-            self.exe(f'INSERT INTO pages_info ({fields}) VALUES ({qmarks})',
-                     list(info.values()))
+            self.add_page_info(page_id, info)
 
             # print progress and prognosis
             if page_num % 250 == 0:
@@ -639,6 +1751,46 @@ class ScrapeDB:
 
         logging.info('Extracting info from pages completed')
 
+    def extract_pages_metadata(self):
+        """Refresh the metadata fields of the pages_info table.
+
+        The metadata fields (see metadata_extractors) are extracted again
+        from all pages that have a row in the pages_info table, with a
+        partial parse of only the head of the pages (see the
+        extract_page_metadata function). This is much faster than
+        extracting all information, and serves when only these fields are
+        needed, like for a refresh of the key figures of a scrape after the
+        declaration of a metadata field changed. Other fields of the
+        pages_info table are not altered.
+
+        It will be logged when tags or attributes are missing or values are
+        invalid. All writes are committed in batches.
+
+        Returns:
+            None
+        """
+        fields = [e.name for e in metadata_extractors]
+        upd_qry = f'''
+            UPDATE pages_info
+            SET {', '.join(f'{f} = :{f}' for f in fields)}
+            WHERE page_id = :page_id'''
+        qry = '''
+            SELECT page_id, path, doc
+            FROM pages
+            JOIN pages_info USING (page_id)'''
+        logging.info('Extracting metadata from pages started')
+        updates = []
+        num_pages = 0
+        with self.batch():
+            for page_id, path, doc in self.exe(qry).fetchall():
+                info = extract_page_metadata(self.decompress_doc(doc), path)
+                updates.append({'page_id': page_id, **info})
+                num_pages += 1
+                if len(updates) == 250:
+                    self._update_many(upd_qry, updates)
+            self._update_many(upd_qry, updates)
+        logging.info(f'Extracting metadata from {num_pages} pages completed')
+
     def derive_pages_info(self):
         """Add derived information for all pages.
 
@@ -660,8 +1812,13 @@ class ScrapeDB:
         - category: 'dv', 'bib' or 'alg'
 
         It will be logged when info can not be derived due to inconsistent or
-        unavailable information.
+        unavailable information. All writes are committed in batches.
         """
+        with self.batch():
+            self._derive_pages_info()
+
+    def _derive_pages_info(self):
+        """Derive info for all pages (see derive_pages_info)."""
 
         # clear derived info fields in pages_info table
         set_cols = ', '.join([f'{f[0]} = NULL' for f in self.derived_fields])
@@ -684,6 +1841,11 @@ class ScrapeDB:
                 CASE pagetype
                     WHEN 'bld-wrapper' THEN 2 ELSE 1
                 END'''
+        upd_qry = f'''
+            UPDATE pages_info
+            SET {', '.join(f'{f[0]} = :{f[0]}' for f in self.derived_fields)}
+            WHERE page_id = :page_id'''
+        updates = []
         page_num = 0
         for page_id, pagetype, classes in self.exe(for_qry).fetchall():
             page_num += 1
@@ -709,6 +1871,8 @@ class ScrapeDB:
             elif pagetype in alg_types:
                 category = 'alg'
             elif pagetype == 'bld-wrapper':
+                # the categories of the linking pages should be saved first
+                self._update_many(upd_qry, updates)
                 cat_qry = '''
                     SELECT category
                     FROM ed_links
@@ -726,12 +1890,9 @@ class ScrapeDB:
             fields['category'] = category
 
             # save the derived fields in the pages_info table
-            set_str = ', '.join(f'{k} = :{k}' for k in fields)
-            self.exe(f'''
-                UPDATE pages_info
-                SET {set_str}
-                WHERE page_id = :page_id''',
-                     fields)
+            updates.append(fields)
+            if len(updates) >= self.commit_every:
+                self._update_many(upd_qry, updates)
 
             # print progress and prognosis
             if page_num % 500 == 0:
@@ -742,8 +1903,465 @@ class ScrapeDB:
                     f'togo: {num_pages - page_num} pages / '
                     f'{togo_time // 60}:{togo_time % 60:02} min')
 
+        self._update_many(upd_qry, updates)
         logging.info('Deriving info from pages completed')
 
+    def _update_many(self, qry, rows):
+        """Execute a query for a list of rows and empty that list.
+
+        Args:
+            qry (str): query with named placeholders
+            rows (list of dict): parameters of the query per row
+
+        Returns:
+            None
+        """
+        if rows:
+            self.db_con.executemany(qry, rows)
+            self._written(len(rows))
+            rows.clear()
+
+
+def _def_path_chain(req_path, redirs):
+    """Follow the redirects of a requested path to its definitive path.
+
+    Redirects are followed until an alias, which redirects to the
+    definitive path, or until a path without redirect. Following stops as
+    well when the redirects loop.
+
+    Args:
+        req_path (str): requested path relative to root_url
+        redirs (dict[str, (str, str)]): requested path: (redirected path,
+            type) of all redirects
+
+    Returns:
+        (str, list of str, bool, bool): definitive url or path, types of
+            the redirects followed, True for a redirect loop, True when
+            the definitive path of an alias gets redirected itself
+    """
+    path = req_path
+    chain = []
+    visited = {path}
+    while path in redirs:
+        path, redir_type = redirs[path]
+        chain.append(str(redir_type))
+        if redir_type == 'alias':
+            return path, chain, False, path in redirs
+        if path in visited:
+            return path, chain, True, False
+        visited.add(path)
+    return path, chain, False, False
+
+
+def _extract_pages(pages, backend='bs4'):
+    """Generator of the information of pages for the pages_info table.
+
+    Pages are parsed one at a time when the next result is requested, so a
+    serial extraction (see the extract_pages_info method of ScrapeDB) holds
+    only one page in memory.
+
+    Args:
+        pages (iterable of (int, str, str)): page_id, path and html of pages
+        backend (str): 'bs4' or 'lxml'
+
+    Yields:
+        (int, dict[str, str|int|date|None]): page_id and extracted
+            information (see the extract_page_info function) per page
+    """
+    for page_id, path, page_string in pages:
+        yield page_id, extract_info(page_string, path, backend)
+
+
+def _extract_chunk(pages, backend='bs4'):
+    """Extract the information of a chunk of pages for the pages_info table.
+
+    This is the task of the worker processes of a parallel extraction (see
+    the extract_pages_info method of ScrapeDB).
+
+    Args:
+        pages (iterable of (int, str, str)): page_id, path and html of pages
+        backend (str): 'bs4' or 'lxml'
+
+    Returns:
+        list of (int, dict[str, str|int|date|None]): page_id and extracted
+            information (see the extract_page_info function) per page
+    """
+    return list(_extract_pages(pages, backend))
+
+
+def _extract_parallel(pages, num_workers, backend='bs4', chunk_size=50):
+    """Generator of the information of pages, extracted in a process pool.
+
+    The pages are sent to the pool in chunks, with a limited number of
+    chunks in flight, so not all pages have to be held in memory. Results
+    are yielded in the order of the pages.
+
+    Args:
+        pages (iterable of (int, str, str)): page_id, path and html of pages
+        num_workers (int): number of worker processes
+        backend (str): 'bs4' or 'lxml'
+        chunk_size (int): number of pages per chunk
+
+    Yields:
+        (int, dict[str, str|int|date|None]): page_id and extracted
+            information per page
+    """
+    if 'fork' in multiprocessing.get_all_start_methods():
+        mp = multiprocessing.get_context('fork')
+    else:
+        mp = multiprocessing.get_context()
+    with ProcessPoolExecutor(num_workers, mp_context=mp) as executor:
+        in_flight = deque()
+        chunk = []
+        for page in pages:
+            chunk.append(page)
+            if len(chunk) == chunk_size:
+                in_flight.append(executor.submit(
+                    _extract_chunk, chunk, backend))
+                chunk = []
+                if len(in_flight) >= 2 * num_workers:
+                    yield from in_flight.popleft().result()
+        if chunk:
+            in_flight.append(
+                executor.submit(_extract_chunk, chunk, backend))
+        while in_flight:
+            yield from in_flight.popleft().result()
+
+
+class PageRow(Mapping):
+    """Class encapsulating the fields of a page as a read-only mapping.
+
+    Rows are yielded by the pages_full method and returned by the
+    page_full_info method of ScrapeDB. Fields can be accessed by key or as
+    attribute. The modified field is converted to a date. The compressed
+    doc field is only decompressed when it is accessed for the first time.
+    """
+
+    def __init__(self, db, fields, values):
+        """Initiates the row object.
+
+        Args:
+            db (ScrapeDB): database the row is read from
+            fields (list of str): names of the fields
+            values (tuple): values of the fields as read from the database
+        """
+        self._db = db
+        # type hint to prohibit warnings
+        self._values: Dict[str, Union[date, str, bytes, None]]
+        self._values = dict(zip(fields, values))
+        mdate = self._values.get('modified')
+        if mdate:
+            self._values['modified'] = date.fromisoformat(mdate)
+
+    def __getitem__(self, name):
+        value = self._values[name]
+        if name == 'doc' and isinstance(value, bytes):
+            value = self._db.decompress_doc(value)
+            self._values['doc'] = value
+        return value
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __repr__(self):
+        fields = ', '.join(self._values)
+        return f'PageRow({fields})'
+
+
+class BlobStore:
+    """Class encapsulating a content-addressed store of page documents.
+
+    The store is an SQLite database next to the master database, holding
+    the compressed documents of the pages of all scrapes that are moved to
+    it, with the SHA-256 hash of their html as key. Since most pages do not
+    change from one scrape to the next, every document is stored only once
+    for all scrapes. Documents are kept as they were compressed in the
+    scrape database, so the store holds the zstd dictionaries they need as
+    well.
+    """
+
+    file_name = 'page_blobs.db'
+
+    def __init__(self, master_dir):
+        """Initiates the store object, creating the store when needed.
+
+        Args:
+            master_dir (Path): directory containing master db and scrapes
+        """
+        self.db_file = master_dir / self.file_name
+        self.db_con = sqlite3.connect(self.db_file, isolation_level=None)
+        self.exe = self.db_con.execute
+        self.exe('''
+            CREATE TABLE IF NOT EXISTS blobs (
+                sha256 TEXT PRIMARY KEY NOT NULL UNIQUE,
+                doc    BLOB NOT NULL)''')
+        self.exe('''
+            CREATE TABLE IF NOT EXISTS zstd_dicts (
+                dict_id INTEGER PRIMARY KEY NOT NULL UNIQUE,
+                dict    BLOB NOT NULL)''')
+
+    def close(self):
+        """Commit pending additions and close the connection to the store.
+
+        Returns:
+            None
+        """
+        self.commit()
+        self.db_con.close()
+
+    def commit(self):
+        """Commit the pending additions to the store.
+
+        Returns:
+            None
+        """
+        if self.db_con.in_transaction:
+            self.exe('COMMIT')
+
+    def add(self, sha256, doc, dict_data=None):
+        """Add a document to the store if not available yet.
+
+        Additions are committed by the commit or close method.
+
+        Args:
+            sha256 (str): hexadecimal SHA-256 hash of the html of the page
+            doc (bytes): compressed document
+            dict_data (bytes): zstd dictionary needed to decompress the
+                document, if it is zstd compressed
+
+        Returns:
+            bool: True if the document was added
+        """
+        if not self.db_con.in_transaction:
+            self.exe('BEGIN')
+        qry = 'INSERT OR IGNORE INTO blobs (sha256, doc) VALUES (?, ?)'
+        if not self.exe(qry, [sha256, doc]).rowcount:
+            return False
+        if dict_data:
+            dict_id = zstandard.ZstdCompressionDict(dict_data).dict_id()
+            self.exe('INSERT OR IGNORE INTO zstd_dicts (dict_id, dict) '
+                     'VALUES (?, ?)', [dict_id, dict_data])
+        return True
+
+    def get(self, sha256):
+        """Get a document from the store.
+
+        Args:
+            sha256 (str): hexadecimal SHA-256 hash of the html of the page
+
+        Returns:
+            bytes: compressed document
+        """
+        qry = 'SELECT doc FROM blobs WHERE sha256 = ?'
+        row = self.exe(qry, [sha256]).fetchone()
+        if not row:
+            raise LookupError(f'Document not available in blob store: '
+                              f'{sha256}')
+        return row[0]
+
+    def get_zstd_dict(self, dict_id):
+        """Get a zstd dictionary from the store.
+
+        Args:
+            dict_id (int): id of the dictionary
+
+        Returns:
+            bytes|None: dictionary, or None if not available
+        """
+        qry = 'SELECT dict FROM zstd_dicts WHERE dict_id = ?'
+        row = self.exe(qry, [dict_id]).fetchone()
+        return row[0] if row else None
+
+
+class ExtractionCache:
+    """Class encapsulating a persistent cache of extracted page information.
+
+    The cache is an SQLite database that holds the information that was
+    extracted from a page for the pages_info table (see the
+    extract_pages_info method of ScrapeDB), with the SHA-256 hash of the html
+    of the page and a fingerprint of the extractor as key. Since most pages
+    do not change from one scrape to the next, the information of those pages
+    can be taken from the cache instead of parsing them again.
+
+    The fingerprint is a hash of the source code of the functions of an
+    extraction backend, the extracted fields and the versions of the parsing
+    packages. So any change of the extraction invalidates the cached
+    information of that backend.
+
+    When the total size of the cached information exceeds the maximum size
+    of the cache, the least recently used entries are evicted while closing
+    the cache.
+
+    The cache can be used from more than one thread (like the worker threads
+    of a concurrent crawl).
+
+    The next counters are kept:
+
+    - lookups: number of pages looked up in the cache
+    - hits: number of pages of which the information was cached
+    - evicted: number of evicted entries
+    """
+
+    file_name = 'extraction_cache.db'
+
+    def __init__(self, cache_dir, max_mb=500):
+        """Initiates the cache object, creating the cache when needed.
+
+        Args:
+            cache_dir (Path): directory of the cache database
+            max_mb (int): maximum size of the cached information in MB
+        """
+        self.db_file = cache_dir / self.file_name
+        self.max_size = max_mb * 1024 * 1024
+        self.num_lookups = self.num_hits = self.num_evicted = 0
+        self._fingerprints = {}
+        self._used = []
+        self._lock = threading.Lock()
+        self.db_con = sqlite3.connect(self.db_file, isolation_level=None,
+                                      check_same_thread=False)
+        self.exe = self.db_con.execute
+        self.exe('''
+            CREATE TABLE IF NOT EXISTS extracts (
+                sha256      TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                info        BLOB NOT NULL,
+                size        INTEGER NOT NULL,
+                last_used   REAL NOT NULL,
+                PRIMARY KEY (sha256, fingerprint))''')
+
+    def close(self):
+        """Commit, evict to the maximum size and close the cache.
+
+        Returns:
+            None
+        """
+        self.commit()
+        self.evict()
+        self.db_con.close()
+
+    def commit(self):
+        """Commit the pending additions and usages to the cache.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            if self._used:
+                if not self.db_con.in_transaction:
+                    self.exe('BEGIN')
+                self.db_con.executemany(
+                    'UPDATE extracts SET last_used = ? '
+                    'WHERE sha256 = ? AND fingerprint = ?', self._used)
+                self._used.clear()
+            if self.db_con.in_transaction:
+                self.exe('COMMIT')
+
+    def evict(self):
+        """Evict the least recently used entries exceeding the maximum size.
+
+        Returns:
+            None
+        """
+        num_evicted = self.exe('''
+            DELETE FROM extracts
+            WHERE rowid IN (
+                SELECT rowid
+                FROM (
+                    SELECT rowid, SUM(size) OVER (
+                        ORDER BY last_used DESC, rowid DESC) AS total
+                    FROM extracts)
+                WHERE total > ?)''', [self.max_size]).rowcount
+        if num_evicted:
+            self.num_evicted += num_evicted
+            self.exe('VACUUM')
+
+    def fingerprint(self, backend):
+        """Return the fingerprint of an extraction backend.
+
+        Args:
+            backend (str): 'bs4' or 'lxml'
+
+        Returns:
+            str: hexadecimal hash of the extractor
+        """
+        if backend not in self._fingerprints:
+            self._fingerprints[backend] = _extractor_fingerprint(backend)
+        return self._fingerprints[backend]
+
+    def get(self, sha256, backend):
+        """Get the cached information of a page.
+
+        Args:
+            sha256 (str): hexadecimal SHA-256 hash of the html of the page
+            backend (str): extraction backend of the information
+
+        Returns:
+            dict[str, str|int|date|None]|None: field name:value pairs as
+                returned by the extract_page_info function, None if not
+                cached
+        """
+        fingerprint = self.fingerprint(backend)
+        qry = 'SELECT info FROM extracts WHERE sha256 = ? AND fingerprint = ?'
+        with self._lock:
+            self.num_lookups += 1
+            row = self.exe(qry, [sha256, fingerprint]).fetchone()
+            if not row:
+                return None
+            self.num_hits += 1
+            self._used.append((time.time(), sha256, fingerprint))
+        fields = [f[0] for f in ScrapeDB.extracted_fields]
+        info = dict(zip(fields, json.loads(zlib.decompress(row[0]))))
+        if info['modified']:
+            info['modified'] = date.fromisoformat(info['modified'])
+        return info
+
+    def add(self, sha256, backend, info):
+        """Add the information of a page to the cache.
+
+        Additions are committed by the commit or close method.
+
+        Args:
+            sha256 (str): hexadecimal SHA-256 hash of the html of the page
+            backend (str): extraction backend of the information
+            info (dict[str, str|int|date|None]): field name:value pairs as
+                returned by the extract_page_info function
+
+        Returns:
+            None
+        """
+        values = [info[f[0]] for f in ScrapeDB.extracted_fields]
+        blob = zlib.compress(json.dumps(values, default=str).encode())
+        fingerprint = self.fingerprint(backend)
+        with self._lock:
+            if not self.db_con.in_transaction:
+                self.exe('BEGIN')
+            self.exe('INSERT OR REPLACE INTO extracts '
+                     '(sha256, fingerprint, info, size, last_used) '
+                     'VALUES (?, ?, ?, ?, ?)',
+                     [sha256, fingerprint, blob, len(blob), time.time()])
+
+    def log_stats(self):
+        """Log the usage of the cache.
+
+        Returns:
+            None
+        """
+        rate = self.num_hits / self.num_lookups if self.num_lookups else 0
+        logging.info(f'Extraction cache: {self.num_hits} hits of '
+                     f'{self.num_lookups} pages ({rate:.1%}), '
+                     f'{self.num_evicted} entries evicted')
+
 
 def setup_file_logging(directory, log_level=logging.INFO):
     """Enable uniform logging for all modules.
@@ -755,61 +2373,309 @@ def setup_file_logging(directory, log_level=logging.INFO):
             CRITICAL, ERROR, WARNING, INFO, DEBUG, NOTSET
 
     Returns:
-        None
+        None
+    """
+    logging.basicConfig(
+        filename=str(directory / 'log.txt'),
+        format='[%(asctime)s] %(levelname)-8s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S',
+        level=log_level,
+        force=True)
+
+
+class Transport:
+    """Class encapsulating a pooled http transport.
+
+    All requests are done via one session with a pool of keep-alive
+    connections per host. Compressed responses are negotiated (gzip and
+    deflate, and brotli when a brotli package is installed), every request
+    has a connect and a read timeout, and responses with a 5xx status code,
+    responses with status 429 (too many requests) and failing connections
+    are retried a bounded number of times with exponential backoff (or after
+    the time given by a Retry-After header).
+
+    While requesting, the next counters are kept:
+
+    - requests: number of responses, including redirects
+    - bytes: number of (decompressed) bytes received
+    - connections: number of newly opened connections
+    - retries: number of retried requests
+    - failures: number of requests that failed after retrying
+    - latencies: seconds between sending a request and receiving its headers
+
+    The counters are safe to be updated from concurrent threads.
+
+    When an archive is given, all responses (including those of redirects)
+    are recorded in it, so a crawl can be replayed later by the ReplayServer
+    of the archive_lib module.
+    """
+
+    retry_codes = (429, 500, 502, 503, 504)
+
+    def __init__(self, pool_size=10, connect_timeout=5, read_timeout=30,
+                 max_retries=3, backoff_factor=0.5, archive=None):
+        """Initiates the transport object.
+
+        Args:
+            pool_size (int): maximum number of connections kept per host
+            connect_timeout (float): seconds to wait for a connection
+            read_timeout (float): seconds to wait for the server to respond
+            max_retries (int): maximum number of retries per request
+            backoff_factor (float): base in seconds of the exponential backoff
+                between retries
+            archive (ArchiveWriter): archive to record all responses in (see
+                archive_lib); no recording if None
+        """
+        self.timeout = (connect_timeout, read_timeout)
+        self.archive = archive
+        self._lock = threading.Lock()
+        self.num_requests = 0
+        self.num_bytes = 0
+        self.num_connections = 0
+        self.num_retries = 0
+        self.num_failures = 0
+        self.latencies = []
+        self.min_interval = 0
+        self._next_request = 0
+        self._throttle_lock = threading.Lock()
+
+        retry = Retry(
+            total=max_retries, backoff_factor=backoff_factor,
+            status_forcelist=self.retry_codes,
+            allowed_methods=frozenset({'GET', 'HEAD'}),
+            raise_on_status=False)
+        adapter = _CountingAdapter(
+            self, pool_connections=pool_size, pool_maxsize=pool_size,
+            max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update(make_headers(accept_encoding=True))
+
+    def close(self):
+        """Close the session with all pooled connections.
+
+        Returns:
+            None
+        """
+        self.session.close()
+
+    def get(self, url, **kwargs):
+        """Request an url while keeping the transport counters.
+
+        When the min_interval attribute of the transport is set, requests
+        are started with at least that number of seconds in between (as
+        demanded by a crawl delay for instance), also when requesting from
+        concurrent threads.
+
+        For a streamed response (stream=True) the body is not read here, so
+        the bytes counter should be raised via the count_bytes method by the
+        code that reads the body.
+
+        Args:
+            url (str): url to request
+            **kwargs: additional arguments for requests.Session.get
+
+        Returns:
+            requests.Response: response to the request
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        if self.min_interval:
+            with self._throttle_lock:
+                wait = self._next_request - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+                self._next_request = time.monotonic() + self.min_interval
+        try:
+            resp = self.session.get(url, **kwargs)
+        except requests.RequestException:
+            with self._lock:
+                self.num_failures += 1
+            raise
+        with self._lock:
+            for r in resp.history + [resp]:
+                self.num_requests += 1
+                if not (kwargs.get('stream') and r is resp):
+                    self.num_bytes += len(r.content)
+                self.latencies.append(r.elapsed.total_seconds())
+                retries = getattr(r.raw, 'retries', None)
+                if retries:
+                    self.num_retries += len(retries.history)
+        if self.archive:
+            # this reads the body of a streamed response as well
+            for r in resp.history + [resp]:
+                self.archive.write_response(r)
+        return resp
+
+    def count_bytes(self, num_bytes):
+        """Raise the bytes counter for a body that was read from a stream.
+
+        Args:
+            num_bytes (int): number of bytes read
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self.num_bytes += num_bytes
+
+    def _count_connection(self):
+        """Register a newly opened connection.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self.num_connections += 1
+
+    def stats(self):
+        """Get the counters of the transport.
+
+        Next figures are returned:
+
+        - requests: number of responses, including redirects
+        - bytes: number of (decompressed) bytes received
+        - connections: number of newly opened connections
+        - reused: number of requests that reused an open connection
+        - retries: number of retried requests
+        - failures: number of requests that failed after retrying
+        - latency_p50, latency_p90, latency_p99: latency percentiles in
+            seconds
+
+        Returns:
+            dict[str, int|float]: name:value pair for each figure
+        """
+        with self._lock:
+            latencies = sorted(self.latencies)
+            figures = {
+                'requests': self.num_requests,
+                'bytes': self.num_bytes,
+                'connections': self.num_connections,
+                'reused': max(0, self.num_requests - self.num_connections),
+                'retries': self.num_retries,
+                'failures': self.num_failures
+            }
+        for pct in (50, 90, 99):
+            if latencies:
+                idx = min(len(latencies) - 1, len(latencies) * pct // 100)
+                figures[f'latency_p{pct}'] = round(latencies[idx], 3)
+            else:
+                figures[f'latency_p{pct}'] = None
+        return figures
+
+    def log_stats(self):
+        """Log the counters of the transport.
+
+        Returns:
+            None
+        """
+        logging.info('Transport statistics:')
+        for name, value in self.stats().items():
+            logging.info(f'    {name}: {value}')
+
+
+class _CountingAdapter(HTTPAdapter):
+    """Transport adapter that counts the connections opened by its pools."""
+
+    def __init__(self, transport, **kwargs):
+        self._transport = transport
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        count = self._transport._count_connection
+
+        class CountingHTTPPool(HTTPConnectionPool):
+            def _new_conn(self):
+                count()
+                return super()._new_conn()
+
+        class CountingHTTPSPool(HTTPSConnectionPool):
+            def _new_conn(self):
+                count()
+                return super()._new_conn()
+
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': CountingHTTPPool, 'https': CountingHTTPSPool}
+
+
+_transport = None
+
+
+def default_transport():
+    """Return the transport that is used when none is given explicitly.
+
+    Returns:
+        Transport: transport shared within the module
     """
-    logging.basicConfig(
-        filename=str(directory / 'log.txt'),
-        format='[%(asctime)s] %(levelname)-8s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S',
-        level=log_level,
-        force=True)
+    global _transport
+    if _transport is None:
+        _transport = Transport()
+    return _transport
 
 
-def scrape_page(root_url, req_url):
+def scrape_page(root_url, req_url, transport=None, cond_headers=None):
     """Scrape an html page.
 
-    Since there can be more than one redirect per requested page, the last
+    Since there can be more than one redirect per requested page, the fourth
     element in the return tuple is a list of redirects instead of a single
     redirect (a 301 is often followed by a 302).
     The first item in the returned tuple is the url that comes from the content
     attribute of the <meta name="DCTERMS.identifier"> tag. This is the
     definitive url as generated by the WCM system.
+    The last item contains the values of the ETag and Last-Modified headers
+    of the response, which can be used for a conditional request of the page
+    in a later scrape.
     All url's are absolute.
 
+    When conditional headers are given and the server responds that the page
+    is not modified, a PageNotModified exception is raised, holding the url
+    of that response and the redirects that led to it.
+
+    The Content-Type of a response is checked before its body is read. When
+    it is not html, the body is only read to determine its size and hash,
+    and a NonHtmlResource exception is raised.
+
     Args:
         root_url (str): url that will be treated as the base of the scrape;
             links starting with root_url are interpreted as within scope
         req_url (str): url of requested page
+        transport (Transport): transport to use for the requests; the module
+            default transport if None
+        cond_headers (dict[str, str]): headers for a conditional request,
+            as returned by the cond_headers method of ScrapeDB
 
     Returns:
-        (str, BeautifulSoup, str, list of (str, str, str)):
+        (str, BeautifulSoup, str, list of (str, str, str), (str, str)):
             definitive url of the page,
             bs4 representation of the page,
             complete page as string,
-            list of (requested url, url of the response, type of redirect)
+            list of (requested url, url of the response, type of redirect),
+            (etag, last modified) of the response
     """
     redirs = []
+    if transport is None:
+        transport = default_transport()
 
     while True:
         # cycle until no rewrites or redirects
-        resp = requests.get(req_url)
-        if resp.status_code != 200:
+        # stream, to decide on the headers if the body will be read
+        resp = transport.get(req_url, headers=cond_headers, stream=True)
+        not_modified = resp.status_code == 304 and cond_headers
+        if resp.status_code != 200 and not not_modified:
+            resp.close()
             logging.error(f'Unexpected response from {req_url}; '
                           f'status code is {resp.status_code}.')
             raise requests.RequestException
 
-        # read and parse the response into a soup document
-        # resp_url = resp.url
-        page_as_string = resp.text
-        soup = BeautifulSoup(page_as_string, features='lxml')
-
         # are there any redirects?
         if len(resp.history) != 0:
             i_req_url = req_url
             for i_resp in resp.history:
                 if i_req_url.startswith(root_url):
                     # requested page is within scope of scrape
-                    i_resp_url = i_resp.headers['Location']
+                    # the location can be relative to the requested url
+                    i_resp_url = urljoin(i_req_url, i_resp.headers['Location'])
                     redirs.append((i_req_url, i_resp_url, i_resp.status_code))
                     if i_resp.status_code not in (301, 302):
                         # just to know if this occurs; probably not
@@ -818,6 +2684,29 @@ def scrape_page(root_url, req_url):
                             f'status code {i_resp.status_code}.')
                     i_req_url = i_resp_url
 
+        validators = resp.headers.get('ETag'), resp.headers.get('Last-Modified')
+        if not_modified:
+            resp.close()
+            raise PageNotModified(resp.url, redirs)
+
+        content_type = resp.headers.get('Content-Type', '')
+        if content_type and not content_type.startswith('text/html'):
+            # hash the body of the resource without keeping or parsing it
+            size, sha256 = 0, hashlib.sha256()
+            for chunk in resp.iter_content(chunk_size=64 * 1024):
+                size += len(chunk)
+                sha256.update(chunk)
+            resp.close()
+            transport.count_bytes(size)
+            raise NonHtmlResource(resp.url, content_type, size,
+                                  sha256.hexdigest(), validators, redirs)
+
+        # read and parse the response into a soup document
+        # resp_url = resp.url
+        page_as_string = resp.text
+        transport.count_bytes(len(resp.content))
+        soup = BeautifulSoup(page_as_string, features='lxml')
+
         # do we have a client-side redirect page via the next header tag?
         #       <meta http-equiv="refresh" content="0;url=...">
         meta_tag = soup.head.find('meta', attrs={'http-equiv': 'refresh'})
@@ -859,7 +2748,7 @@ def scrape_page(root_url, req_url):
             def_url = resp_url
 
         # return implicitly ends while loop
-        return def_url, soup, page_as_string, redirs
+        return def_url, soup, page_as_string, redirs, validators
 
 
 def page_links(soup, root_url, root_rel=False, remove_anchor=True):
@@ -898,32 +2787,47 @@ def page_links(soup, root_url, root_rel=False, remove_anchor=True):
     links = []
     if soup.body and soup.body.a:
         for a_tag in soup.body.find_all('a', href=True):
-            link = a_tag['href']
-            if 'readspeaker' in link or 'adobe' in link:
-                continue
-            if remove_anchor:
-                link = link.partition('#')[0]
-
-            # make link into complete url's if necessary
-            if re.match(_re_path, link):
-                domain = _re_domain.match(root_url)[0]
-                link = domain + link
-            elif re.match(_re_network_path, link):
-                protocol = _re_protocol.match(root_url)[0]
-                link = protocol + link
-            elif not re.match(_re_protocol, link):
-                continue
-
-            # make link relative to root_url if needed
-            if root_rel:
-                link = re.sub(root_url, '', link)
-
+            link = _link_url(a_tag['href'], root_url, root_rel, remove_anchor)
             if link:
                 links.append((a_tag.text.strip(), link))
 
     return links
 
 
+def _link_url(link, root_url, root_rel, remove_anchor):
+    """Filter and complete the url of a link (see page_links).
+
+    Args:
+        link (str): href value of the link
+        root_url (str): the root url with which the page was scraped
+        root_rel (bool): return the url relative to root_url
+        remove_anchor (bool): remove the anchor from the url
+
+    Returns:
+        str|None: url of the link, None if the link is excluded
+    """
+    if 'readspeaker' in link or 'adobe' in link:
+        return None
+    if remove_anchor:
+        link = link.partition('#')[0]
+
+    # make link into complete url's if necessary
+    if re.match(_re_path, link):
+        domain = _re_domain.match(root_url)[0]
+        link = domain + link
+    elif re.match(_re_network_path, link):
+        protocol = _re_protocol.match(root_url)[0]
+        link = protocol + link
+    elif not re.match(_re_protocol, link):
+        return None
+
+    # make link relative to root_url if needed
+    if root_rel:
+        link = re.sub(root_url, '', link)
+
+    return link or None
+
+
 def content_trees(soup):
     """Return two html trees with only editorial and automated content.
 
@@ -1073,42 +2977,758 @@ def get_text(soup):
     """Retrieve essential editorial and automated text content from a page.
 
     The editorial and automated text of the page content is returned together
-    as a twofold tuple. Basically the texts are retrieved from a copy of the
-    soup document which is pruned back to its editorial or automated content
-    branches. Whitespace of these texts is normalised and coherent chunks are
-    seperated by newlines.
+    as a twofold tuple. Basically the texts are retrieved from the soup
+    document as pruned back to its editorial or automated content branches
+    (see content_trees). Whitespace of these texts is normalised and coherent
+    chunks are seperated by newlines.
+
+    Both texts are gathered in one traversal of the soup document, which is
+    neither copied nor altered. The chunking is the same as when the trees
+    of content_trees are reduced with flatten_tagbranch_to_navstring, so
+    the resulting texts are identical to those of that approach.
+
+    Args:
+        soup (BeautifulSoup): bs4 representation of a page
+
+    Returns:
+        (str, str): (editorial text, automated text) of the page
+    """
+
+    removed = _pruned_branches(soup)
+
+    # test if page is generated without any editor intervention
+    overview = any(
+        id(body) not in removed and not _in_branches(body, removed)
+        for body in soup('body', attrs={'data-pagetype': 'bld-overview'}))
+    if overview:
+        # all remaining content is automated
+        content_adds = set()
+    else:
+        content_adds = {
+            id(tag) for tag in soup.find_all('div', class_='content_add')
+            if id(tag) not in removed and not _in_branches(tag, removed)}
+    aut_parts = []
+
+    def branch_text(tag):
+        # text with which flatten_tagbranch_to_navstring would replace tag
+        types = tag.interesting_string_types
+        if types is None:
+            types = tag.MAIN_CONTENT_STRING_TYPES
+        parts = []
+        for child in tag.contents:
+            if isinstance(child, Tag):
+                if id(child) in removed:
+                    continue
+                if id(child) in content_adds:
+                    # automated content is grafted in document order, nested
+                    # content_add branches after the branch containing them
+                    index = len(aut_parts)
+                    aut_parts.append('')
+                    aut_parts[index] = branch_text(child)
+                    continue
+                text = branch_text(child)
+                if _is_interesting(NavigableString, types):
+                    parts.append(text)
+            elif _is_interesting(type(child), types):
+                parts.append(child)
+        tag_text = ''.join(parts)
+
+        tag_name = tag.name
+        if tag_name == 'br':
+            return '#br#'
+        elif tag_name == 'a':
+            return f' {tag_text}'  # the leading space is significant
+        elif tag_name in {'p', 'h1', 'h2', 'h3', 'li', 'div'}:
+            return f'#br#{tag_text}#br#'
+        else:
+            return tag_text
+
+    soup_text = branch_text(soup)
+    if overview:
+        ed_text, aut_text = '', soup_text
+    else:
+        ed_text, aut_text = soup_text, ''.join(aut_parts)
+
+    return [_normalised_text(txt) for txt in (ed_text, aut_text)]
+
+
+def _normalised_text(txt):
+    """Normalise the whitespace of a text with '#br#' markers.
+
+    Args:
+        txt (str): text of a content tree with '#br#' markers
+
+    Returns:
+        str: text with normalised whitespace and newlines between the
+            coherent chunks
+    """
+
+    # replace non-breaking spaces with normal ones
+    txt = txt.replace(b'\xc2\xa0'.decode(), ' ')
+
+    # subsitute one space for any cluster of whitespace chars (getting rid
+    # of returns, newlines, tabs, spaces, etc.; this is html, you know!)
+    txt = re.sub(r'\s+', ' ', txt)
+
+    # change marked <br>'s to newlines, while reducing multiples
+    # seperated by whitespace only; the final strip() removes potential
+    # trailing newlines
+    return re.sub(r'\s*(#br#\s*)+\s*', r'\n', txt).strip()
+
+
+def _pruned_branches(soup):
+    """Find the branches that content_trees removes from both trees.
+
+    The branches are searched in the same order as content_trees removes
+    them, skipping the branches that are within removed ones already.
+
+    Args:
+        soup (BeautifulSoup): bs4 representation of a page
+
+    Returns:
+        set of int: id's of the top tags of the removed branches
+    """
+    removed = set()
+
+    def remove_first(tags):
+        for tag in tags:
+            if not _in_branches(tag, removed):
+                removed.add(id(tag))
+                return
+
+    if soup.head:
+        removed.add(id(soup.head))
+    body = soup.body
+    if body:
+        remove_first(body.find_all('header'))
+        remove_first(body.find_all('footer'))
+    remove_first(soup.find_all('div', id='bld-nojs'))
+    remove_first(soup.find_all(class_='bld-subnavigatie'))
+    remove_first(soup.find_all(class_='bld-feedback'))
+    for tag in soup.find_all('div', class_='rs_skip') + \
+            soup.find_all('div', id='vaModal'):
+        if not _in_branches(tag, removed):
+            removed.add(id(tag))
+    return removed
+
+
+def _in_branches(tag, branches):
+    """Check if a tag is within one of some branches.
+
+    Args:
+        tag (Tag): tag to check
+        branches (set of int): id's of the top tags of the branches
+
+    Returns:
+        bool: True if one of the parents of tag is the top of a branch
+    """
+    return any(id(parent) in branches for parent in tag.parents)
+
+
+def _is_interesting(string_type, types):
+    """Check if strings of some type are part of the text of a tag.
+
+    Args:
+        string_type (type): subclass of NavigableString
+        types (type|tuple|set|None): interesting string types of the tag
+
+    Returns:
+        bool: True if strings of string_type are part of the text
+    """
+    if isinstance(types, type):
+        return string_type is types
+    return types is None or string_type in types
+
+
+def extract_page_info(soup, path):
+    """Extract the information of a page for the pages_info table.
+
+    The returned dictionary contains a value for each of the extracted_fields
+    of the ScrapeDB class, as declared by the page_info_extractors registry.
+    See the extract_pages_info method of that class for a description of
+    these fields. The soup document is not altered.
+
+    The values of the fields are found in one walk over the tags of the
+    page, while the texts are gathered by the get_text function.
+
+    It will be logged when tags or attributes are missing or values are
+    invalid.
 
     Args:
         soup (BeautifulSoup): bs4 representation of a page
+        path (str): path of the page, used in log messages
+
+    Returns:
+        dict[str, str|int|date|None]: field name:value pairs
+    """
+    if '*' in _field_tags:
+        tags = soup.find_all(True)
+    else:
+        tags = soup.find_all(_field_tags.keys())
+    found = _found_fields(
+        tags, tag_name=lambda tag: tag.name,
+        attr_value=lambda tag, attr: tag.get(attr),
+        tag_text=lambda tag: tag.text,
+        in_head=lambda tag: any(p.name == 'head' for p in tag.parents))
+    texts = dict(zip(('ed_text', 'aut_text'), get_text(soup)))
+    return _field_values(found, texts, path)
+
+
+def parse_page_lxml(page_string):
+    """Parse a page for the lxml backend of the extraction.
+
+    A document without any element (empty, only whitespace or only a
+    comment) can not be parsed by lxml. An empty tree is returned for it, as
+    bs4 returns an empty soup, so the extraction gives the same results.
+
+    Args:
+        page_string (str): complete html of a page
+
+    Returns:
+        lxml.html.HtmlElement: root of the parsed page
+    """
+    try:
+        return lxml.html.document_fromstring(page_string)
+    except etree.ParserError:
+        return lxml.html.fromstring('<html/>')
+
+
+def extract_page_info_lxml(root, path):
+    """Extract the information of a page using lxml instead of bs4.
+
+    This is the lxml backend of the extraction (see the extract_pages_info
+    method of ScrapeDB). The candidate tags of the page_info_extractors are
+    selected with one precompiled XPath expression directly on the lxml
+    tree of the page, while the texts are gathered with the same rules as
+    the get_text function uses for a bs4 tree. The resulting information is
+    the same as that of the extract_page_info function.
+
+    Args:
+        root (lxml.html.HtmlElement): root of the parsed page
+        path (str): path of the page, used in log messages
+
+    Returns:
+        dict[str, str|int|date|None]: field name:value pairs
+    """
+    found = _found_fields(
+        _xp_fields(root), tag_name=lambda el: el.tag,
+        attr_value=_lxml_attr, tag_text=_lxml_text,
+        in_head=lambda el: any(
+            a.tag == 'head' for a in el.iterancestors()))
+    texts = dict(zip(('ed_text', 'aut_text'), _get_text_lxml(root)))
+    return _field_values(found, texts, path)
+
+
+def extract_info(page_string, path, backend='bs4', soup=None):
+    """Extract the information of a page with one of the backends.
+
+    This is the extraction of the pages_info table, both during the crawl
+    and afterwards (see the extract_pages_info method of ScrapeDB).
+
+    Args:
+        page_string (str): complete html of a page
+        path (str): path of the page, used in log messages
+        backend (str): 'bs4' or 'lxml'
+        soup (BeautifulSoup): bs4 representation of the page, which is used
+            instead of parsing the page again by the bs4 backend
+
+    Returns:
+        dict[str, str|int|date|None]: field name:value pairs
+    """
+    if backend == 'lxml':
+        return extract_page_info_lxml(parse_page_lxml(page_string), path)
+    if soup is None:
+        soup = BeautifulSoup(page_string, features='lxml')
+    return extract_page_info(soup, path)
+
+
+def extract_page_metadata(page_string, path):
+    """Extract the metadata fields of a page for the pages_info table.
+
+    The metadata fields are the fields of the page_info_extractors that are
+    found within the <head> of a page or in the <body> tag itself (title,
+    description, language, modified, pagetype and classes). To get these,
+    the page is only tokenised up to the <body> tag, without building a
+    tree. So this is much faster than the extract_page_info function, while
+    the values and the logging of missing or invalid values are the same.
+
+    Args:
+        page_string (str): html of the page
+        path (str): path of the page, used in log messages
+
+    Returns:
+        dict[str, str|date|None]: field name:value pairs of the metadata
+            fields
+    """
+    target = _MetadataTarget()
+    parser = etree.HTMLParser(target=target)
+    for start in range(0, len(page_string), _metadata_chunk):
+        parser.feed(page_string[start:start + _metadata_chunk])
+        if target.done:
+            break
+    try:
+        parser.close()
+    except etree.XMLSyntaxError:
+        # empty document
+        pass
+    found = _found_fields(
+        target.tags, tag_name=lambda tag: tag.tag, attr_value=_lxml_attr,
+        tag_text=lambda tag: ''.join(tag.text),
+        in_head=lambda tag: tag.in_head)
+    return _field_values(found, {}, path, metadata_extractors)
+
+
+class _PartialTag:
+    """Start tag and text of an element found by partial parsing.
+
+    With the tag and get attributes, this can be handled as an lxml element
+    by the _lxml_attr function.
+    """
+
+    def __init__(self, tag, attrib, in_head):
+        self.tag = tag
+        self.attrib = attrib
+        self.in_head = in_head
+        self.text = []
+
+    def get(self, attr):
+        return self.attrib.get(attr)
+
+
+class _MetadataTarget:
+    """Parser target collecting the tags up to the <body> tag of a page.
+
+    Only the tags that might match one of the page_info_extractors are
+    collected, with the text within them. The done attribute is set when
+    the <body> tag is received, after which all events are ignored.
+    """
+
+    def __init__(self):
+        self.tags = []
+        self.done = False
+        self.in_head = False
+        # open elements, with a _PartialTag for the collected ones
+        self._open = []
+
+    def start(self, tag, attrib):
+        if self.done:
+            return
+        if tag == 'head':
+            self.in_head = True
+        partial = None
+        if tag in _field_tags or '*' in _field_tags:
+            partial = _PartialTag(tag, dict(attrib), self.in_head)
+            self.tags.append(partial)
+        self._open.append(partial)
+        if tag == 'body':
+            self.done = True
+
+    def end(self, tag):
+        if self.done:
+            return
+        if tag == 'head':
+            self.in_head = False
+        if self._open:
+            self._open.pop()
+
+    def data(self, data):
+        if self.done:
+            return
+        for partial in self._open:
+            if partial:
+                partial.text.append(data)
+
+    def close(self):
+        return None
+
+
+def _compile_extractors(extractors):
+    """Compile field extractors for their evaluation in one walk.
+
+    Args:
+        extractors (list of FieldExtractor): extractors to compile
+
+    Returns:
+        (dict[str, list of FieldExtractor], etree.XPath): extractors with a
+            tag per tag name ('*' for any tag), and an XPath expression
+            selecting the tags that might match any extractor
+    """
+    field_tags = {}
+    paths = []
+    for extractor in extractors:
+        if not extractor.tag:
+            continue
+        field_tags.setdefault(extractor.tag, []).append(extractor)
+        conditions = ''.join(f'[@{a}="{v}"]'
+                             for a, v in (extractor.attrs or {}).items())
+        scope = '//head//' if extractor.in_head else '//'
+        paths.append(f'{scope}{extractor.tag}{conditions}')
+    return field_tags, etree.XPath(' | '.join(dict.fromkeys(paths)))
+
+
+def _found_fields(tags, tag_name, attr_value, tag_text, in_head):
+    """Find the values of the page_info_extractors in the tags of a page.
+
+    The tags can be of both backends (bs4 tags or lxml elements); functions
+    to access them are given as arguments.
+
+    Args:
+        tags (iterable): candidate tags of a page in document order
+        tag_name (function): name of a tag
+        attr_value (function): value of an attribute of a tag, None if the
+            tag has no such attribute
+        tag_text (function): text of a tag
+        in_head (function): True if a tag is within <head>
+
+    Returns:
+        dict[str, str|list|None]: field name:value pairs, with None for
+            fields of which no tag or attribute is found and a list of
+            values for fields with all_tags
+    """
+    found = {e.name: [] for e in page_info_extractors if e.all_tags}
+    for tag in tags:
+        name = tag_name(tag)
+        for extractor in _field_tags.get(name, []) + \
+                _field_tags.get('*', []):
+            if extractor.name in found and not extractor.all_tags:
+                # value of first matching tag found already
+                continue
+            if extractor.attrs and any(
+                    attr_value(tag, a) != v
+                    for a, v in extractor.attrs.items()):
+                continue
+            if extractor.in_head and not in_head(tag):
+                continue
+            if extractor.attr:
+                value = attr_value(tag, extractor.attr)
+            else:
+                value = tag_text(tag)
+            if extractor.all_tags:
+                found[extractor.name].append(value)
+            else:
+                found[extractor.name] = value
+    return found
+
+
+def _field_values(found, texts, path, extractors=None):
+    """Check and convert the values found for the page_info_extractors.
+
+    It will be logged when tags or attributes are missing or values are
+    invalid.
+
+    Args:
+        found (dict[str, str|list|None]): values as returned by the
+            _found_fields function
+        texts (dict[str, str]): editorial and automated text of the page
+        path (str): path of the page, used in log messages
+        extractors (list of FieldExtractor): extractors to evaluate; all
+            page_info_extractors if None
+
+    Returns:
+        dict[str, str|int|date|None]: field name:value pairs
+    """
+    info = {}
+    for extractor in extractors or page_info_extractors:
+        if not extractor.tag:
+            info[extractor.name] = texts[extractor.name]
+            continue
+        value = found.get(extractor.name)
+        if value is None or extractor.all_tags and not value:
+            if extractor.missing:
+                logging.log(extractor.log_level,
+                            f'{extractor.missing}: {path}')
+        elif not value and extractor.empty:
+            logging.warning(f'{extractor.empty}: {path}')
+        if value is not None and extractor.transform:
+            try:
+                value = extractor.transform(value)
+            except ValueError:
+                logging.warning(f'{extractor.invalid}: {path}')
+                value = None
+        info[extractor.name] = value
+    return info
+
+
+def _lxml_attr(el, attr):
+    """Return the value of an attribute of an lxml element as bs4 would.
+
+    The values of attributes that bs4 treats as multi-valued (like class)
+    are split on whitespace.
+
+    Args:
+        el (lxml.etree._Element): element within a page
+        attr (str): name of the attribute
+
+    Returns:
+        str|list of str|None: value of the attribute, None if absent
+    """
+    value = el.get(attr)
+    if value is not None and (attr in _list_attrs.get('*', ())
+                              or attr in _list_attrs.get(el.tag, ())):
+        value = value.split()
+    return value
+
+
+# compiled page_info_extractors, and the attributes with multiple values
+_field_tags, _xp_fields = _compile_extractors(page_info_extractors)
+_list_attrs = HTMLTreeBuilder.DEFAULT_CDATA_LIST_ATTRIBUTES
+
+# extractors of the metadata fields, and the chunk size of partial parsing
+metadata_extractors = [e for e in page_info_extractors
+                       if (e.in_head or e.tag == 'body') and not e.all_tags]
+_metadata_chunk = 4096
+
+
+# precompiled XPath expressions of the lxml extraction backend
+def _xp_class(class_name):
+    return f'contains(concat(" ", normalize-space(@class), " "), ' \
+           f'" {class_name} ")'
+
+
+_xp_heads = etree.XPath('//head')
+_xp_bodies = etree.XPath('//body')
+_xp_headers = etree.XPath('.//header')
+_xp_footers = etree.XPath('.//footer')
+_xp_nojs = etree.XPath('//div[@id="bld-nojs"]')
+_xp_subnav = etree.XPath(f'//*[{_xp_class("bld-subnavigatie")}]')
+_xp_feedback = etree.XPath(f'//*[{_xp_class("bld-feedback")}]')
+_xp_skips = etree.XPath(
+    f'//div[{_xp_class("rs_skip")}] | //div[@id="vaModal"]')
+_xp_overviews = etree.XPath('//body[@data-pagetype="bld-overview"]')
+_xp_content_adds = etree.XPath(f'//div[{_xp_class("content_add")}]')
+
+# tags of which the strings are not text of other tags (as with bs4)
+_string_containers = {'script', 'style', 'template', 'rt', 'rp'}
+
+
+def _get_text_lxml(root):
+    """Retrieve editorial and automated text from an lxml tree of a page.
+
+    This is the counterpart of the get_text function for the lxml
+    extraction backend, with the same results.
+
+    Args:
+        root (lxml.html.HtmlElement): root of the parsed page
 
     Returns:
         (str, str): (editorial text, automated text) of the page
     """
 
-    result = []
+    # branches removed from both trees (as in _pruned_branches)
+    removed = set()
+
+    def remove_first(elements):
+        for el in elements:
+            if not _lxml_in_branches(el, removed):
+                removed.add(el)
+                return
+
+    heads = _xp_heads(root)
+    if heads:
+        removed.add(heads[0])
+    bodies = _xp_bodies(root)
+    if bodies:
+        remove_first(_xp_headers(bodies[0]))
+        remove_first(_xp_footers(bodies[0]))
+    remove_first(_xp_nojs(root))
+    remove_first(_xp_subnav(root))
+    remove_first(_xp_feedback(root))
+    # document order, as with consecutive removal of both kinds of branches
+    for el in _xp_skips(root):
+        if not _lxml_in_branches(el, removed):
+            removed.add(el)
+
+    overview = any(el not in removed and not _lxml_in_branches(el, removed)
+                   for el in _xp_overviews(root))
+    if overview:
+        content_adds = set()
+    else:
+        content_adds = {
+            el for el in _xp_content_adds(root)
+            if el not in removed and not _lxml_in_branches(el, removed)}
+    aut_parts = []
+
+    def branch_text(el, container):
+        # container: string container the strings of el belong to
+        tag_name = el.tag
+        own = tag_name if tag_name in _string_containers else None
+        parts = []
+        if el.text and container == own:
+            parts.append(el.text)
+        for child in el:
+            if isinstance(child.tag, str) and child not in removed:
+                child_container = child.tag \
+                    if child.tag in _string_containers else container
+                if child in content_adds:
+                    index = len(aut_parts)
+                    aut_parts.append('')
+                    aut_parts[index] = branch_text(child, child_container)
+                else:
+                    text = branch_text(child, child_container)
+                    if own is None:
+                        parts.append(text)
+            if child.tail and container == own:
+                parts.append(child.tail)
+        tag_text = ''.join(parts)
+
+        if tag_name == 'br':
+            return '#br#'
+        elif tag_name == 'a':
+            return f' {tag_text}'
+        elif tag_name in {'p', 'h1', 'h2', 'h3', 'li', 'div'}:
+            return f'#br#{tag_text}#br#'
+        else:
+            return tag_text
+
+    root_text = branch_text(root, _lxml_container(root))
+    if overview:
+        texts = ('', root_text)
+    else:
+        texts = (root_text, ''.join(aut_parts))
+    return [_normalised_text(txt) for txt in texts]
+
+
+def _lxml_in_branches(el, branches):
+    """Check if an lxml element is within one of some branches.
+
+    Args:
+        el (lxml.etree._Element): element to check
+        branches (set of lxml.etree._Element): top elements of the branches
+
+    Returns:
+        bool: True if one of the ancestors of el is the top of a branch
+    """
+    return any(ancestor in branches for ancestor in el.iterancestors())
+
+
+def _lxml_container(el):
+    """Return the string container the strings of an lxml element belong to.
+
+    Args:
+        el (lxml.etree._Element): element within a page
+
+    Returns:
+        str|None: tag name of the nearest string container of el (including
+            el itself), None if el is not within such a container
+    """
+    for ancestor in (el, *el.iterancestors()):
+        if ancestor.tag in _string_containers:
+            return ancestor.tag
+    return None
+
+
+def _lxml_text(el):
+    """Return the text of an lxml element as bs4 would for the same tag.
+
+    Args:
+        el (lxml.etree._Element): element within a page
+
+    Returns:
+        str: the concatenated strings of the element that belong to the same
+            string container as the element itself
+    """
+    own = el.tag if el.tag in _string_containers else None
+
+    def strings(element, container):
+        if element.text and container == own:
+            yield element.text
+        for child in element:
+            if isinstance(child.tag, str):
+                yield from strings(
+                    child, child.tag if child.tag in _string_containers
+                    else container)
+            if child.tail and container == own:
+                yield child.tail
+
+    return ''.join(strings(el, _lxml_container(el)))
 
-    for tree in content_trees(soup):
 
-        flatten_tagbranch_to_navstring(tree.html)
+def _extractor_fingerprint(backend):
+    """Return a fingerprint of an extraction backend.
 
-        # replace non-breaking spaces with normal ones
-        txt = tree.text.replace(b'\xc2\xa0'.decode(), ' ')
+    The fingerprint changes with the source code of the functions (and
+    XPath expressions) that extract the information of a page with the
+    backend, the declarations of the page_info_extractors registry and the
+    versions of the packages that parse the page.
 
-        # subsitute one space for any cluster of whitespace chars (getting rid
-        # of returns, newlines, tabs, spaces, etc.; this is html, you know!)
-        txt = re.sub(r'\s+', ' ', txt)
+    Args:
+        backend (str): 'bs4' or 'lxml'
 
-        # change marked <br>'s to newlines, while reducing multiples
-        # seperated by whitespace only; the final strip() removes potential
-        # trailing newlines
-        txt = re.sub(r'\s*(#br#\s*)+\s*', r'\n', txt).strip()
+    Returns:
+        str: hexadecimal SHA-256 hash of the extractor
+    """
+    if backend == 'lxml':
+        functions = [extract_page_info_lxml, _get_text_lxml,
+                     _lxml_in_branches, _lxml_container, _lxml_text,
+                     _lxml_attr]
+        versions = [f'lxml {etree.__version__}']
+        # the precompiled XPath expressions and the string containers
+        versions += sorted(xp.path for name, xp in globals().items()
+                           if name.startswith('_xp_')
+                           and isinstance(xp, etree.XPath))
+        versions.append(repr(sorted(_string_containers)))
+    else:
+        functions = [extract_page_info, get_text, _pruned_branches,
+                     _in_branches, _is_interesting]
+        versions = [f'bs4 {bs4.__version__}', f'lxml {etree.__version__}']
+    functions += [_found_fields, _field_values, _normalised_text]
+    declarations = []
+    for extractor in page_info_extractors:
+        transform = extractor.transform
+        if inspect.isfunction(transform):
+            transform = inspect.getsource(transform)
+        elif transform:
+            # builtin function or method
+            transform = transform.__qualname__
+        declarations.append(repr(extractor._replace(transform=transform)))
+    sha256 = hashlib.sha256()
+    for part in [backend, *versions, *declarations,
+                 *[inspect.getsource(f) for f in functions]]:
+        sha256.update(part.encode())
+    return sha256.hexdigest()
+
+
+def editorial_links(soup, root_url):
+    """Retrieve all links from the editorial content of a page.
+
+    The links are the same as those that page_links returns for the
+    editorial tree of content_trees, but are found by skipping the branches
+    that content_trees would prune, so the soup document is neither copied
+    nor altered. Anchors are removed from the links.
 
-        result.append(txt)
+    Args:
+        soup (BeautifulSoup): bs4 representation of a page
+        root_url (str): the root url with which the page was scraped
 
-        # remove the working copy of the soup doc
-        tree.decompose()
+    Returns:
+        list of (str, str): list of (link text, link url) tuples, with url's
+            relative to root_url when within scope
+    """
+    body = soup.body
+    removed = _pruned_branches(soup)
+    if not body or id(body) in removed or _in_branches(body, removed):
+        return []
+    if any(id(tag) not in removed and not _in_branches(tag, removed)
+           for tag in soup('body', attrs={'data-pagetype': 'bld-overview'})):
+        # page without editorial content
+        return []
+    for tag in soup.find_all('div', class_='content_add'):
+        if not _in_branches(tag, removed):
+            removed.add(id(tag))
+    # the branch that page_links removes from the editorial tree
+    for tag in soup.find_all('div', id='bld-nojs'):
+        if id(tag) not in removed and not _in_branches(tag, removed):
+            removed.add(id(tag))
+            break
 
-    return result
+    links = []
+    for a_tag in body.find_all('a', href=True):
+        if _in_branches(a_tag, removed):
+            continue
+        link = _link_url(a_tag['href'], root_url, True, True)
+        if link:
+            links.append((a_tag.text.strip(), link))
+    return links
 
 
 def scrape_dirs(master_dir, min_timestamp='000000-0000',
@@ -1505,6 +4125,15 @@ def redir_figures(database, table):
     - redits_<type>_slash: redirects per type with only differing a slash
     - url-aliases: number of url's that alias an authoritative url henk
     - url-aliases_<num>x: number of url's with <num> aliases
+    - redir-chains_<num>x: number of requested paths with <num> redirects
+        to their definitive path
+    - redir-loops: number of requested paths with looping redirects
+    - redir-def-redirected: number of definitive paths that get redirected
+    - redir-no-page: number of redirected paths without a page as
+        definitive path
+
+    The last figures are taken from the definitive paths of the scrape (see
+    the def_paths method of ScrapeDB). The database is not altered.
 
     Args:
         database (Path): scrape database
@@ -1513,6 +4142,9 @@ def redir_figures(database, table):
     Returns:
         list[tuple[str, int]]: list of name/value pairs for each typical figure
     """
+    db = ScrapeDB(database, version_check=False)
+    def_paths = db.def_paths()
+    db.close()
     db_conn = sqlite3.connect(database, isolation_level=None)
     db_exe = db_conn.execute
     figures = []
@@ -1560,6 +4192,22 @@ def redir_figures(database, table):
     for alias_per_url, count in db_exe(qry).fetchall():
         figures.append((f'url-aliases_{alias_per_url}x', count))
 
+    # requested paths per number of redirects to their definitive path
+    chains = {}
+    for _, _, _, hops, _, cycle, _ in def_paths:
+        if hops and not cycle:
+            chains[hops] = chains.get(hops, 0) + 1
+    for hops in sorted(chains):
+        figures.append((f'redir-chains_{hops}x', chains[hops]))
+
+    # redirect loops, redirected definitive paths and redirects to no page
+    loops = sum(row[5] for row in def_paths)
+    redirected = len({row[1] for row in def_paths if row[6]})
+    no_page = sum(1 for row in def_paths if row[3] and row[2] is None)
+    figures.append(('redir-loops', loops))
+    figures.append(('redir-def-redirected', redirected))
+    figures.append(('redir-no-page', no_page))
+
     db_conn.close()
     return figures
 
@@ -1597,16 +4245,23 @@ def dimensions(database, table):
     return dims
 
 
-def master_figures(master_dir, min_timestamp, max_timestamp):
+def master_figures(master_dir, min_timestamp, max_timestamp,
+                   refresh_info=False):
     """Add key and dimensional figures to the master db for a range of scrapes.
 
     Key and dimensional figures will be generated for all the scrapes within
     the given range and (re)written to the scrape_master database.
 
+    With refresh_info, the metadata fields of the pages_info table of each
+    scrape are extracted again from the heads of the pages, and the derived
+    fields are derived again, before generating the figures.
+
     Args:
         master_dir (Path): directory containing master db and scrapes
         min_timestamp (str): scrapes before are not processed
         max_timestamp (str): scrapes after are not processed
+        refresh_info (bool): refresh the metadata and derived fields of the
+            pages_info table of the scrapes
 
     Returns:
         None
@@ -1621,6 +4276,12 @@ def master_figures(master_dir, min_timestamp, max_timestamp):
                                              max_timestamp):
         sdb_file = scrape_dir / 'scrape.db'
 
+        if refresh_info:
+            sdb = ScrapeDB(sdb_file)
+            sdb.extract_pages_metadata()
+            sdb.derive_pages_info()
+            sdb.close()
+
         key_figures = page_figures(sdb_file, 'pages_info')
         key_figures += redir_figures(sdb_file, 'redirs')
         for name, value in key_figures:
@@ -1645,6 +4306,33 @@ def master_figures(master_dir, min_timestamp, max_timestamp):
     mdb_conn.close()
 
 
+def store_page_blobs(master_dir, min_timestamp, max_timestamp):
+    """Move the documents of a range of scrapes to the blob store.
+
+    The documents of the pages of all scrapes within the given range are
+    moved to the BlobStore in the master directory (see the
+    move_docs_to_blob_store method of ScrapeDB). Documents that are moved
+    already are skipped.
+
+    Args:
+        master_dir (Path): directory containing master db and scrapes
+        min_timestamp (str): scrapes before are not processed
+        max_timestamp (str): scrapes after are not processed
+
+    Returns:
+        None
+    """
+    store = BlobStore(master_dir)
+    for timestamp, scrape_dir in scrape_dirs(master_dir, min_timestamp,
+                                             max_timestamp):
+        sdb = ScrapeDB(scrape_dir / 'scrape.db')
+        sdb.move_docs_to_blob_store(store)
+        sdb.blob_store = None
+        sdb.close()
+        print(f'Documents of scrape of {timestamp} moved to the blob store')
+    store.close()
+
+
 def compile_history(master_dir, max_timestamp,
                     weekly=True, monthly=True, renew_tables=False):
     """Compile history of page changes within the master database.
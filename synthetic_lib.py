@@ -0,0 +1,546 @@
+"""Generate and serve a synthetic site shaped like the real one (version 1.0).
+
+Classes in this module:
+
+- SyntheticSite: deterministic generator of the responses of a synthetic site
+- SyntheticServer: local http server for a synthetic site
+
+The synthetic site mimics www.belastingdienst.nl as far as the scrape
+pipeline depends on it, so the throughput of crawling, extraction, history
+and reporting can be measured at sizes beyond that of the real site. Pages
+are generated on request from the number that is part of their path, so
+sites of a million pages do not need any storage.
+"""
+
+import gzip
+import logging
+import random
+import re
+import time
+import zlib
+from datetime import date, timedelta
+from email.utils import formatdate
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import NamedTuple
+
+# sections of the site as (language, business, name), one for every page
+# directly below the home page
+SECTIONS = [
+    ('nl', 'belastingen', 'prive'),
+    ('nl', 'belastingen', 'zakelijk'),
+    ('nl', 'toeslagen', 'toeslagen'),
+    ('nl', 'douane', 'douane'),
+    ('nl', 'belastingen', 'intermediairs'),
+    ('nl', 'belastingen', 'nieuws'),
+    ('en', 'belastingen', 'individuals'),
+    ('en', 'douane', 'customs'),
+]
+
+# page types with their relative frequency for pages with and without pages
+# below them
+NODE_TYPES = {'bld-overview': 6, 'bld-cluster': 2, 'bld-targetGroup': 2}
+LEAF_TYPES = {'bld-target': 40, 'bld-concept': 15, 'bld-faq': 10,
+              'bld-filter': 8, 'bld-dv-content': 8, 'bld-direction': 5,
+              'bld-newsItem': 6, 'bld-wrapper': 4, 'bld-outage': 1,
+              'bld-iahWrapper': 1, 'bld-bd': 1, 'bld-sitemap': 1}
+
+WORDS = [
+    'aangifte', 'inkomstenbelasting', 'toeslag', 'huurtoeslag', 'zorgtoeslag',
+    'kinderopvang', 'btw', 'ondernemer', 'aftrek', 'hypotheek', 'woning',
+    'auto', 'motorrijtuigenbelasting', 'bpm', 'schenking', 'erfenis',
+    'vermogen', 'box', 'loonheffing', 'werkgever', 'douane', 'invoer',
+    'uitvoer', 'aanslag', 'betalen', 'terugvragen', 'bezwaar', 'uitstel',
+    'voorlopige', 'definitieve', 'partner', 'kinderen', 'pensioen',
+    'lijfrente', 'studie', 'gift', 'zorgkosten', 'buitenland', 'emigratie',
+    'vennootschap',
+    'dividend', 'rente', 'spaargeld', 'beleggingen', 'schulden', 'machtiging',
+    'formulier', 'rekenhulp', 'termijn', 'wijzigen', 'doorgeven', 'regeling',
+]
+
+BASE_DATE = date(2015, 1, 1)
+
+
+class Page(NamedTuple):
+    """Static properties of a page of a synthetic site."""
+    page_num: int
+    lang: str
+    business: str
+    pagetype: str
+    title: str
+    def_path: str
+    alias_path: str
+
+
+class SyntheticSite:
+    """Class encapsulating the generation of a synthetic site.
+
+    The pages of the site are numbered from 0 (the home page at /nl/home) to
+    num_pages - 1 and form a tree in which page n has the pages n * fanout + 1
+    up to n * fanout + fanout below it. The pages directly below the home
+    page are the sections of the site, which determine language and business
+    of all pages below them. Pages with pages below them get one of the
+    NODE_TYPES as page type, other pages one of the LEAF_TYPES.
+
+    Every page has next to its definitive path (the DCTERMS.identifier) an
+    alias path that serves the same page. Links to a page use one of the
+    next paths:
+
+    - definitive path
+    - alias path: '/<lang>/<slug>-<num>'
+    - path that is redirected with a 301: '/<lang>/oud/<num>'
+    - path to a page with a meta refresh: '/<lang>/verwijzing/<num>'
+
+    Some pages link to a pdf document at '/<lang>/downloads/<slug>-<num>.pdf'.
+
+    Next to the editorial content (with links to random pages), pages contain
+    a header, footer, bld-nojs div, sub-navigation, feedback, readspeaker and
+    content_add blocks, like the real site. All paths are relative to the
+    base path /wps/wcm/connect, except those of robots.txt and the sitemaps.
+
+    To measure history and reporting, the site has versions. From one
+    version to the next a change_rate fraction of the pages is modified,
+    while a small fraction of the leaf pages is absent in a version (404).
+    All generation is deterministic for a given seed.
+    """
+
+    base = '/wps/wcm/connect'
+    sitemap_size = 50_000
+
+    def __init__(self, num_pages, seed=0, version=0, fanout=8,
+                 change_rate=0.05, alias_rate=0.05, redir_rate=0.02,
+                 refresh_rate=0.01, pdf_rate=0.02):
+        """Initiates the site object.
+
+        Args:
+            num_pages (int): number of pages of the site
+            seed (int): seed of the generation
+            version (int): version of the site to generate
+            fanout (int): number of pages below each node page
+            change_rate (float): fraction of pages modified per version
+            alias_rate (float): fraction of pages linked via an alias path
+            redir_rate (float): fraction of pages linked via a 301 redirect
+            refresh_rate (float): fraction of pages linked via a meta refresh
+            pdf_rate (float): fraction of pages linking to a pdf document
+        """
+        self.num_pages = num_pages
+        self.seed = seed
+        self.version = version
+        self.fanout = fanout
+        self.change_rate = change_rate
+        self.alias_rate = alias_rate
+        self.redir_rate = redir_rate
+        self.refresh_rate = refresh_rate
+        self.pdf_rate = pdf_rate
+        self.page = lru_cache(maxsize=100_000)(self._page)
+
+    def _frac(self, page_num, tag):
+        """Return a deterministic fraction for a page and a tag.
+
+        Args:
+            page_num (int): number of the page
+            tag (str): distinguishes the purposes of the fraction
+
+        Returns:
+            float: value from 0 to 1
+        """
+        key = f'{self.seed}-{page_num}-{tag}'.encode()
+        return zlib.crc32(key) / 0xFFFFFFFF
+
+    def _page(self, page_num):
+        """Return the static properties of a page.
+
+        Args:
+            page_num (int): number of the page
+
+        Returns:
+            Page: properties of the page
+        """
+        rng = random.Random(f'{self.seed}-{page_num}')
+        top = page_num
+        while top > self.fanout:
+            top = (top - 1) // self.fanout
+        lang, business, section = SECTIONS[(top - 1) % len(SECTIONS)] \
+            if top else ('nl', 'belastingen', 'home')
+        if page_num == 0:
+            pagetype = 'bld-landing'
+        elif page_num <= self.fanout:
+            pagetype = 'bld-targetGroup'
+        else:
+            types = NODE_TYPES if self.has_subpages(page_num) else LEAF_TYPES
+            pagetype = rng.choices(list(types), list(types.values()))[0]
+        words = rng.sample(WORDS, 3)
+        title = ' '.join(words).capitalize()
+        slug = '-'.join(words)
+        if page_num == 0:
+            def_path = '/nl/home'
+        else:
+            def_path = f'/{lang}/{section}/{slug}-{page_num}'
+        return Page(page_num, lang, business, pagetype, title, def_path,
+                    f'/{lang}/{slug}-{page_num}')
+
+    def has_subpages(self, page_num):
+        """Return if there are pages below a page.
+
+        Args:
+            page_num (int): number of the page
+
+        Returns:
+            bool: True if the page has pages below it
+        """
+        return page_num * self.fanout + 1 < self.num_pages
+
+    def subpages(self, page_num):
+        """Return the numbers of the pages below a page.
+
+        Args:
+            page_num (int): number of the page
+
+        Returns:
+            range: numbers of the pages
+        """
+        first = page_num * self.fanout + 1
+        return range(first, min(first + self.fanout, self.num_pages))
+
+    def exists(self, page_num):
+        """Return if a page exists in the version of the site.
+
+        Args:
+            page_num (int): number of the page
+
+        Returns:
+            bool: True if the page exists
+        """
+        if not 0 <= page_num < self.num_pages:
+            return False
+        if page_num <= self.fanout or self.has_subpages(page_num):
+            return True
+        return self._frac(page_num, f'absent-{self.version}') \
+            >= self.change_rate / 4
+
+    def revision(self, page_num):
+        """Return the number of modifications of a page up to the version.
+
+        Args:
+            page_num (int): number of the page
+
+        Returns:
+            int: number of modifications
+        """
+        return sum(1 for v in range(1, self.version + 1)
+                   if self._frac(page_num, f'change-{v}') < self.change_rate)
+
+    def modified(self, page_num):
+        """Return the modification date of a page in the version.
+
+        Args:
+            page_num (int): number of the page
+
+        Returns:
+            date: modification date
+        """
+        days = int(self._frac(page_num, 'modified') * 2000)
+        return BASE_DATE + timedelta(days=days + 30 * self.revision(page_num))
+
+    def link_path(self, page_num):
+        """Return the path with which other pages link to a page.
+
+        Args:
+            page_num (int): number of the page
+
+        Returns:
+            str: path relative to the base path
+        """
+        page = self.page(page_num)
+        frac = self._frac(page_num, 'access') if page_num else 1
+        if frac < self.redir_rate:
+            return f'/{page.lang}/oud/{page_num}'
+        frac -= self.redir_rate
+        if frac < self.refresh_rate:
+            return f'/{page.lang}/verwijzing/{page_num}'
+        frac -= self.refresh_rate
+        if frac < self.alias_rate:
+            return page.alias_path
+        return page.def_path
+
+    def pdf_path(self, page_num):
+        """Return the path of the pdf document a page links to.
+
+        Args:
+            page_num (int): number of the page
+
+        Returns:
+            str|None: path relative to the base path; None if the page does
+                not link to a pdf document
+        """
+        if self._frac(page_num, 'pdf') >= self.pdf_rate:
+            return None
+        page = self.page(page_num)
+        return f'/{page.lang}/downloads/{page.alias_path[4:]}.pdf'
+
+    def response(self, path, host):
+        """Generate the response for a requested path.
+
+        Args:
+            path (str): requested path (without query)
+            host (str): host:port of the server, to form absolute url's
+
+        Returns:
+            (int, list of (str, str), bytes): status code, headers and body
+        """
+        origin = f'http://{host}'
+        if path == '/robots.txt':
+            body = (f'User-agent: *\n'
+                    f'Disallow: {self.base}/nl/zoeken\n'
+                    f'Sitemap: {origin}/sitemap.xml\n').encode()
+            return 200, [('Content-Type', 'text/plain')], body
+        if path == '/sitemap.xml':
+            return self._sitemap_index(origin)
+        match = re.fullmatch(r'/sitemaps/(\d+)\.xml\.gz', path)
+        if match:
+            return self._sitemap(int(match[1]), origin)
+        if not path.startswith(self.base):
+            return 404, [], b''
+        path = path[len(self.base):]
+        match = re.search(r'(\d+)(\.pdf)?$', path)
+        page_num = int(match[1]) if match else 0
+        if (page_num == 0 and path != '/nl/home') \
+                or not self.exists(page_num):
+            return 404, [], b''
+        page = self.page(page_num)
+        def_url = f'{origin}{self.base}{page.def_path}'
+        if path in (page.def_path, page.alias_path):
+            return self._page_response(page)
+        if path == f'/{page.lang}/oud/{page_num}':
+            return 301, [('Location', def_url)], b''
+        if path == f'/{page.lang}/verwijzing/{page_num}':
+            body = ('<!DOCTYPE html><html><head><meta http-equiv="refresh" '
+                    f'content="0;url={self.base}{page.def_path}"></head>'
+                    '<body></body></html>').encode()
+            return 200, [('Content-Type', 'text/html; charset=utf-8')], body
+        if path == self.pdf_path(page_num):
+            rng = random.Random(f'{self.seed}-{page_num}-pdf')
+            body = b'%PDF-1.4\n' + rng.randbytes(rng.randint(10_000, 200_000))
+            headers = [('Content-Type', 'application/pdf'),
+                       ('ETag', f'"{zlib.crc32(body):08x}"')]
+            return 200, headers, body
+        return 404, [], b''
+
+    def _page_response(self, page):
+        """Generate the response with the html of a page.
+
+        Args:
+            page (Page): page to generate
+
+        Returns:
+            (int, list of (str, str), bytes): status code, headers and body
+        """
+        body = self.html(page.page_num).encode()
+        modified = self.modified(page.page_num)
+        timestamp = time.mktime(modified.timetuple())
+        headers = [('Content-Type', 'text/html; charset=utf-8'),
+                   ('ETag', f'"{zlib.crc32(body):08x}"'),
+                   ('Last-Modified', formatdate(timestamp, usegmt=True))]
+        return 200, headers, body
+
+    def _links(self, page_nums):
+        """Return html list items with links to pages.
+
+        Args:
+            page_nums (Iterable[int]): numbers of the pages to link to
+
+        Returns:
+            str: html list items
+        """
+        return ''.join(
+            f'<li><a href="{self.base}{self.link_path(n)}">'
+            f'{self.page(n).title}</a></li>' for n in page_nums)
+
+    def html(self, page_num):
+        """Generate the html of a page in the version of the site.
+
+        Args:
+            page_num (int): number of the page
+
+        Returns:
+            str: html of the page
+        """
+        page = self.page(page_num)
+        rng = random.Random(
+            f'{self.seed}-{page_num}-{self.revision(page_num)}')
+        parent = (page_num - 1) // self.fanout if page_num else 0
+        siblings = [n for n in self.subpages(parent)
+                    if n != page_num and self.exists(n)][:6]
+        sections = range(1, min(self.fanout, self.num_pages - 1) + 1)
+
+        def text(num_words):
+            return ' '.join(rng.choices(WORDS, k=num_words)).capitalize()
+
+        parts = [
+            f'<!DOCTYPE html><html lang="{page.lang}"><head>'
+            '<meta charset="utf-8">'
+            f'<title>{page.title} | Belastingdienst</title>']
+        if rng.random() > 0.1:
+            # like the real site, not every page has a description
+            parts.append(f'<meta name="description" content="{text(15)}">')
+        parts.append(
+            f'<meta name="language" content="{page.lang}">'
+            '<meta name="DCTERMS.identifier" '
+            f'content="{self.base}{page.def_path}">'
+            '<meta name="DCTERMS.modified" '
+            f'content="{self.modified(page_num).isoformat()}">'
+            '<link rel="stylesheet" href="/static/bld.css"></head>'
+            f'<body data-pagetype="{page.pagetype}" '
+            f'class="{page.business} bld-{page.lang}">'
+            '<header><nav><ul>'
+            f'<li><a href="{self.base}/nl/home">Home</a></li>'
+            f'{self._links(sections)}</ul></nav>'
+            f'<form action="{self.base}/nl/zoeken"><input name="q"></form>'
+            '</header>'
+            '<div id="bld-nojs"><p>Javascript staat uit in uw browser. '
+            'Hierdoor werken sommige onderdelen niet.</p></div>')
+        if page.pagetype not in ('bld-overview', 'bld-landing'):
+            parts.append('<div class="bld-subnavigatie"><ul>'
+                         f'{self._links(siblings)}</ul></div>')
+        parts.append('<main><div class="rs_skip"><a href="#">Lees voor</a>'
+                     f'</div><h1>{page.title}</h1>')
+        if self.has_subpages(page_num):
+            subpages = filter(self.exists, self.subpages(page_num))
+            parts.append(f'<p>{text(25)}</p><ul>'
+                         f'{self._links(subpages)}</ul>')
+        if page.pagetype != 'bld-overview':
+            for _ in range(rng.randint(2, 8)):
+                parts.append(f'<h2>{text(4)}</h2><p>{text(60)}</p><p>')
+                for _ in range(rng.randint(0, 2)):
+                    target = rng.randrange(self.num_pages)
+                    parts.append(
+                        f'{text(20)} <a href="{self.base}'
+                        f'{self.link_path(target)}">{text(3)}</a> ')
+                parts.append(f'{text(20)}</p>')
+            if rng.random() < 0.1:
+                parts.append('<p><a href="https://www.rijksoverheid.nl/'
+                             f'onderwerpen/{rng.choice(WORDS)}">'
+                             'Rijksoverheid</a></p>')
+            pdf_path = self.pdf_path(page_num)
+            if pdf_path:
+                parts.append(f'<p><a href="{self.base}{pdf_path}">'
+                             f'Download {page.title} (pdf)</a></p>')
+        if siblings:
+            parts.append('<div class="content_add"><h2>Zie ook</h2><ul>'
+                         f'{self._links(siblings[:3])}</ul></div>')
+        parts.append(
+            '</main><div class="bld-feedback"><p>Heeft deze informatie u '
+            'geholpen?</p><button>Ja</button><button>Nee</button></div>'
+            '<div id="vaModal"><p>Virtuele assistent</p></div>'
+            '<footer><ul>'
+            f'<li><a href="{self.base}/nl/contact">Contact</a></li>'
+            f'<li><a href="{self.base}/nl/privacy">Privacy</a></li>'
+            f'<li><a href="{self.base}/nl/toegankelijkheid">'
+            'Toegankelijkheid</a></li></ul></footer></body></html>')
+        return ''.join(parts)
+
+    def _sitemap_index(self, origin):
+        """Generate the response with the sitemap index of the site.
+
+        Args:
+            origin (str): scheme and host of the server
+
+        Returns:
+            (int, list of (str, str), bytes): status code, headers and body
+        """
+        num_sitemaps = -(-self.num_pages // self.sitemap_size)
+        entries = ''.join(
+            f'<sitemap><loc>{origin}/sitemaps/{n}.xml.gz</loc></sitemap>'
+            for n in range(num_sitemaps))
+        body = ('<?xml version="1.0" encoding="UTF-8"?><sitemapindex '
+                'xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+                f'{entries}</sitemapindex>').encode()
+        return 200, [('Content-Type', 'application/xml')], body
+
+    def _sitemap(self, sitemap_num, origin):
+        """Generate the response with a gzipped sitemap of the site.
+
+        Args:
+            sitemap_num (int): number of the sitemap
+            origin (str): scheme and host of the server
+
+        Returns:
+            (int, list of (str, str), bytes): status code, headers and body
+        """
+        first = sitemap_num * self.sitemap_size
+        page_nums = range(first, min(first + self.sitemap_size,
+                                     self.num_pages))
+        if not page_nums:
+            return 404, [], b''
+        entries = ''.join(
+            f'<url><loc>{origin}{self.base}{self._page(n).def_path}</loc>'
+            f'<lastmod>{self.modified(n).isoformat()}</lastmod></url>'
+            for n in page_nums if self.exists(n))
+        xml = ('<?xml version="1.0" encoding="UTF-8"?><urlset '
+               'xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+               f'{entries}</urlset>')
+        body = gzip.compress(xml.encode(), compresslevel=5)
+        return 200, [('Content-Type', 'application/gzip')], body
+
+
+class SyntheticServer(ThreadingHTTPServer):
+    """Class encapsulating a local http server for a synthetic site.
+
+    Conditional requests with an If-None-Match header that matches the ETag
+    of the generated response are answered with 304. To simulate a remote
+    site, every response can be delayed by a fixed latency.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, site, port=8080, latency=0.0):
+        """Initiates the server object.
+
+        Args:
+            site (SyntheticSite): site to serve
+            port (int): port to serve on
+            latency (float): seconds to wait before responding
+        """
+        self.site = site
+        self.latency = latency
+        super().__init__(('', port), _SyntheticHandler)
+
+
+class _SyntheticHandler(BaseHTTPRequestHandler):
+    """Request handler of the SyntheticServer."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self._respond(send_body=True)
+
+    def do_HEAD(self):
+        self._respond(send_body=False)
+
+    def log_message(self, format, *args):
+        logging.debug(format % args)
+
+    def _respond(self, send_body):
+        """Send the generated response for the requested path.
+
+        Args:
+            send_body (bool): send the body of the response
+
+        Returns:
+            None
+        """
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        path = self.path.partition('?')[0]
+        host = self.headers.get('Host', 'localhost')
+        status, headers, body = self.server.site.response(path, host)
+        etag = next((v for n, v in headers if n == 'ETag'), None)
+        if etag and self.headers.get('If-None-Match') == etag:
+            status, body = 304, b''
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
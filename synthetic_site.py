@@ -0,0 +1,37 @@
+"""Serve a synthetic site from a local http server (version 1.0).
+
+Serves a generated site that is shaped like www.belastingdienst.nl (see
+SyntheticSite in synthetic_lib.py), to measure the throughput of the scrape
+pipeline at sizes of 100k up to 1M pages.
+
+To scrape the synthetic site, set the 'root_url' parameter of scrape_site.py
+to the local server, e.g. 'http://localhost:8080/wps/wcm/connect', and
+'max_paths' to some 20% above the number of pages (for the aliases,
+redirects and pdf documents). To build a history, scrape the site again
+after restarting the server with the next version. The server runs until it
+is interrupted.
+"""
+
+import logging
+
+from synthetic_lib import SyntheticSite, SyntheticServer
+
+# ============================================================================ #
+num_pages = 100_000         # number of pages of the site
+seed = 0                    # seed of the generation
+version = 0                 # version of the site (pages change per version)
+change_rate = 0.05          # fraction of pages changing per version
+port = 8080                 # port to serve the site on
+latency = 0.0               # seconds before each response
+# ============================================================================ #
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(levelname)-8s - %(message)s')
+site = SyntheticSite(num_pages, seed, version, change_rate=change_rate)
+server = SyntheticServer(site, port, latency)
+logging.info(f'Serving version {version} of a synthetic site with '
+             f'{num_pages} pages on port {port}')
+try:
+    server.serve_forever()
+except KeyboardInterrupt:
+    server.server_close()
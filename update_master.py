@@ -3,10 +3,20 @@
 This modules is intended to update all tables of the scrape_master database
 after new scrapes have been made. The description table is not updated however,
 since it should be hand-loaded or manually maintained.
+
+Optionally the metadata of the pages (title, description, language,
+modified, pagetype and classes) is extracted again from the heads of the
+pages before the figures are updated, which is quick compared to a full
+extraction of the page information.
+
+Optionally the page documents of the scrapes are moved to the blob store next
+to the master database (page_blobs.db), where each distinct document is
+stored only once for all scrapes. Use the export method of ScrapeDB to get a
+self-contained scrape database for transfer.
 """
 
 from pathlib import Path
-from scraper_lib import master_figures, compile_history
+from scraper_lib import master_figures, compile_history, store_page_blobs
 
 # ============================================================================ #
 min_timestamp = '200831-0000'   # scrapes before are not processed
@@ -14,6 +24,8 @@ max_timestamp = '210131-2359'   # scrapes after are not processed
 within_bd = False               # True when running on the DWB
 
 figures = True                  # update figures in master database
+refresh_info = False            # refresh page metadata before the figures
+page_blobs = False              # move page documents to the blob store
 
 history = True                  # compile history
 renew_tables = True             # to refresh complete history
@@ -29,7 +41,11 @@ else:
 
 # (re)write typical figures of scrape range to the master database
 if figures:
-    master_figures(master_dir, min_timestamp, max_timestamp)
+    master_figures(master_dir, min_timestamp, max_timestamp, refresh_info)
+
+# move page documents of scrape range to the blob store
+if page_blobs:
+    store_page_blobs(master_dir, min_timestamp, max_timestamp)
 
 # compile history of scrape range into the master database
 if history: